@@ -1,23 +1,55 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
 import markdown
-import xml.dom.minidom
 from datetime import datetime, timezone
 import time
-import difflib
 import os
 import requests
 import json as json_module
 import zipfile
 import io
-import re
-from concurrent.futures import ThreadPoolExecutor
-import threading
 import hashlib
+import tempfile
+import brm_parser
+import log_store
+from diff_engine import (ArchiveComparison, DiffSession, choose_algorithm, diff_ids,
+                         diff_lines, diff_stats, map_lines, remove_files, unified_diff)
+from log_cache import LogCache
+from log_index import (CorrelationIndex, ErrorIndex, ProcessIndex, SearchIndex, matches_search,
+                       parse_log_timestamp, parse_search_terms)
+from log_records import FileRecords, LogRecords, open_buffer
+from parse_jobs import ParseJobs
+from session_store import SessionStore
+from xml_stream import XmlTree, pretty_xml
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'dev-secret-key-change-in-production'
 app.config['DATABASE'] = os.path.join(app.instance_path, 'mytools.db')
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max upload
+app.config['UPLOAD_CHUNK_SIZE'] = 1024 * 1024  # Spool uploads to disk 1MB at a time
+app.config['LOG_CACHE_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # Memory budget for parsed logs
+app.config['LOG_CACHE_TTL'] = 6 * 60 * 60  # Drop parsed logs from memory after 6h idle
+app.config['LOG_STORE_MAX_AGE'] = 14 * 24 * 60 * 60  # Remove stored bundles unused for 14 days (0: keep)
+app.config['LOG_STORE_MAX_BYTES'] = 20 * 1024 * 1024 * 1024  # Disk budget for stored bundles (0: unbounded)
+app.config['LOG_SEARCH_INDEX'] = True  # Build a token index for BRM log search
+app.config['LOG_CORRELATION_INDEX'] = True  # Index POIDs, opcodes and thread ids at ingest (else on first use)
+app.config['BRM_PARSE_MODE'] = 'process' if (os.cpu_count() or 1) > 1 else 'thread'  # 'process' uses all cores
+app.config['BRM_PARSE_WORKERS'] = os.cpu_count() or 1  # Parser pool size
+app.config['BRM_PARSE_CHUNK_SIZE'] = 64 * 1024 * 1024  # Split bigger members across workers
+app.config['STREAM_CHUNK_SIZE'] = 256 * 1024  # Text per chunk of streamed log responses
+app.config['HISTOGRAM_MAX_BUCKETS'] = 10000  # Upper bound on buckets per histogram series
+app.config['PARSE_JOB_WORKERS'] = 2  # Uploads parsed at the same time; more wait in the queue
+app.config['PARSE_JOB_TTL'] = 60 * 60  # Keep finished parse jobs queryable for 1h
+app.config['PARSE_JOB_WAIT'] = 2  # Seconds an upload waits for its parse before returning a job id
+app.config['DIFF_CONTEXT_LINES'] = 3  # Unchanged lines shown around each change
+app.config['DIFF_MAX_CONTEXT_LINES'] = 1000  # Upper bound on requested context lines
+app.config['DIFF_PAGE_ROWS'] = 2000  # Side-by-side rows per response
+app.config['DIFF_SESSIONS'] = 20  # Comparisons kept for paging, least recently used dropped first
+app.config['DIFF_SESSION_TTL'] = 30 * 60  # Drop comparisons after 30min idle
+app.config['XML_TREE_DEPTH'] = 3  # Tree view levels sent with the formatted XML and per expanded node
+app.config['XML_TREE_MAX_DEPTH'] = 50  # Upper bound on requested tree levels
+app.config['XML_TREE_MAX_NODES'] = 2000  # Tree view nodes per response, nearest levels first
+app.config['XML_TREES'] = 20  # Formatted documents kept for the tree view, least recently used dropped first
+app.config['XML_TREE_TTL'] = 30 * 60  # Drop tree views after 30min idle
 
 # Ensure instance folder exists
 os.makedirs(app.instance_path, exist_ok=True)
@@ -26,9 +58,56 @@ os.makedirs(app.instance_path, exist_ok=True)
 CACHE_DIR = os.path.join(app.instance_path, 'log_cache')
 os.makedirs(CACHE_DIR, exist_ok=True)
 
-# Global cache for parsed logs (in-memory)
-parsed_logs_cache = {}
-cache_lock = threading.Lock()
+# Uploaded files and extracted members of File Compare sessions
+COMPARE_DIR = os.path.join(app.instance_path, 'compare_files')
+os.makedirs(COMPARE_DIR, exist_ok=True)
+
+# Sessions and parse jobs are in memory, so spooled uploads found at startup
+# were left behind by a restart or crash
+remove_files(os.path.join(COMPARE_DIR, name) for name in os.listdir(COMPARE_DIR)
+             if name.endswith('.part'))
+remove_files(os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR)
+             if name.endswith('.zip.part'))
+log_store.remove_stale_staging(CACHE_DIR)
+
+# Global cache for parsed logs (bounded in-memory LRU, backed by CACHE_DIR)
+parsed_logs_cache = LogCache(
+    loader=lambda cache_key: log_store.open_bundle(CACHE_DIR, cache_key),
+    max_bytes=app.config['LOG_CACHE_MAX_BYTES'],
+    ttl=app.config['LOG_CACHE_TTL']
+)
+
+def prune_log_store():
+    """Remove stored bundles beyond LOG_STORE_MAX_AGE and LOG_STORE_MAX_BYTES, except those in memory"""
+    try:
+        removed = log_store.prune_store(CACHE_DIR, app.config['LOG_STORE_MAX_AGE'],
+                                        app.config['LOG_STORE_MAX_BYTES'], parsed_logs_cache.keys())
+    except OSError as e:
+        print(f"Error pruning {CACHE_DIR}: {str(e)}")
+        return
+    if removed:
+        print(f"Removed {len(removed)} stored log bundles")
+
+prune_log_store()
+
+# Background parses of uploaded bundles
+parse_jobs = ParseJobs(
+    workers=app.config['PARSE_JOB_WORKERS'],
+    ttl=app.config['PARSE_JOB_TTL']
+)
+
+# Side-by-side comparisons, paged by the File Compare tool
+diff_sessions = SessionStore(
+    max_sessions=app.config['DIFF_SESSIONS'],
+    ttl=app.config['DIFF_SESSION_TTL'],
+    on_drop=lambda comparison: comparison.close()
+)
+
+# Element tables of formatted XML, expanded lazily by the XML Formatter tree view
+xml_trees = SessionStore(
+    max_sessions=app.config['XML_TREES'],
+    ttl=app.config['XML_TREE_TTL']
+)
 
 @app.route('/')
 def index():
@@ -127,7 +206,13 @@ def plsql_sql_converter():
 
 @app.route('/api/parse-brm-logs', methods=['POST'])
 def parse_brm_logs():
-    """API endpoint to parse BRM CM logs from ZIP file - Returns summary only"""
+    """API endpoint to parse BRM CM logs from ZIP file - Returns summary only.
+
+    The parse runs as a background job. If it finishes within PARSE_JOB_WAIT
+    seconds the summary is returned right away; otherwise the response is a
+    202 with the job, to be polled at /api/parse-jobs/<job_id>. Uploading a
+    bundle that is already being parsed joins the running job.
+    """
     try:
         if 'file' not in request.files:
             return jsonify({'success': False, 'error': 'No file provided'}), 400
@@ -139,82 +224,59 @@ def parse_brm_logs():
         if not file.filename.endswith('.zip'):
             return jsonify({'success': False, 'error': 'Only ZIP files are supported'}), 400
         
-        # Generate cache key from file
-        file_content = file.read()
-        file_hash = hashlib.md5(file_content).hexdigest()
-        
-        # Check if already parsed
-        with cache_lock:
-            if file_hash in parsed_logs_cache:
+        # Spool the upload to disk and generate the cache key while streaming
+        zip_path, file_hash, file_size = spool_upload(file)
+        try:
+            # Check if already parsed (in memory or persisted in CACHE_DIR)
+            bundle = parsed_logs_cache.get(file_hash)
+            if bundle is not None:
                 print(f"Using cached data for {file.filename}")
                 return jsonify({
                     'success': True,
                     'cacheKey': file_hash,
-                    'summary': parsed_logs_cache[file_hash]['summary']
+                    'summary': bundle.summary
                 })
-        
-        print(f"Parsing {file.filename} ({len(file_content) / (1024*1024):.2f} MB)...")
-        
-        # Parse the ZIP file with threading
-        all_logs = []
-        process_stats = {}
-        
-        with zipfile.ZipFile(io.BytesIO(file_content), 'r') as zip_ref:
-            file_list = [f for f in zip_ref.namelist() 
-                        if not f.startswith('__MACOSX') 
-                        and not f.startswith('.') 
-                        and not f.endswith('/')]
+            
+            print(f"Parsing {file.filename} ({file_size / (1024*1024):.2f} MB)...")
+            
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                members = [info for info in zip_ref.infolist()
+                           if not info.filename.startswith('__MACOSX')
+                           and not info.filename.startswith('.')
+                           and not info.filename.endswith('/')]
+            file_list = [info.filename for info in members]
             
             if not file_list:
                 return jsonify({'success': False, 'error': 'No valid files found in ZIP'}), 400
             
             print(f"Found {len(file_list)} files in ZIP")
             
-            # Use ThreadPoolExecutor for parallel processing
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                futures = []
-                for filename in file_list:
-                    future = executor.submit(parse_single_file_from_zip, zip_ref, filename)
-                    futures.append(future)
-                
-                # Collect results
-                for future in futures:
-                    try:
-                        logs = future.result()
-                        all_logs.extend(logs)
-                    except Exception as e:
-                        print(f"Error in thread: {e}")
-                        continue
-        
-        print(f"Total logs parsed: {len(all_logs)}")
-        
-        # Build summary (don't send all logs)
-        summary = build_log_summary(all_logs)
-        
-        # Store raw file content for line-by-line viewing
-        raw_file_content = {}
-        with zipfile.ZipFile(io.BytesIO(file_content), 'r') as zip_ref:
-            for filename in file_list:
-                try:
-                    with zip_ref.open(filename) as log_file:
-                        content = log_file.read().decode('utf-8', errors='ignore')
-                        raw_file_content[filename] = content
-                except Exception as e:
-                    print(f"Error reading raw content from {filename}: {str(e)}")
-        
-        # Cache the full logs and raw content
-        with cache_lock:
-            parsed_logs_cache[file_hash] = {
-                'logs': all_logs,
-                'summary': summary,
-                'raw_files': raw_file_content
-            }
+            # An earlier upload of the same logs lets unchanged records be reused
+            base_key = request.form.get('base_key', '')
+            members_size = sum(info.file_size for info in members)
+            
+            job, is_new = parse_jobs.submit(
+                file_hash, file.filename,
+                lambda job, path=zip_path: run_parse_job(job, path, file_list, file_hash, file_size,
+                                                         members_size, base_key))
+            if is_new:
+                zip_path = None  # Removed by the job
+            else:
+                print(f"Joining parse job {job.id} for {file.filename}")
+        finally:
+            if zip_path is not None:
+                os.remove(zip_path)
+        
+        if job.wait(app.config['PARSE_JOB_WAIT']):
+            if job.state == 'failed':
+                return jsonify({'success': False, 'error': job.error}), 500
+            return jsonify({
+                'success': True,
+                'cacheKey': file_hash,
+                'summary': job.result
+            })
         
-        return jsonify({
-            'success': True,
-            'cacheKey': file_hash,
-            'summary': summary
-        })
+        return jsonify(dict(job.to_dict(), success=True)), 202
     
     except Exception as e:
         print(f"Error parsing BRM logs: {str(e)}")
@@ -222,6 +284,182 @@ def parse_brm_logs():
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/parse-jobs/<job_id>', methods=['GET'])
+def get_parse_job(job_id):
+    """Get the state and progress of a parse job, and its summary once it is done"""
+    job = parse_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired parse job'}), 404
+    return jsonify(dict(job.to_dict(), success=True))
+
+def run_parse_job(job, zip_path, file_list, cache_key, file_size, members_size, base_key=''):
+    """Parse a spooled upload for a ParseJob and cache it, returning the summary"""
+    try:
+        job.set_totals(len(file_list), members_size)
+        base_bundle = parsed_logs_cache.get(base_key) if base_key else None
+        bundle = ingest_brm_zip(zip_path, file_list, cache_key, file_size, base_bundle, job)
+    finally:
+        os.remove(zip_path)
+    parsed_logs_cache.put(cache_key, bundle)
+    prune_log_store()
+    return bundle.summary
+
+def ingest_brm_zip(zip_path, file_list, cache_key, file_size, base_bundle=None, job=None):
+    """Extract and parse the members of a BRM log ZIP into a persisted LogBundle.
+
+    Members are extracted straight into the bundle's staging directory and
+    hashed; members already in the member store are not parsed again, and
+    new ones are parsed into columnar records and moved into the store.
+    With a base_bundle (an earlier upload of the same logs), members that
+    are unchanged or have only grown since are recognised by name and
+    content digest: their records are reused and only the appended tail is
+    parsed, and the indexes are extended from the first changed record.
+    Progress is reported to job, if given.
+    """
+    staging_path, content_paths = log_store.create_staging(CACHE_DIR, len(file_list))
+    try:
+        mode = app.config['BRM_PARSE_MODE']
+        workers = app.config['BRM_PARSE_WORKERS']
+        started = time.time()
+        
+        base_members = {}
+        if base_bundle is not None:
+            for file_records in base_bundle.logs.files:
+                base_members.setdefault(file_records.name, file_records)
+        
+        # Extract and hash the members, including the part shared with the base
+        if job is not None:
+            job.phase = 'extracting'
+        extracted = brm_parser.extract_zip_members(
+            zip_path, file_list, content_paths,
+            prefix_sizes=[base_members[name].size if name in base_members else 0 for name in file_list],
+            mode=mode, workers=workers,
+            progress=(lambda size: job.advance(filesExtracted=1, bytesExtracted=size)) if job else None
+        )
+        
+        # Plan every member as (base member, base records reused, offset to
+        # parse from, stored records)
+        plans = []
+        for filename, info in zip(file_list, extracted):
+            base = base_members.get(filename)
+            if base is not None and (info is None or info['prefixDigest'] != base.digest):
+                base = None
+            stored = log_store.open_member(CACHE_DIR, info['digest'], filename) if info else None
+            if info is None:
+                plans.append((None, 0, None, None))
+            elif stored is not None:
+                # Same content as a member of this or any earlier bundle
+                identical = base is not None and info['size'] == base.size
+                plans.append((base if identical else None, stored.count, None, stored))
+            elif base is None:
+                plans.append((None, 0, 0, None))
+            else:
+                # The last record may continue in the appended data; parse again from it
+                reuse = max(base.count - 1, 0)
+                plans.append((base, reuse, base.columns['start'][reuse] if base.count else 0, None))
+        
+        # Parse in worker processes (or threads)
+        to_parse = [(content_path, parse_from, filename)
+                    for filename, content_path, (_, _, parse_from, _) in zip(file_list, content_paths, plans)
+                    if parse_from is not None]
+        if job is not None:
+            job.phase = 'parsing'
+            job.advance(bytesToParse=sum(info['size'] - parse_from
+                                         for info, (_, _, parse_from, _) in zip(extracted, plans)
+                                         if parse_from is not None),
+                        records=sum(reuse for _, reuse, _, _ in plans))
+        parsed = iter(brm_parser.parse_log_files(
+            to_parse, mode=mode, workers=workers, chunk_size=app.config['BRM_PARSE_CHUNK_SIZE'],
+            progress=(lambda size, records: job.advance(bytesParsed=size, records=records)) if job else None))
+        files = []
+        for filename, content_path, info, (base, reuse, parse_from, stored) in zip(
+                file_list, content_paths, extracted, plans):
+            if stored is not None:
+                files.append(stored)
+                continue
+            parts = [(0,) + base.head(reuse)] if reuse else []
+            if parse_from is not None:
+                parts.extend(next(parsed))
+            file_records = FileRecords.from_parts(filename, open_buffer(content_path), parts,
+                                                  info['digest'] if info else None)
+            if info is not None:
+                log_store.save_member(CACHE_DIR, os.path.dirname(content_path), file_records)
+            files.append(file_records)
+        all_logs = LogRecords(files)
+        elapsed = max(time.time() - started, 1e-6)
+        print(f"Total logs parsed: {len(all_logs)} from {file_size / (1024*1024):.2f} MB "
+              f"in {elapsed:.2f}s ({file_size / (1024*1024) / elapsed:.2f} MB/s, "
+              f"{mode} mode)")
+        
+        # Records before keep are the same as in the base bundle, so its
+        # indexes are reused up to there and only extended from there on
+        keep = 0
+        if base_bundle is not None:
+            base_files = base_bundle.logs.files
+            for position, (base, reuse, parse_from, _) in enumerate(plans):
+                if base is None or position >= len(base_files) or base_files[position] is not base:
+                    break
+                keep += reuse
+                if parse_from is not None:
+                    break
+        
+        if job is not None:
+            job.phase = 'indexing'
+        search_index = None
+        correlation_index = None
+        if keep:
+            print(f"Reusing {keep} records of the base bundle")
+            process_index = base_bundle.process_index.extended(keep, all_logs)
+            if app.config['LOG_SEARCH_INDEX']:
+                search_index = base_bundle.search_index.extended(keep, all_logs)
+            if app.config['LOG_CORRELATION_INDEX']:
+                correlation_index = base_bundle.correlation_index.extended(keep, all_logs)
+            error_index = base_bundle.error_index.extended(keep, all_logs, process_index)
+        else:
+            process_index = ProcessIndex(all_logs.iter_process_levels())
+            if app.config['LOG_SEARCH_INDEX']:
+                search_index = SearchIndex(all_logs.search_texts())
+            if app.config['LOG_CORRELATION_INDEX']:
+                correlation_index = CorrelationIndex(all_logs.raw_spans())
+            error_index = ErrorIndex(all_logs, process_index)
+        
+        # Build summary (don't send all logs)
+        summary = build_log_summary(all_logs, process_index)
+        
+        # Persist the parsed bundle so it survives restarts
+        if job is not None:
+            job.phase = 'saving'
+        return log_store.save_bundle(CACHE_DIR, cache_key, staging_path, all_logs, summary,
+                                     process_index, search_index, error_index, correlation_index)
+    except Exception:
+        log_store.discard_staging(staging_path)
+        raise
+
+def spool_upload(file, directory=None, suffix='.zip.part'):
+    """Stream an uploaded file into directory (default CACHE_DIR), hashing it as it is written.
+
+    Returns (path, BLAKE2b hex digest, size in bytes). Memory use is bounded by
+    UPLOAD_CHUNK_SIZE regardless of the upload size; the caller owns the
+    spooled file and must remove it.
+    """
+    chunk_size = app.config['UPLOAD_CHUNK_SIZE']
+    hasher = hashlib.blake2b(digest_size=16)
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory or CACHE_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            while True:
+                chunk = file.stream.read(chunk_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                spool.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, hasher.hexdigest(), size
+
 @app.route('/api/get-process-logs/<cache_key>/<process_name>', methods=['GET'])
 def get_process_logs(cache_key, process_name):
     """Get logs for a specific process (paginated)"""
@@ -230,33 +468,30 @@ def get_process_logs(cache_key, process_name):
         per_page = int(request.args.get('per_page', 100))
         level_filter = request.args.get('level', '')
         search_query = request.args.get('search', '')
+        search_mode = request.args.get('search_mode', '')  # 'all' matches each word separately
         
-        with cache_lock:
-            if cache_key not in parsed_logs_cache:
-                return jsonify({'success': False, 'error': 'Cache expired. Please re-upload file.'}), 404
-            
-            all_logs = parsed_logs_cache[cache_key]['logs']
+        bundle = parsed_logs_cache.get(cache_key)
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'Cache expired. Please re-upload file.'}), 404
         
-        # Filter by process
-        process_logs = [log for log in all_logs if log['process'] == process_name]
+        all_logs = bundle.logs
         
-        # Apply level filter
-        if level_filter:
-            process_logs = [log for log in process_logs if log['level'] == level_filter]
+        # Offsets of this process's records, already narrowed by level
+        offsets = bundle.process_index.offsets(process_name, level_filter)
         
         # Apply search filter
         if search_query:
-            search_lower = search_query.lower()
-            process_logs = [log for log in process_logs 
-                          if search_lower in log.get('message', '').lower() 
-                          or search_lower in log.get('flistContent', '').lower()
-                          or search_lower in log.get('sourceFile', '').lower()]
+            terms = parse_search_terms(search_query, search_mode)
+            if app.config['LOG_SEARCH_INDEX']:
+                offsets = bundle.search_index.search(all_logs, offsets, terms)
+            else:
+                offsets = [idx for idx in offsets if matches_search(all_logs[idx], terms)]
         
         # Pagination
-        total = len(process_logs)
+        total = len(offsets)
         start = (page - 1) * per_page
         end = start + per_page
-        paginated_logs = process_logs[start:end]
+        paginated_logs = [all_logs[idx] for idx in offsets[start:end]]
         
         return jsonify({
             'success': True,
@@ -271,41 +506,83 @@ def get_process_logs(cache_key, process_name):
         print(f"Error getting process logs: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/get-correlated-logs/<cache_key>', methods=['GET'])
+def get_correlated_logs(cache_key):
+    """Get the logs of all processes holding a POID, opcode or threadInfo, by timestamp (paginated).
+
+    Exactly one of the poid, opcode and thread arguments selects the value.
+    """
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 100))
+        kinds = [kind for kind in ('poid', 'opcode', 'thread') if request.args.get(kind)]
+        if len(kinds) != 1:
+            return jsonify({'success': False, 'error': 'Give one of poid, opcode or thread'}), 400
+        kind = kinds[0]
+        
+        bundle = parsed_logs_cache.get(cache_key)
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'Cache expired. Please re-upload file.'}), 404
+        
+        all_logs = bundle.logs
+        try:
+            offsets = bundle.correlation_index.find(all_logs, kind, request.args[kind])
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Interleave the processes and files by timestamp, keeping bundle order within a second
+        epochs = {}
+        def sort_key(idx):
+            timestamp = all_logs.coded_value(idx, 'timestamp')
+            epoch = epochs.get(timestamp)
+            if epoch is None:
+                epoch = epochs[timestamp] = parse_log_timestamp(timestamp) or 0
+            return epoch, idx
+        offsets.sort(key=sort_key)
+        
+        processes = {}
+        for idx in offsets:
+            process = all_logs.coded_value(idx, 'process')
+            processes[process] = processes.get(process, 0) + 1
+        
+        # Pagination
+        total = len(offsets)
+        start = (page - 1) * per_page
+        end = start + per_page
+        paginated_logs = [all_logs[idx] for idx in offsets[start:end]]
+        
+        return jsonify({
+            'success': True,
+            'logs': paginated_logs,
+            'processes': processes,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total + per_page - 1) // per_page
+        })
+    
+    except Exception as e:
+        print(f"Error getting correlated logs: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/get-unique-errors/<cache_key>/<process_name>', methods=['GET'])
 def get_unique_errors(cache_key, process_name):
-    """Get unique errors for a process"""
+    """Get unique errors for a process, optionally grouped by message template (group=template)"""
     try:
         from_line = int(request.args.get('from_line', 0))
         to_line = int(request.args.get('to_line', 999999999))
+        group = request.args.get('group', '')
         
-        with cache_lock:
-            if cache_key not in parsed_logs_cache:
-                return jsonify({'success': False, 'error': 'Cache expired'}), 404
-            
-            all_logs = parsed_logs_cache[cache_key]['logs']
-        
-        # Filter by process and error level
-        error_logs = [log for log in all_logs 
-                     if log['process'] == process_name 
-                     and log['level'] == 'E'
-                     and from_line <= log.get('lineNumber', 0) <= to_line]
-        
-        # Group unique errors
-        unique_errors = {}
-        for log in error_logs:
-            key = f"{log.get('message', '')}|{log.get('sourceFile', '')}"
-            if key not in unique_errors:
-                unique_errors[key] = {
-                    'message': log.get('message', ''),
-                    'sourceFile': log.get('sourceFile', ''),
-                    'count': 0,
-                    'firstLine': log.get('lineNumber', 0)
-                }
-            unique_errors[key]['count'] += 1
+        bundle = parsed_logs_cache.get(cache_key)
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'Cache expired'}), 404
+        
+        # Signatures and their line numbers are precomputed per process
+        errors = bundle.error_index.errors(process_name, from_line, to_line, group)
         
         return jsonify({
             'success': True,
-            'errors': list(unique_errors.values())
+            'errors': errors
         })
     
     except Exception as e:
@@ -324,31 +601,29 @@ def get_complete_logs(cache_key):
         if to_line - from_line > 5000:
             return jsonify({'success': False, 'error': 'Maximum 5000 lines allowed at once'}), 400
         
-        with cache_lock:
-            if cache_key not in parsed_logs_cache:
-                return jsonify({'success': False, 'error': 'Cache expired. Please re-upload file.'}), 404
-            
-            raw_files = parsed_logs_cache[cache_key].get('raw_files', {})
+        bundle = parsed_logs_cache.get(cache_key)
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'Cache expired. Please re-upload file.'}), 404
+        
+        raw_files = bundle.raw_files
         
         if not raw_files:
             return jsonify({'success': False, 'error': 'No raw file content available'}), 404
         
         # If specific file requested, use it; otherwise combine all files
         if file_name and file_name in raw_files:
-            content = raw_files[file_name]
+            raw_file = raw_files[file_name]
         else:
-            # Combine all files
-            content = '\n'.join([f'=== File: {fname} ===\n{fcontent}' 
-                                for fname, fcontent in raw_files.items()])
-        
-        # Split into actual lines
-        all_lines = content.split('\n')
+            raw_file = bundle.combined_raw_file
+        total_lines = raw_file.line_count
         
-        # Get the requested line range (1-indexed)
+        # Get the requested line range (1-indexed), reading only those lines
         from_idx = max(0, from_line - 1)
-        to_idx = min(len(all_lines), to_line)
+        to_idx = min(total_lines, to_line)
+        if to_idx < 0:
+            to_idx = max(0, to_idx + total_lines)
         
-        selected_lines = all_lines[from_idx:to_idx]
+        selected_lines = raw_file.lines(from_idx, to_idx)
         
         # Format with actual line numbers
         formatted_lines = []
@@ -358,10 +633,10 @@ def get_complete_logs(cache_key):
         return jsonify({
             'success': True,
             'rawText': '\n'.join(formatted_lines),
-            'totalLines': len(all_lines),
+            'totalLines': total_lines,
             'displayedLines': len(selected_lines),
             'from_line': from_line,
-            'to_line': min(to_line, len(all_lines))
+            'to_line': min(to_line, total_lines)
         })
     
     except Exception as e:
@@ -374,18 +649,17 @@ def get_complete_logs(cache_key):
 def get_file_list(cache_key):
     """Get list of files in the parsed log"""
     try:
-        with cache_lock:
-            if cache_key not in parsed_logs_cache:
-                return jsonify({'success': False, 'error': 'Cache expired'}), 404
-            
-            raw_files = parsed_logs_cache[cache_key].get('raw_files', {})
+        bundle = parsed_logs_cache.get(cache_key)
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'Cache expired'}), 404
+        
+        raw_files = bundle.raw_files
         
         files = []
-        for fname, content in raw_files.items():
-            line_count = len(content.split('\n'))
+        for fname, raw_file in raw_files.items():
             files.append({
                 'name': fname,
-                'lines': line_count
+                'lines': raw_file.line_count
             })
         
         return jsonify({
@@ -399,41 +673,30 @@ def get_file_list(cache_key):
 
 @app.route('/api/get-full-cm-logs/<cache_key>/<process_name>', methods=['GET'])
 def get_full_cm_logs(cache_key, process_name):
-    """Get all logs for a specific CM process in raw format"""
+    """Stream all logs for a specific CM process in raw format as chunked text/plain.
+
+    The entry count and process name are sent in the X-Total-Logs and
+    X-Process-Name headers, so no record is formatted before the first byte.
+    """
     try:
-        with cache_lock:
-            if cache_key not in parsed_logs_cache:
-                return jsonify({'success': False, 'error': 'Cache expired'}), 404
-            
-            all_logs = parsed_logs_cache[cache_key]['logs']
+        bundle = parsed_logs_cache.get(cache_key)
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'Cache expired'}), 404
         
         # Filter by process
-        process_logs = [log for log in all_logs if log['process'] == process_name]
+        offsets = bundle.process_index.offsets(process_name)
         
-        if not process_logs:
+        if not offsets:
             return jsonify({'success': False, 'error': 'No logs found for this CM process'}), 404
         
-        # Build raw text from all logs for this CM (original format)
-        raw_lines = []
-        for log in process_logs:
-            # Add the original raw log header
-            raw_lines.append(log.get('rawContent', ''))
-            # Add message if present
-            if log.get('message'):
-                raw_lines.append(f"    {log.get('message')}")
-            # Add flist content if present
-            if log.get('flistContent'):
-                raw_lines.append(log.get('flistContent'))
-            raw_lines.append('')  # Empty line between entries
-        
-        raw_text = '\n'.join(raw_lines)
-        
-        return jsonify({
-            'success': True,
-            'rawText': raw_text,
-            'totalLogs': len(process_logs),
-            'processName': process_name
-        })
+        return Response(
+            iter_raw_cm_log(bundle.logs, offsets),
+            mimetype='text/plain',
+            headers={
+                'X-Total-Logs': str(len(offsets)),
+                'X-Process-Name': process_name
+            }
+        )
     
     except Exception as e:
         print(f"Error getting full CM logs: {str(e)}")
@@ -443,56 +706,18 @@ def get_full_cm_logs(cache_key, process_name):
 
 @app.route('/api/download-all-cm-logs/<cache_key>', methods=['GET'])
 def download_all_cm_logs(cache_key):
-    """Download all CM logs as separate files in a ZIP"""
+    """Download all CM logs as separate files in a ZIP, streamed as it is deflated"""
     try:
-        from flask import send_file
+        bundle = parsed_logs_cache.get(cache_key)
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'Cache expired'}), 404
         
-        with cache_lock:
-            if cache_key not in parsed_logs_cache:
-                return jsonify({'success': False, 'error': 'Cache expired'}), 404
-            
-            all_logs = parsed_logs_cache[cache_key]['logs']
-        
-        # Group logs by process
-        process_logs_map = {}
-        for log in all_logs:
-            process_key = log['process']
-            if process_key not in process_logs_map:
-                process_logs_map[process_key] = {
-                    'processName': log['processName'],
-                    'processPid': log['processPid'],
-                    'logs': []
-                }
-            process_logs_map[process_key]['logs'].append(log)
-        
-        # Create ZIP file in memory
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for process_key, data in process_logs_map.items():
-                # Build content for this CM process (original format)
-                raw_lines = []
-                for log in data['logs']:
-                    # Use original log header without added line numbers
-                    raw_lines.append(log.get('rawContent', ''))
-                    if log.get('message'):
-                        raw_lines.append(f"    {log.get('message')}")
-                    if log.get('flistContent'):
-                        raw_lines.append(log.get('flistContent'))
-                    raw_lines.append('')
-                
-                content = '\n'.join(raw_lines)
-                
-                # Add file to ZIP
-                filename = f"{data['processName']}_{data['processPid']}.log"
-                zip_file.writestr(filename, content)
-        
-        zip_buffer.seek(0)
-        
-        return send_file(
-            zip_buffer,
+        return Response(
+            iter_cm_logs_zip(bundle.logs, bundle.process_index),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name=f'brm_cm_logs_{int(time.time())}.zip'
+            headers={
+                'Content-Disposition': f'attachment; filename=brm_cm_logs_{int(time.time())}.zip'
+            }
         )
     
     except Exception as e:
@@ -501,49 +726,171 @@ def download_all_cm_logs(cache_key):
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def parse_single_file_from_zip(zip_ref, filename):
-    """Parse a single log file from ZIP"""
+def format_raw_log_entry(log):
+    """Format a log entry in its original layout: header, indented message, flist"""
+    # Use original log header without added line numbers
+    raw_lines = [log.get('rawContent', '')]
+    if log.get('message'):
+        raw_lines.append(f"    {log.get('message')}")
+    if log.get('flistContent'):
+        raw_lines.append(log.get('flistContent'))
+    raw_lines.append('')  # Empty line between entries
+    return '\n'.join(raw_lines)
+
+def iter_raw_cm_log(all_logs, offsets):
+    """Yield the raw text of the given records in chunks of about STREAM_CHUNK_SIZE"""
+    chunk_size = app.config['STREAM_CHUNK_SIZE']
+    parts = []
+    size = 0
+    for position, idx in enumerate(offsets):
+        entry = format_raw_log_entry(all_logs[idx])
+        if position:
+            entry = '\n' + entry
+        parts.append(entry)
+        size += len(entry)
+        if size >= chunk_size:
+            yield ''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts)
+
+def iter_cm_logs_zip(all_logs, process_index):
+    """Yield a ZIP with one raw log file per CM process, written as it is deflated"""
+    output = StreamBuffer()
+    try:
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for process_key in process_index.processes():
+                offsets = process_index.offsets(process_key)
+                first_log = all_logs[offsets[0]]
+                filename = f"{first_log['processName']}_{first_log['processPid']}.log"
+                with zip_file.open(filename, 'w', force_zip64=True) as member:
+                    for chunk in iter_raw_cm_log(all_logs, offsets):
+                        member.write(chunk.encode('utf-8'))
+                        yield output.drain()
+        yield output.drain()
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated ZIP
+        print(f"Error streaming ZIP: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+class StreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable file that hands written bytes to a generator"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        """Return and forget everything written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+@app.route('/api/get-log-histogram/<cache_key>', methods=['GET'])
+def get_log_histogram(cache_key):
+    """Get per-process/per-level event counts bucketed over time.
+
+    Optional arguments: process and level to filter the series, start and
+    end (epoch seconds, end exclusive) for the window, and either buckets
+    or bucket_seconds for the resolution.
+    """
     try:
-        with zip_ref.open(filename) as log_file:
-            content = log_file.read().decode('utf-8', errors='ignore')
-            return parse_brm_log_content(content, filename)
+        process_name = request.args.get('process', '')
+        level = request.args.get('level', '')
+        start = request.args.get('start', type=int)
+        end = request.args.get('end', type=int)
+        buckets = request.args.get('buckets', 60, type=int)
+        bucket_seconds = request.args.get('bucket_seconds', type=int)
+        
+        bundle = parsed_logs_cache.get(cache_key)
+        if bundle is None:
+            return jsonify({'success': False, 'error': 'Cache expired'}), 404
+        
+        processes = [process_name] if process_name else bundle.process_index.processes()
+        levels = [level] if level else ['E', 'W', 'D']
+        keys = [(process, lvl) for process in processes for lvl in levels]
+        
+        time_index = bundle.time_index
+        if start is None or end is None:
+            bounds = time_index.bounds(keys)
+            if bounds is None:
+                return jsonify({'success': True, 'start': start, 'end': end, 'bucketSeconds': 0,
+                                'buckets': 0, 'series': []})
+            start = bounds[0] if start is None else start
+            end = bounds[1] + 1 if end is None else end
+        if end <= start:
+            return jsonify({'success': False, 'error': 'end must be after start'}), 400
+        
+        if not bucket_seconds:
+            bucket_seconds = -(-(end - start) // max(1, buckets))
+        if bucket_seconds <= 0:
+            return jsonify({'success': False, 'error': 'bucket_seconds must be positive'}), 400
+        buckets = -(-(end - start) // bucket_seconds)
+        if buckets > app.config['HISTOGRAM_MAX_BUCKETS']:
+            return jsonify({'success': False, 'error': f"Maximum {app.config['HISTOGRAM_MAX_BUCKETS']} buckets allowed"}), 400
+        
+        series = []
+        for process, lvl in keys:
+            if (process, lvl) not in time_index.series:
+                continue
+            counts = time_index.counts((process, lvl), start, end, bucket_seconds)
+            series.append({
+                'process': process,
+                'level': lvl,
+                'total': sum(counts),
+                'counts': counts
+            })
+        
+        return jsonify({
+            'success': True,
+            'start': start,
+            'end': end,
+            'bucketSeconds': bucket_seconds,
+            'buckets': buckets,
+            'series': series
+        })
+    
     except Exception as e:
-        print(f"Error processing {filename}: {str(e)}")
-        return []
+        print(f"Error getting log histogram: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/log-cache-stats', methods=['GET'])
+def log_cache_stats():
+    """Get memory use and hit/miss/eviction counters of the parsed log cache"""
+    return jsonify({
+        'success': True,
+        'stats': parsed_logs_cache.stats()
+    })
 
-def build_log_summary(all_logs):
+def build_log_summary(all_logs, process_index):
     """Build summary statistics without sending all logs"""
-    # Add line numbers
-    for idx, log in enumerate(all_logs):
-        log['lineNumber'] = idx + 1
-    
-    # Group by process
-    processes = {}
-    for log in all_logs:
-        process_key = log['process']
-        if process_key not in processes:
-            processes[process_key] = {
-                'process': log['process'],
-                'processName': log['processName'],
-                'processPid': log['processPid'],
-                'errors': 0,
-                'warnings': 0,
-                'debugs': 0,
-                'total': 0
-            }
-        
-        processes[process_key]['total'] += 1
-        if log['level'] == 'E':
-            processes[process_key]['errors'] += 1
-        elif log['level'] == 'W':
-            processes[process_key]['warnings'] += 1
-        elif log['level'] == 'D':
-            processes[process_key]['debugs'] += 1
+    # Group by process, in order of first appearance
+    processes = []
+    for process_key in process_index.processes():
+        first_log = all_logs[process_index.offsets(process_key)[0]]
+        processes.append({
+            'process': first_log['process'],
+            'processName': first_log['processName'],
+            'processPid': first_log['processPid'],
+            'errors': len(process_index.offsets(process_key, 'E')),
+            'warnings': len(process_index.offsets(process_key, 'W')),
+            'debugs': len(process_index.offsets(process_key, 'D')),
+            'total': len(process_index.offsets(process_key))
+        })
     
     # Overall stats
-    total_errors = sum(1 for log in all_logs if log['level'] == 'E')
-    total_warnings = sum(1 for log in all_logs if log['level'] == 'W')
-    total_debugs = sum(1 for log in all_logs if log['level'] == 'D')
+    total_errors = sum(process['errors'] for process in processes)
+    total_warnings = sum(process['warnings'] for process in processes)
+    total_debugs = sum(process['debugs'] for process in processes)
     
     return {
         'totalLogs': len(all_logs),
@@ -551,73 +898,9 @@ def build_log_summary(all_logs):
         'totalErrors': total_errors,
         'totalWarnings': total_warnings,
         'totalDebugs': total_debugs,
-        'processes': list(processes.values())
+        'processes': processes
     }
 
-def parse_brm_log_content(content, filename):
-    """Parse BRM CM log content"""
-    logs = []
-    lines = content.split('\n')
-    i = 0
-    
-    # Pattern: <Level> <Timestamp> <hostname> <process:pid> <file:line> <thread_info>
-    log_header_regex = re.compile(
-        r'^([DEW])\s+'  # Level
-        r'(\w{3}\s+\w{3}\s+\d+\s+\d{2}:\d{2}:\d{2}\s+\d{4})\s+'  # Timestamp
-        r'(\S+)\s+'  # Hostname
-        r'([\w_]+:\d+)\s+'  # Process:PID
-        r'([\w_.]+:\d+)\s+'  # File:Line
-        r'(.+)$'  # Thread info
-    )
-    
-    while i < len(lines):
-        line = lines[i]
-        match = log_header_regex.match(line)
-        
-        if match:
-            level = match.group(1)
-            timestamp = match.group(2)
-            hostname = match.group(3)
-            process = match.group(4)
-            source_file = match.group(5)
-            thread_info = match.group(6)
-            
-            # Get message (next line, typically indented)
-            i += 1
-            message = ''
-            if i < len(lines) and lines[i].strip():
-                message = lines[i].strip()
-                i += 1
-            
-            # Get flist content (until next log entry)
-            flist_lines = []
-            while i < len(lines):
-                next_line = lines[i]
-                if log_header_regex.match(next_line):
-                    break
-                flist_lines.append(next_line)
-                i += 1
-            
-            process_parts = process.split(':')
-            logs.append({
-                'level': level,
-                'timestamp': timestamp,
-                'hostname': hostname,
-                'process': process,
-                'processName': process_parts[0] if process_parts else '',
-                'processPid': process_parts[1] if len(process_parts) > 1 else '',
-                'sourceFile': source_file,
-                'threadInfo': thread_info,
-                'message': message,
-                'flistContent': '\n'.join(flist_lines),
-                'fileName': filename,
-                'rawContent': line
-            })
-        else:
-            i += 1
-    
-    return logs
-
 @app.route('/api/convert-markdown', methods=['POST'])
 def convert_markdown():
     """API endpoint to convert markdown to HTML"""
@@ -650,13 +933,8 @@ def format_xml():
     generate_tree = data.get('generate_tree', False)
     
     try:
-        # Parse and format the XML
-        dom = xml.dom.minidom.parseString(xml_text)
-        formatted_xml = dom.toprettyxml(indent=' ' * indent)
-        
-        # Remove extra blank lines
-        lines = [line for line in formatted_xml.split('\n') if line.strip()]
-        formatted_xml = '\n'.join(lines)
+        # Parse and format the XML in one streaming pass (no DOM)
+        formatted_xml, xml_tree = pretty_xml(xml_text, indent=' ' * indent, tree=generate_tree)
         
         response = {
             'success': True,
@@ -664,10 +942,13 @@ def format_xml():
             'message': 'XML formatted successfully'
         }
         
-        # Generate tree structure if requested
+        # Top levels of the tree; deeper nodes are fetched from /api/xml-tree as they are expanded
         if generate_tree:
-            tree_structure = xml_to_tree(dom.documentElement)
-            response['tree'] = tree_structure
+            xml_trees.add(xml_tree)
+            response['tree_id'] = xml_tree.id
+            response['tree_nodes'] = len(xml_tree)
+            response['tree'] = xml_tree.subtree(0, app.config['XML_TREE_DEPTH'],
+                                                app.config['XML_TREE_MAX_NODES'])
         
         return jsonify(response)
     except Exception as e:
@@ -677,38 +958,31 @@ def format_xml():
             'message': 'Invalid XML format'
         }), 400
 
-def xml_to_tree(element, level=0):
-    """Convert XML element to tree structure"""
-    node = {
-        'name': element.nodeName,
-        'type': 'element',
-        'level': level,
-        'attributes': {},
-        'text': '',
-        'children': []
-    }
-    
-    # Get attributes
-    if element.hasAttributes():
-        for i in range(element.attributes.length):
-            attr = element.attributes.item(i)
-            node['attributes'][attr.name] = attr.value
-    
-    # Get text content (only direct text, not from children)
-    text_content = ''
-    for child in element.childNodes:
-        if child.nodeType == child.TEXT_NODE:
-            text = child.nodeValue.strip()
-            if text:
-                text_content += text
-    node['text'] = text_content
-    
-    # Get child elements
-    for child in element.childNodes:
-        if child.nodeType == child.ELEMENT_NODE:
-            node['children'].append(xml_to_tree(child, level + 1))
+@app.route('/api/xml-tree/<tree_id>/nodes')
+def get_xml_tree_nodes(tree_id):
+    """A node of a formatted document's tree with its descendants, depth levels down.
+
+    The node is given by id or by path (e.g. /flists/flist[3]); after is
+    the last child already loaded, to page through a node with many children.
+    """
+    xml_tree = xml_trees.get(tree_id)
+    if not isinstance(xml_tree, XmlTree):
+        return jsonify({'success': False, 'error': 'Tree expired, please format the XML again'}), 404
+    try:
+        depth = min(int(request.args.get('depth', app.config['XML_TREE_DEPTH'])),
+                    app.config['XML_TREE_MAX_DEPTH'])
+        after = int(request.args.get('after', -1))
+        if 'path' in request.args:
+            node = xml_tree.find(request.args['path'])
+            if node is None:
+                return jsonify({'success': False, 'error': f"No element at {request.args['path']}"}), 404
+        else:
+            node = int(request.args.get('id', 0))
+        result = xml_tree.subtree(node, depth, app.config['XML_TREE_MAX_NODES'], after)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    return node
+    return jsonify({'success': True, 'node': result})
 
 @app.route('/api/epoch-to-datetime', methods=['POST'])
 def epoch_to_datetime():
@@ -839,90 +1113,29 @@ def current_timestamp():
 
 @app.route('/api/compare-text', methods=['POST'])
 def compare_text():
-    """API endpoint to compare two text blocks"""
+    """API endpoint to compare two text blocks
+
+    Unified diffs are returned whole. Side-by-side diffs are returned as the
+    first page of hunks with a diff_id; further pages and the unchanged
+    lines between hunks are fetched from /api/compare-text/<diff_id>/...
+    """
     data = request.get_json()
     text1 = data.get('text1', '')
     text2 = data.get('text2', '')
     comparison_type = data.get('type', 'unified')  # unified or side-by-side
+    algorithm = data.get('algorithm', 'auto')
     
     try:
+        context = diff_context(data.get('context'))
+        
         # Split into lines
         lines1 = text1.splitlines(keepends=True)
         lines2 = text2.splitlines(keepends=True)
         
-        # Get diff
-        if comparison_type == 'unified':
-            # Unified diff format
-            diff = list(difflib.unified_diff(
-                lines1, 
-                lines2, 
-                fromfile='Original', 
-                tofile='Modified',
-                lineterm=''
-            ))
-            
-            return jsonify({
-                'success': True,
-                'type': 'unified',
-                'diff': diff,
-                'stats': get_diff_stats(lines1, lines2)
-            })
-        else:
-            # Side-by-side diff with detailed changes
-            diff_result = []
-            
-            # Use SequenceMatcher for detailed comparison
-            matcher = difflib.SequenceMatcher(None, lines1, lines2)
-            
-            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-                if tag == 'equal':
-                    for i in range(i1, i2):
-                        diff_result.append({
-                            'type': 'equal',
-                            'left_line': i + 1,
-                            'right_line': j1 + (i - i1) + 1,
-                            'left_content': lines1[i].rstrip('\n\r'),
-                            'right_content': lines2[j1 + (i - i1)].rstrip('\n\r') if j1 + (i - i1) < len(lines2) else ''
-                        })
-                elif tag == 'delete':
-                    for i in range(i1, i2):
-                        diff_result.append({
-                            'type': 'delete',
-                            'left_line': i + 1,
-                            'right_line': None,
-                            'left_content': lines1[i].rstrip('\n\r'),
-                            'right_content': ''
-                        })
-                elif tag == 'insert':
-                    for j in range(j1, j2):
-                        diff_result.append({
-                            'type': 'insert',
-                            'left_line': None,
-                            'right_line': j + 1,
-                            'left_content': '',
-                            'right_content': lines2[j].rstrip('\n\r')
-                        })
-                elif tag == 'replace':
-                    # Handle replacements
-                    max_lines = max(i2 - i1, j2 - j1)
-                    for k in range(max_lines):
-                        left_idx = i1 + k
-                        right_idx = j1 + k
-                        
-                        diff_result.append({
-                            'type': 'replace',
-                            'left_line': left_idx + 1 if left_idx < i2 else None,
-                            'right_line': right_idx + 1 if right_idx < j2 else None,
-                            'left_content': lines1[left_idx].rstrip('\n\r') if left_idx < i2 else '',
-                            'right_content': lines2[right_idx].rstrip('\n\r') if right_idx < j2 else ''
-                        })
-            
-            return jsonify({
-                'success': True,
-                'type': 'side-by-side',
-                'diff': diff_result,
-                'stats': get_diff_stats(lines1, lines2)
-            })
+        # Diff once; both views and the stats are built from the same opcodes
+        algorithm = choose_algorithm(algorithm, len(lines1), len(lines2))
+        opcodes = diff_lines(lines1, lines2, algorithm)
+        return jsonify(diff_result(lines1, lines2, opcodes, algorithm, comparison_type, context))
             
     except Exception as e:
         return jsonify({
@@ -931,32 +1144,231 @@ def compare_text():
             'message': 'Error comparing text'
         }), 400
 
-def get_diff_stats(lines1, lines2):
-    """Calculate statistics about the diff"""
-    matcher = difflib.SequenceMatcher(None, lines1, lines2)
+@app.route('/api/compare-text/<diff_id>/hunks')
+def get_diff_hunks(diff_id):
+    """Next page of side-by-side hunks of a comparison, from hunk/row on"""
+    diff_session = diff_sessions.get(diff_id)
+    if not isinstance(diff_session, DiffSession):
+        return jsonify({'success': False, 'error': 'Comparison expired, please compare again'}), 404
+    try:
+        context = diff_context(request.args.get('context'))
+        hunk = max(0, int(request.args.get('hunk', 0)))
+        row = max(0, int(request.args.get('row', 0)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    added = 0
-    deleted = 0
-    modified = 0
+    result = {'success': True, 'algorithm': diff_session.algorithm}
+    result.update(diff_session.page(context, hunk, row, app.config['DIFF_PAGE_ROWS']))
+    return jsonify(result)
+
+@app.route('/api/compare-text/<diff_id>/lines')
+def get_diff_lines(diff_id):
+    """Unchanged lines of a collapsed region, up to DIFF_PAGE_ROWS at a time"""
+    diff_session = diff_sessions.get(diff_id)
+    if not isinstance(diff_session, DiffSession):
+        return jsonify({'success': False, 'error': 'Comparison expired, please compare again'}), 404
+    try:
+        left_line = int(request.args.get('left_line', 1))
+        right_line = int(request.args.get('right_line', 1))
+        count = min(int(request.args.get('count', 0)), app.config['DIFF_PAGE_ROWS'])
+        rows = diff_session.equal_rows(left_line, right_line, count)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        if tag == 'insert':
-            added += (j2 - j1)
-        elif tag == 'delete':
-            deleted += (i2 - i1)
-        elif tag == 'replace':
-            modified += max(i2 - i1, j2 - j1)
+    return jsonify({'success': True, 'rows': rows})
+
+def diff_result(lines1, lines2, opcodes, algorithm, comparison_type, context,
+                fromfile='Original', tofile='Modified', paths=()):
+    """Response for a computed diff: the whole unified diff, or the first side-by-side page.
+
+    paths are files the lines are mapped from; a side-by-side diff session
+    takes them over and removes them when it expires.
+    """
+    stats = diff_stats(opcodes, len(lines1), len(lines2))
     
-    similarity = matcher.ratio() * 100
+    if comparison_type == 'unified':
+        # Unified diff format
+        diff = list(unified_diff(
+            lines1, 
+            lines2, 
+            opcodes,
+            fromfile=fromfile, 
+            tofile=tofile,
+            n=context,
+            lineterm=''
+        ))
+        
+        return {
+            'success': True,
+            'type': 'unified',
+            'algorithm': algorithm,
+            'diff': diff,
+            'stats': stats
+        }
     
-    return {
-        'total_lines_left': len(lines1),
-        'total_lines_right': len(lines2),
-        'lines_added': added,
-        'lines_deleted': deleted,
-        'lines_modified': modified,
-        'similarity_percent': round(similarity, 2)
+    # Side-by-side hunks, paged from a diff session
+    diff_session = diff_sessions.add(DiffSession(lines1, lines2, opcodes, algorithm, paths))
+    result = {
+        'success': True,
+        'type': 'side-by-side',
+        'algorithm': algorithm,
+        'stats': stats
     }
+    result.update(diff_session.page(context, max_rows=app.config['DIFF_PAGE_ROWS']))
+    return result
+
+@app.route('/api/compare-files', methods=['POST'])
+def compare_files():
+    """API endpoint to compare uploaded files
+
+    file1 and file2 are compared line by line, memory-mapped rather than
+    decoded. If both are ZIPs, the archives are compared member by member
+    instead and the members can then be diffed through
+    /api/compare-files/<compare_id>/member. member1 and member2 select two
+    members to diff directly: one from each ZIP, or both from file1 when
+    file2 is not given. type, algorithm and context are as for
+    /api/compare-text.
+    """
+    paths = []
+    try:
+        file1 = request.files.get('file1')
+        file2 = request.files.get('file2')
+        member1 = request.form.get('member1', '')
+        member2 = request.form.get('member2', '')
+        if file1 is None or file1.filename == '':
+            return jsonify({'success': False, 'error': 'No file provided'}), 400
+        if (file2 is None or file2.filename == '') and not (member1 and member2):
+            return jsonify({'success': False, 'error': 'Select two files, or two members of a ZIP'}), 400
+        comparison_type = request.form.get('type', 'unified')
+        algorithm = request.form.get('algorithm', 'auto')
+        context = diff_context(request.form.get('context'))
+        
+        uploads = [file1] if file2 is None or file2.filename == '' else [file1, file2]
+        for upload in uploads:
+            path, _, _ = spool_upload(upload, COMPARE_DIR, '.part')
+            paths.append(path)
+        
+        if member1 and member2:
+            zip1 = paths[0]
+            zip2 = paths[-1]
+            if not (zipfile.is_zipfile(zip1) and zipfile.is_zipfile(zip2)):
+                return jsonify({'success': False, 'error': 'Members can only be selected from ZIP files'}), 400
+            member_paths = spool_members([(zip1, member1), (zip2, member2)])
+            result = compare_mapped(member_paths, member1, member2, comparison_type, algorithm, context)
+        elif zipfile.is_zipfile(paths[0]) and zipfile.is_zipfile(paths[1]):
+            comparison = diff_sessions.add(ArchiveComparison(paths[0], paths[1]))
+            paths = []  # Removed with the comparison
+            result = {
+                'success': True,
+                'type': 'archive',
+                'compare_id': comparison.id,
+                'counts': comparison.counts(),
+                'members': comparison.members
+            }
+        else:
+            result = compare_mapped(paths, file1.filename, file2.filename, comparison_type, algorithm,
+                                    context)
+            paths = []  # Removed by compare_mapped or its diff session
+        return jsonify(result)
+    
+    except (KeyError, ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'success': False, 'error': str(e), 'message': 'Error comparing files'}), 400
+    except Exception as e:
+        print(f"Error comparing files: {str(e)}")
+        return jsonify({'success': False, 'error': str(e), 'message': 'Error comparing files'}), 500
+    finally:
+        remove_files(paths)
+
+@app.route('/api/compare-files/<compare_id>/member', methods=['GET'])
+def compare_archive_member(compare_id):
+    """Diff one member of two compared ZIPs (name, or left and right for renamed members)"""
+    comparison = diff_sessions.get(compare_id)
+    if not isinstance(comparison, ArchiveComparison):
+        return jsonify({'success': False, 'error': 'Comparison expired, please upload the files again'}), 404
+    
+    name = request.args.get('name', '')
+    left = request.args.get('left', name)
+    right = request.args.get('right', name)
+    try:
+        context = diff_context(request.args.get('context'))
+        info1 = comparison.members1.get(left)
+        info2 = comparison.members2.get(right)
+        if info1 is None and info2 is None:
+            return jsonify({'success': False, 'error': 'Member not found'}), 404
+        
+        # A member missing on one side is diffed against an empty file
+        member_paths = spool_members([(comparison.paths[0], info1.filename if info1 else None),
+                                      (comparison.paths[1], info2.filename if info2 else None)])
+        result = compare_mapped(member_paths, left, right, request.args.get('type', 'unified'),
+                                request.args.get('algorithm', 'auto'), context)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e), 'message': 'Error comparing files'}), 400
+    except Exception as e:
+        print(f"Error comparing archive member: {str(e)}")
+        return jsonify({'success': False, 'error': str(e), 'message': 'Error comparing files'}), 500
+    
+    result['name'] = name or left
+    result['status'] = next((member['status'] for member in comparison.members
+                             if member['name'] == left), None)
+    return jsonify(result)
+
+def compare_mapped(paths, name1, name2, comparison_type, algorithm, context):
+    """Diff two files by memory-mapping them and hashing their lines to ids.
+
+    Takes ownership of paths: they go to the side-by-side diff session, or
+    are removed once a unified diff is built.
+    """
+    handed_over = False
+    try:
+        ids = {}
+        lines1, ids1 = map_lines(open_buffer(paths[0]), ids)
+        lines2, ids2 = map_lines(open_buffer(paths[1]), ids)
+        del ids
+        algorithm = choose_algorithm(algorithm, len(ids1), len(ids2))
+        opcodes = diff_ids(ids1, ids2, algorithm)
+        del ids1, ids2
+        result = diff_result(lines1, lines2, opcodes, algorithm, comparison_type, context,
+                             fromfile=name1, tofile=name2, paths=paths)
+        handed_over = result['type'] == 'side-by-side'
+        return result
+    finally:
+        if not handed_over:
+            remove_files(paths)
+
+def spool_members(members):
+    """Extract (ZIP path, member name) pairs to files in COMPARE_DIR.
+
+    A name of None gives an empty file. The caller owns the files; if one
+    extraction fails, the files already written are removed.
+    """
+    chunk_size = app.config['UPLOAD_CHUNK_SIZE']
+    paths = []
+    try:
+        for zip_path, name in members:
+            fd, path = tempfile.mkstemp(suffix='.part', dir=COMPARE_DIR)
+            paths.append(path)
+            with os.fdopen(fd, 'wb') as out:
+                if name is None:
+                    continue
+                with zipfile.ZipFile(zip_path) as zip_ref, zip_ref.open(name) as member:
+                    while True:
+                        chunk = member.read(chunk_size)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+    except Exception:
+        remove_files(paths)
+        raise
+    return paths
+
+def diff_context(value):
+    """Context lines around each change, DIFF_CONTEXT_LINES if value is not given"""
+    if value in (None, ''):
+        return app.config['DIFF_CONTEXT_LINES']
+    context = int(value)
+    if context < 0 or context > app.config['DIFF_MAX_CONTEXT_LINES']:
+        raise ValueError(f"Context must be between 0 and {app.config['DIFF_MAX_CONTEXT_LINES']} lines")
+    return context
 
 @app.route('/api/send-request', methods=['POST'])
 def send_request():
@@ -0,0 +1,291 @@
+"""Parse and API latency benchmark for the BRM CM log viewer.
+
+Generates a synthetic bundle (see pinlog_generator) or uses --zip, then
+measures through the Flask test client:
+
+  - parse throughput of parse_brm_log_content and of a full upload
+    (/api/parse-brm-logs until its job is done), in MB/s of log data
+  - build_log_summary time over the parsed bundle
+  - search over every record with the SearchIndex and with the linear
+    scan it replaces, for common and rare terms (results must agree)
+  - p50/p99 latency of get-process-logs, get-unique-errors and
+    get-complete-logs over randomised requests
+  - peak RSS of the benchmark process (and of parser worker processes)
+
+The bundle is stored in a temporary cache directory, not the app's.
+Results are printed and, with --output, written to JSON for compare.py.
+
+    python benchmarks/api_bench.py --size-mb 50 --requests 200 --output before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import app as app_module  # noqa: E402
+import brm_parser  # noqa: E402
+from log_cache import LogCache  # noqa: E402
+from log_index import matches_search, parse_search_terms  # noqa: E402
+import log_store  # noqa: E402
+from pinlog_generator import generate_bundle  # noqa: E402
+
+MB = 1024 * 1024
+
+# Search terms of the search benchmarks: common ones first, then rare ones
+SEARCH_TERMS = ('error', 'PCM_OP_SEARCH', 'account', 'PIN_FLD_POID', 'not found', 'rror', 'zzqx')
+
+
+def peak_rss():
+    """Peak resident set size in bytes of this process and of its finished children"""
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is in KB on Linux
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    }
+
+
+def latency_stats(samples):
+    """p50/p99/mean/max in milliseconds of latency samples in seconds"""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        'requests': len(ordered),
+        'p50Ms': round(percentile(50), 3),
+        'p99Ms': round(percentile(99), 3),
+        'meanMs': round(sum(ordered) / len(ordered) * 1000, 3),
+        'maxMs': round(ordered[-1] * 1000, 3)
+    }
+
+
+def bench_parse_content(zip_path, repeat):
+    """MB/s of parse_brm_log_content over the first member of the bundle"""
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        name = zip_ref.namelist()[0]
+        content = zip_ref.read(name)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        logs = brm_parser.parse_brm_log_content(content, name)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'bytes': len(content),
+        'records': len(logs),
+        'seconds': round(best, 4),
+        'mbPerSecond': round(len(content) / MB / best, 2)
+    }
+
+
+def bench_upload(client, zip_path, data_size):
+    """Upload the bundle and wait for its parse job; returns (cache key, result)"""
+    started = time.perf_counter()
+    with open(zip_path, 'rb') as f:
+        response = client.post('/api/parse-brm-logs', data={'file': (f, 'bench.zip')},
+                               content_type='multipart/form-data')
+    result = response.get_json()
+    while result.get('success') and not result.get('summary'):
+        time.sleep(0.05)
+        result = client.get(f"/api/parse-jobs/{result['jobId']}").get_json()
+        if result.get('state') == 'failed':
+            break
+    if not result.get('summary'):
+        raise RuntimeError(f"Parse failed: {result.get('error')}")
+    elapsed = time.perf_counter() - started
+    return result['cacheKey'], {
+        'bytes': data_size,
+        'records': result['summary']['totalLogs'],
+        'processes': result['summary']['totalProcesses'],
+        'seconds': round(elapsed, 4),
+        'mbPerSecond': round(data_size / MB / elapsed, 2)
+    }
+
+
+def bench_summary(cache_key, repeat):
+    """Seconds to build the summary of a parsed bundle"""
+    bundle = app_module.parsed_logs_cache.get(cache_key)
+    logs = bundle.logs
+    process_index = bundle.process_index
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        app_module.build_log_summary(logs, process_index)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {'records': len(logs), 'seconds': round(best, 4)}
+
+
+def bench_search(cache_key, repeat):
+    """Seconds to search every record per term, with the index and with a linear scan"""
+    bundle = app_module.parsed_logs_cache.get(cache_key)
+    logs = bundle.logs
+    offsets = list(range(len(logs)))
+    results = {}
+    for query in SEARCH_TERMS:
+        terms = parse_search_terms(query)
+        timings = {}
+        found = {}
+        for name, search in (
+                ('index', lambda: bundle.search_index.search(logs, offsets, terms)),
+                ('linear', lambda: [idx for idx in offsets if matches_search(logs[idx], terms)])):
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                found[name] = list(search())
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+        if found['index'] != found['linear']:
+            raise RuntimeError(f'{query}: index and linear search disagree')
+        results[query] = {'matches': len(found['index']),
+                          'indexSeconds': round(timings['index'], 4),
+                          'linearSeconds': round(timings['linear'], 4),
+                          'speedup': round(timings['linear'] / max(timings['index'], 1e-9), 1)}
+    return results
+
+
+def endpoint_requests(cache_key, summary, file_lines, rng, count):
+    """Randomised request URLs per endpoint, like a user paging and filtering"""
+    processes = [process['process'] for process in summary['processes']]
+    files = list(file_lines)
+    words = SEARCH_TERMS[:5]
+    urls = {'get-process-logs': [], 'get-process-logs-search': [],
+            'get-unique-errors': [], 'get-complete-logs': []}
+    for _ in range(count):
+        process = rng.choice(processes)
+        level = rng.choice(['', 'E', 'W', 'D'])
+        urls['get-process-logs'].append(
+            f'/api/get-process-logs/{cache_key}/{process}?page={rng.randint(1, 50)}&per_page=100&level={level}')
+        urls['get-process-logs-search'].append(
+            f'/api/get-process-logs/{cache_key}/{process}?search={rng.choice(words)}&per_page=100')
+        urls['get-unique-errors'].append(
+            f'/api/get-unique-errors/{cache_key}/{process}?from_line={rng.randint(0, 1000)}')
+        name = rng.choice(files)
+        from_line = rng.randint(1, max(1, file_lines[name] - 1000))
+        urls['get-complete-logs'].append(
+            f'/api/get-complete-logs/{cache_key}?file_name={name}&from_line={from_line}'
+            f'&to_line={from_line + 999}')
+    return urls
+
+
+def bench_endpoints(client, urls_by_endpoint):
+    """Latency stats per endpoint; the first (cold) request is reported on its own"""
+    results = {}
+    for endpoint, urls in urls_by_endpoint.items():
+        samples = []
+        for url in urls:
+            started = time.perf_counter()
+            response = client.get(url)
+            samples.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url}: HTTP {response.status_code}')
+        stats = latency_stats(samples[1:] or samples)
+        stats['firstMs'] = round(samples[0] * 1000, 3)
+        results[endpoint] = stats
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark BRM log parsing and the log viewer API')
+    parser.add_argument('--zip', help='existing bundle to use instead of a generated one')
+    parser.add_argument('--size-mb', type=float, default=20, help='size of the generated logs')
+    parser.add_argument('--files', type=int, default=2)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--flist-depth', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each micro-benchmark (best is kept)')
+    parser.add_argument('--parse-mode', choices=['process', 'thread'],
+                        help="override BRM_PARSE_MODE (default: the app's)")
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='brm-bench-')
+    try:
+        zip_path = args.zip
+        if zip_path is None:
+            zip_path = os.path.join(work_dir, 'bench.zip')
+            generate_bundle(zip_path, args.size_mb, files=args.files, processes=args.processes,
+                            error_rate=args.error_rate, flist_depth=args.flist_depth, seed=args.seed)
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            data_size = sum(info.file_size for info in zip_ref.infolist())
+
+        # Keep the benchmark's bundles out of the app's own cache
+        cache_dir = os.path.join(work_dir, 'log_cache')
+        os.makedirs(cache_dir)
+        app_module.CACHE_DIR = cache_dir
+        app_module.parsed_logs_cache = LogCache(
+            loader=lambda cache_key: log_store.open_bundle(cache_dir, cache_key),
+            max_bytes=app_module.app.config['LOG_CACHE_MAX_BYTES'],
+            ttl=app_module.app.config['LOG_CACHE_TTL'])
+        app_module.app.config['PARSE_JOB_WAIT'] = 0
+        if args.parse_mode:
+            app_module.app.config['BRM_PARSE_MODE'] = args.parse_mode
+        client = app_module.app.test_client()
+
+        results = {}
+        results['parseContent'] = bench_parse_content(zip_path, args.repeat)
+        print(f"parse_brm_log_content: {results['parseContent']['mbPerSecond']} MB/s")
+        cache_key, results['upload'] = bench_upload(client, zip_path, data_size)
+        print(f"upload + parse: {results['upload']['mbPerSecond']} MB/s "
+              f"({results['upload']['records']} records in {results['upload']['seconds']}s)")
+        results['buildLogSummary'] = bench_summary(cache_key, args.repeat)
+        print(f"build_log_summary: {results['buildLogSummary']['seconds']}s")
+        results['search'] = bench_search(cache_key, args.repeat)
+        for query, stats in results['search'].items():
+            print(f"search {query!r}: index {stats['indexSeconds']}s, linear {stats['linearSeconds']}s "
+                  f"({stats['speedup']}x, {stats['matches']} matches)")
+
+        summary = app_module.parsed_logs_cache.get(cache_key).summary
+        file_list = client.get(f'/api/get-file-list/{cache_key}').get_json()['files']
+        file_lines = {entry['name']: entry['lines'] for entry in file_list}
+        urls = endpoint_requests(cache_key, summary, file_lines, random.Random(args.seed),
+                                 args.requests)
+        results['endpoints'] = bench_endpoints(client, urls)
+        for endpoint, stats in results['endpoints'].items():
+            print(f"{endpoint}: p50 {stats['p50Ms']}ms  p99 {stats['p99Ms']}ms  first {stats['firstMs']}ms")
+        results['peakRss'] = peak_rss()
+        print(f"peak RSS: {results['peakRss']['self'] / MB:.1f} MB")
+
+        report = {
+            'benchmark': 'api',
+            'revision': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'parseMode': app_module.app.config['BRM_PARSE_MODE'],
+            'config': vars(args),
+            'results': results
+        }
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Read throughput of LogCache under concurrent lookups.
+
+Every thread looks up random cached bundles and, for each lookup, does a
+fixed amount of request work that releases the GIL (hashing a buffer), as
+a request handler does around its cache lookup. Mode 'cache' uses
+LogCache as is; mode 'global' also holds one process-wide lock across the
+lookup and the work, as the log viewer did with its single cache lock.
+With the cache, throughput scales with the threads until the cores run
+out; with the global lock it stays flat.
+
+    python benchmarks/cache_concurrency.py --threads 1 2 4 8 --output cache.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_cache import LogCache  # noqa: E402
+
+
+class _Bundle:
+    """Bundle with nothing loaded, enough for LogCache's bookkeeping"""
+
+    def __init__(self, cache_key):
+        self.summary = {'cacheKey': cache_key}
+        self.loaded_logs = None
+        self.loaded_process_index = None
+        self.loaded_search_index = None
+        self.loaded_error_index = None
+        self.loaded_correlation_index = None
+        self.loaded_time_index = None
+        self.loaded_raw_files = None
+        self.on_load = None
+
+
+def run(mode, threads, bundles, duration, work_bytes):
+    """Lookups per second over duration seconds with the given number of threads"""
+    cache = LogCache(loader=_Bundle, max_bytes=1 << 40, ttl=0)
+    keys = [f'{idx:032x}' for idx in range(bundles)]
+    for key in keys:
+        cache.get(key)
+    global_lock = threading.Lock()
+    payload = os.urandom(work_bytes)
+    counts = [0] * threads
+    stop = threading.Event()
+    start = threading.Barrier(threads + 1)
+
+    def worker(slot):
+        rng = random.Random(slot)
+        start.wait()
+        count = 0
+        while not stop.is_set():
+            key = rng.choice(keys)
+            if mode == 'global':
+                with global_lock:
+                    cache.get(key)
+                    hashlib.blake2b(payload).digest()
+            else:
+                cache.get(key)
+                hashlib.blake2b(payload).digest()
+            count += 1
+        counts[slot] = count
+
+    pool = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    for thread in pool:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    return {
+        'mode': mode,
+        'threads': threads,
+        'lookups': sum(counts),
+        'seconds': round(elapsed, 3),
+        'lookupsPerSecond': round(sum(counts) / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--modes', nargs='+', default=['cache', 'global'], choices=['cache', 'global'])
+    parser.add_argument('--bundles', type=int, default=16, help='cached bundles looked up at random')
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds per run')
+    parser.add_argument('--work-bytes', type=int, default=64 * 1024,
+                        help='bytes hashed per lookup as stand-in request work')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        for threads in args.threads:
+            result = run(mode, threads, args.bundles, args.duration, args.work_bytes)
+            print(f"{mode:>6} {threads:>3} threads: {result['lookupsPerSecond']:>12,.0f} lookups/s")
+            results.append(result)
+
+    report = {'benchmark': 'cache_concurrency', 'cpus': os.cpu_count(), 'config': vars(args),
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Compare two benchmark result files written with --output.
+
+Prints every numeric result of the baseline next to the candidate's and
+the relative change, e.g.
+
+    python benchmarks/compare.py before.json after.json
+"""
+import argparse
+import json
+
+
+def flatten(value, prefix=''):
+    """{dotted path: number} for the numeric leaves of a result tree"""
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: value}
+    items = {}
+    if isinstance(value, dict):
+        children = value.items()
+    elif isinstance(value, list):
+        # Lists of runs are keyed by what identifies a run rather than position
+        children = ((_run_label(item, idx), item) for idx, item in enumerate(value))
+    else:
+        return items
+    for key, child in children:
+        items.update(flatten(child, f'{prefix}.{key}' if prefix else str(key)))
+    return items
+
+
+def _run_label(item, idx):
+    if isinstance(item, dict):
+        label = ','.join(f'{key}={item[key]}' for key in ('mode', 'threads') if key in item)
+        if label:
+            return f'[{label}]'
+    return f'[{idx}]'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline.get('benchmark') != candidate.get('benchmark'):
+        parser.error('the files are from different benchmarks')
+
+    before = flatten(baseline['results'])
+    after = flatten(candidate['results'])
+    width = max(map(len, before), default=0)
+    print(f"{'':<{width}}  {baseline.get('revision') or 'baseline':>12}  "
+          f"{candidate.get('revision') or 'candidate':>12}  change")
+    for key, old in before.items():
+        new = after.get(key)
+        if new is None:
+            continue
+        change = f'{(new - old) / old * 100:+.1f}%' if old else ''
+        print(f'{key:<{width}}  {old:>12,.3f}  {new:>12,.3f}  {change}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Diff engine benchmark for the File Compare tool.
+
+Generates a config-like text and a mutated copy of it, then times:
+
+  - the previous /api/compare-text path: difflib opcodes plus a second
+    SequenceMatcher for the stats (skipped above --difflib-max-lines,
+    where it takes minutes)
+  - each diff_engine algorithm, opcodes and stats together
+  - /api/compare-text through the Flask test client with each algorithm
+
+With --dissimilar the second text is generated independently instead of
+mutated, the case where the engines find no useful anchors; with
+--time-limit the script fails if any engine or request takes longer:
+
+    python benchmarks/diff_bench.py --lines 100000 --change-rate 0.01 --output diff.json
+    python benchmarks/diff_bench.py --lines 40000 --dissimilar --time-limit 10
+
+Results are printed and, with --output, written to JSON for compare.py.
+"""
+import argparse
+import difflib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import app as app_module  # noqa: E402
+import diff_engine  # noqa: E402
+
+ENGINES = ('histogram', 'patience', 'myers', 'difflib')
+
+
+def generate_text(lines, seed):
+    """Config-like text: sections of key = value lines with repeated braces and blank lines"""
+    rng = random.Random(seed)
+    out = []
+    section = 0
+    while len(out) < lines:
+        out.append(f'[section_{section}] {{')
+        for _ in range(rng.randint(5, 40)):
+            out.append(f'    key_{rng.randint(1, 500)} = value_{rng.randint(1, 10 ** 6)}')
+        out.append('}')
+        out.append('')
+        section += 1
+    return out[:lines]
+
+
+def mutate(lines, change_rate, seed):
+    """A copy of lines with about change_rate of them replaced, inserted or deleted"""
+    rng = random.Random(seed)
+    out = []
+    for line in lines:
+        if rng.random() >= change_rate:
+            out.append(line)
+            continue
+        action = rng.randrange(3)
+        if action == 0:
+            out.append(f'    changed_{rng.randint(1, 10 ** 6)} = {rng.randint(1, 10 ** 6)}')
+        elif action == 1:
+            out.append(line)
+            out.append(f'    added_{rng.randint(1, 10 ** 6)} = {rng.randint(1, 10 ** 6)}')
+    return out
+
+
+def best_of(repeat, func):
+    """(best seconds, last result) of repeat calls to func"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def previous_path(lines1, lines2):
+    """Opcodes and similarity the way compare_text computed them before diff_engine"""
+    opcodes = difflib.SequenceMatcher(None, lines1, lines2).get_opcodes()
+    similarity = difflib.SequenceMatcher(None, lines1, lines2).ratio() * 100
+    return opcodes, round(similarity, 2)
+
+
+def engine_path(lines1, lines2, algorithm):
+    opcodes = diff_engine.diff_lines(lines1, lines2, algorithm)
+    stats = diff_engine.diff_stats(opcodes, len(lines1), len(lines2))
+    return opcodes, stats['similarity_percent']
+
+
+def changed_lines(opcodes):
+    return sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in opcodes if tag != 'equal')
+
+
+def bench_endpoint(client, text1, text2, algorithm, view, repeat):
+    def post():
+        response = client.post('/api/compare-text', json={
+            'text1': text1, 'text2': text2, 'type': view, 'algorithm': algorithm})
+        if response.status_code != 200:
+            raise RuntimeError(f'{algorithm}: HTTP {response.status_code}')
+        return response
+    seconds, _ = best_of(repeat, post)
+    return round(seconds, 4)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the File Compare diff engines')
+    parser.add_argument('--lines', type=int, default=50000, help='lines in the original text')
+    parser.add_argument('--change-rate', type=float, default=0.01, help='fraction of lines changed')
+    parser.add_argument('--dissimilar', action='store_true',
+                        help='compare against an unrelated text instead of a mutated copy')
+    parser.add_argument('--time-limit', type=float,
+                        help='exit with an error if any run takes longer than this many seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each measurement (best is kept)')
+    parser.add_argument('--difflib-max-lines', type=int, default=20000,
+                        help='skip the difflib runs above this many lines per side')
+    parser.add_argument('--view', choices=['side-by-side', 'unified'], default='side-by-side',
+                        help='view requested from /api/compare-text')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    lines1 = [line + '\n' for line in generate_text(args.lines, args.seed)]
+    if args.dissimilar:
+        lines2 = [line + '\n' for line in generate_text(args.lines, args.seed + 1)]
+    else:
+        lines2 = [line + '\n' for line in mutate([line[:-1] for line in lines1], args.change_rate,
+                                                 args.seed + 1)]
+    text1 = ''.join(lines1)
+    text2 = ''.join(lines2)
+    run_difflib = max(len(lines1), len(lines2)) <= args.difflib_max_lines
+    print(f'{len(lines1)} -> {len(lines2)} lines')
+
+    results = {'lines': {'left': len(lines1), 'right': len(lines2)}, 'engines': {}, 'endpoint': {}}
+    if run_difflib:
+        seconds, (opcodes, similarity) = best_of(args.repeat, lambda: previous_path(lines1, lines2))
+        results['engines']['previous'] = {'seconds': round(seconds, 4),
+                                          'changedLines': changed_lines(opcodes),
+                                          'similarity': similarity}
+    for algorithm in ENGINES:
+        if algorithm == 'difflib' and not run_difflib:
+            continue
+        seconds, (opcodes, similarity) = best_of(
+            args.repeat, lambda: engine_path(lines1, lines2, algorithm))
+        results['engines'][algorithm] = {'seconds': round(seconds, 4),
+                                         'changedLines': changed_lines(opcodes),
+                                         'similarity': similarity}
+    for name, result in results['engines'].items():
+        print(f"{name}: {result['seconds']}s, {result['changedLines']} changed lines, "
+              f"{result['similarity']}% similar")
+
+    client = app_module.app.test_client()
+    for algorithm in ('auto',) + ENGINES:
+        if algorithm == 'difflib' and not run_difflib:
+            continue
+        results['endpoint'][algorithm] = {
+            'seconds': bench_endpoint(client, text1, text2, algorithm, args.view, args.repeat)}
+        print(f"/api/compare-text ({algorithm}): {results['endpoint'][algorithm]['seconds']}s")
+
+    report = {
+        'benchmark': 'diff',
+        'revision': git_revision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.time_limit is not None:
+        slow = [f'{name} ({result["seconds"]}s)'
+                for group in ('engines', 'endpoint') for name, result in results[group].items()
+                if result['seconds'] > args.time_limit]
+        if slow:
+            print(f'Over the {args.time_limit}s limit: ' + ', '.join(slow))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Synthetic BRM CM pinlog generator for the benchmarks.
+
+Writes CM logs in the format the log viewer parses: a header line per
+record, a message line and, for most records, an input flist nested down
+to a configurable depth. Output is deterministic for a given seed.
+
+    python benchmarks/pinlog_generator.py bundle.zip --size-mb 50 --processes 8 \\
+        --error-rate 0.05 --flist-depth 3
+"""
+import argparse
+import random
+import time
+import zipfile
+
+OPCODES = ('PCM_OP_READ_OBJ', 'PCM_OP_WRITE_FLDS', 'PCM_OP_CUST_COMMIT_CUSTOMER',
+           'PCM_OP_BILL_MAKE_BILL', 'PCM_OP_SEARCH', 'PCM_OP_PYMT_COLLECT')
+SOURCES = ('fm_utils.c', 'fm_bill_utils.c', 'fm_cust_pol.c', 'cm_child.c', 'pcm_ops.c')
+POID_TYPES = ('/account', '/service', '/bill', '/item/misc', '/event/billing/product/fee/cycle')
+FIELDS = (('PIN_FLD_STATUS', 'ENUM'), ('PIN_FLD_NAME', 'STR'), ('PIN_FLD_AMOUNT', 'DECIMAL'),
+          ('PIN_FLD_START_T', 'TSTAMP'), ('PIN_FLD_FLAGS', 'INT'), ('PIN_FLD_ACCOUNT_OBJ', 'POID'))
+CONTAINERS = ('PIN_FLD_BALANCES', 'PIN_FLD_SERVICES', 'PIN_FLD_PRODUCTS', 'PIN_FLD_RESULTS')
+ERROR_MESSAGES = ('op_cust_commit error: account {} not found', 'bad poid {} in input flist',
+                  'DM returned error 0x{:x} for search', 'PIN_ERR_STORAGE on object {}')
+MESSAGES = ('{} input flist', '{} return flist', 'dispatching {}', 'txn commit for {}')
+
+START_EPOCH = 1736157600  # Mon Jan  6 10:00:00 2025 UTC
+
+
+def generate_pinlog(out, size, processes=4, error_rate=0.05, warn_rate=0.1, flist_depth=2,
+                    flist_rate=0.7, seed=1, host='brmhost01'):
+    """Write about size bytes of CM log records to the binary file out; returns the record count"""
+    rng = random.Random(seed)
+    process_keys = [f"{'cm' if idx % 4 else 'dm_oracle'}:{10000 + idx}" for idx in range(processes)]
+    written = 0
+    count = 0
+    while written < size:
+        draw = rng.random()
+        level = 'E' if draw < error_rate else 'W' if draw < error_rate + warn_rate else 'D'
+        epoch = START_EPOCH + count // 20
+        moment = time.gmtime(epoch)
+        timestamp = (f"{time.strftime('%a %b', moment)} {moment.tm_mday:2d} "
+                     f"{time.strftime('%H:%M:%S %Y', moment)}")
+        opcode = rng.choice(OPCODES)
+        lines = [
+            f"{level} {timestamp}  {host}  {rng.choice(process_keys)}  "
+            f"{rng.choice(SOURCES)}:{rng.randint(1, 5000)} "
+            f"1:{host}:pin_deferred_act:{rng.randint(1000, 9999)}:{rng.randint(1, 64)}:0:{epoch}:{count}"
+        ]
+        if level == 'E':
+            lines.append('\t' + rng.choice(ERROR_MESSAGES).format(rng.randint(1, 10 ** 6)))
+        else:
+            lines.append('\t' + rng.choice(MESSAGES).format(opcode))
+        if rng.random() < flist_rate:
+            _flist(lines, rng, flist_depth)
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        out.write(data)
+        written += len(data)
+        count += 1
+    return count
+
+
+def _flist(lines, rng, depth, level=0):
+    if level == 0:
+        lines.append(f"0 PIN_FLD_POID           POID [0] 0.0.0.1 {rng.choice(POID_TYPES)} "
+                     f"{rng.randint(1, 10 ** 7)} 0")
+    for _ in range(rng.randint(1, 4)):
+        name, field_type = rng.choice(FIELDS)
+        if field_type == 'POID':
+            value = f"0.0.0.1 /account {rng.randint(1, 10 ** 7)} 0"
+        elif field_type == 'STR':
+            value = f'"value {rng.randint(1, 999)}"'
+        else:
+            value = str(rng.randint(0, 10 ** 6))
+        lines.append(f"{level} {name:<22} {field_type:>7} [0] {value}")
+    if level + 1 < depth:
+        lines.append(f"{level} {rng.choice(CONTAINERS):<22}   ARRAY [{rng.randint(0, 9)}] allocated 20, used 4")
+        _flist(lines, rng, depth, level + 1)
+
+
+def generate_bundle(zip_path, size_mb, files=2, **options):
+    """Write a ZIP of files CM logs totalling about size_mb MB; returns the record count"""
+    seed = options.pop('seed', 1)
+    size = int(size_mb * 1024 * 1024 / files)
+    count = 0
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for idx in range(files):
+            with zip_ref.open(f'cm{idx}.pinlog', 'w', force_zip64=True) as out:
+                count += generate_pinlog(out, size, seed=seed + idx, **options)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic BRM CM log bundle (ZIP)')
+    parser.add_argument('output', help='ZIP file to write')
+    parser.add_argument('--size-mb', type=float, default=10, help='uncompressed size of all logs')
+    parser.add_argument('--files', type=int, default=2, help='log files in the bundle')
+    parser.add_argument('--processes', type=int, default=4, help='CM/DM processes per file')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='fraction of level E records')
+    parser.add_argument('--warn-rate', type=float, default=0.1, help='fraction of level W records')
+    parser.add_argument('--flist-depth', type=int, default=2, help='nesting levels of the flists')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    count = generate_bundle(args.output, args.size_mb, files=args.files, processes=args.processes,
+                            error_rate=args.error_rate, warn_rate=args.warn_rate,
+                            flist_depth=args.flist_depth, seed=args.seed)
+    print(f"Wrote {count} records to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
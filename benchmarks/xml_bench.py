@@ -0,0 +1,178 @@
+"""XML Formatter benchmark: the streaming pretty-printer against minidom.
+
+Generates a PIN flist XML export of --size-mb and formats it with:
+
+  - minidom: parseString + toprettyxml + the blank-line filter, the
+    /api/format-xml path before xml_stream (skipped above --minidom-max-mb)
+  - stream: xml_stream.pretty_xml, with and without the tree view node table
+
+reporting MB/s and, with --memory, the peak traced allocation of each
+(measured in a separate run, as tracing slows everything down). Outputs
+are checked to be identical. Results are printed and, with --output,
+written to JSON for compare.py.
+
+    python benchmarks/xml_bench.py --size-mb 20 --memory --output xml.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import xml.dom.minidom
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from xml_stream import pretty_xml  # noqa: E402
+
+MB = 1024 * 1024
+
+FIELDS = ('PIN_FLD_STATUS', 'PIN_FLD_NAME', 'PIN_FLD_AMOUNT', 'PIN_FLD_START_T', 'PIN_FLD_FLAGS',
+          'PIN_FLD_DESCR', 'PIN_FLD_CURRENT_BAL', 'PIN_FLD_CREDIT_LIMIT')
+ARRAYS = ('PIN_FLD_BALANCES', 'PIN_FLD_SERVICES', 'PIN_FLD_PRODUCTS', 'PIN_FLD_RESULTS')
+
+
+def generate_flist_xml(size, depth=3, seed=1):
+    """About size characters of a PIN flist XML export, one <flist> per object"""
+    rng = random.Random(seed)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<flists>\n']
+    written = len(parts[0])
+    while written < size:
+        piece = _flist(rng, depth)
+        parts.append(piece)
+        written += len(piece)
+    parts.append('</flists>\n')
+    return ''.join(parts)
+
+
+def _flist(rng, depth, level=0):
+    pad = '  ' * (level + 1)
+    lines = [f'{pad}<flist>\n' if level == 0 else '']
+    if level == 0:
+        lines.append(f'{pad}  <PIN_FLD_POID>0.0.0.1 /account {rng.randint(1, 10 ** 7)} 0</PIN_FLD_POID>\n')
+    for _ in range(rng.randint(2, 6)):
+        field = rng.choice(FIELDS)
+        lines.append(f'{pad}  <{field}>{rng.choice(["", "value &amp; more ", "0.00 "])}'
+                     f'{rng.randint(0, 10 ** 6)}</{field}>\n')
+    if level + 1 < depth:
+        for _ in range(rng.randint(0, 2)):
+            array = rng.choice(ARRAYS)
+            lines.append(f'{pad}  <{array} elem="{rng.randint(0, 99)}">\n')
+            lines.append(_flist(rng, depth, level + 1))
+            lines.append(f'{pad}  </{array}>\n')
+    if level == 0:
+        lines.append(f'{pad}</flist>\n')
+    return ''.join(lines)
+
+
+def format_minidom(text, indent):
+    dom = xml.dom.minidom.parseString(text)
+    formatted = dom.toprettyxml(indent=indent)
+    return '\n'.join([line for line in formatted.split('\n') if line.strip()])
+
+
+def format_stream(text, indent):
+    return pretty_xml(text, indent)[0]
+
+
+def format_stream_tree(text, indent):
+    return pretty_xml(text, indent, tree=True)[0]
+
+
+ENGINES = {
+    'minidom': format_minidom,
+    'stream': format_stream,
+    'streamTree': format_stream_tree,
+}
+
+
+def time_engine(func, text, indent, repeat):
+    """(best seconds, output) of repeat runs"""
+    best = None
+    output = None
+    for _ in range(repeat):
+        output = None
+        started = time.perf_counter()
+        output = func(text, indent)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def peak_memory(func, text, indent):
+    """Peak traced allocation in bytes while formatting"""
+    tracemalloc.start()
+    try:
+        func(text, indent)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the XML Formatter pretty-printers')
+    parser.add_argument('--size-mb', type=float, default=10, help='size of the generated XML')
+    parser.add_argument('--depth', type=int, default=3, help='nesting levels of the flists')
+    parser.add_argument('--indent', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each engine (best is kept)')
+    parser.add_argument('--minidom-max-mb', type=float, default=50,
+                        help='skip minidom above this size (it needs several times the input in memory)')
+    parser.add_argument('--memory', action='store_true', help='also measure peak allocations')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    text = generate_flist_xml(int(args.size_mb * MB), args.depth, args.seed)
+    size = len(text.encode('utf-8'))
+    indent = ' ' * args.indent
+    print(f'{size / MB:.1f} MB of XML')
+
+    results = {'bytes': size, 'engines': {}}
+    outputs = {}
+    for name, func in ENGINES.items():
+        if name == 'minidom' and args.size_mb > args.minidom_max_mb:
+            continue
+        seconds, outputs[name] = time_engine(func, text, indent, args.repeat)
+        result = {'seconds': round(seconds, 4), 'mbPerSecond': round(size / MB / seconds, 2)}
+        if args.memory:
+            result['peakBytes'] = peak_memory(func, text, indent)
+        results['engines'][name] = result
+        line = f"{name}: {result['mbPerSecond']} MB/s ({result['seconds']}s)"
+        if args.memory:
+            line += f", peak {result['peakBytes'] / MB:.1f} MB"
+        print(line)
+
+    reference = outputs.get('minidom', outputs['stream'])
+    results['identical'] = all(output == reference for output in outputs.values())
+    print('outputs identical' if results['identical'] else 'OUTPUTS DIFFER')
+
+    report = {
+        'benchmark': 'xml',
+        'revision': git_revision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if not results['identical']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
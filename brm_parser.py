@@ -0,0 +1,358 @@
+"""BRM CM log parsing, in-process or on a pool of worker processes"""
+import hashlib
+import mmap
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from log_records import FileRecords, new_columns, new_tables
+
+# Pattern: <Level> <Timestamp> <hostname> <process:pid> <file:line> <thread_info>
+# It is matched against whole files in MULTILINE mode, so field separators
+# are [^\S\n]+ (whitespace other than newline) to keep a match on one line.
+LOG_HEADER_PATTERN = (
+    rb'^([DEW])[^\S\n]+'  # Level
+    rb'(\w{3}[^\S\n]+\w{3}[^\S\n]+\d+[^\S\n]+\d{2}:\d{2}:\d{2}[^\S\n]+\d{4})[^\S\n]+'  # Timestamp
+    rb'(\S+)[^\S\n]+'  # Hostname
+    rb'([\w_]+:\d+)[^\S\n]+'  # Process:PID
+    rb'([\w_.]+:\d+)[^\S\n]+'  # File:Line
+    rb'(.+)$'  # Thread info
+)
+_log_header_regex = re.compile(LOG_HEADER_PATTERN, re.MULTILINE)
+# The same header preceded by a literal newline instead of ^. A literal
+# first character lets the regex engine skip ahead to the next newline in
+# C rather than attempting a match at every byte of the flists.
+_header_scan_regex = re.compile(rb'\n' + LOG_HEADER_PATTERN[1:], re.MULTILINE)
+
+# Size of the content digests of extracted members
+MEMBER_DIGEST_SIZE = 16
+EXTRACT_CHUNK_SIZE = 1024 * 1024
+
+_process_pool = None
+_process_pool_workers = None
+_process_pool_lock = threading.Lock()
+
+
+def extract_zip_members(zip_path, file_list, content_paths, prefix_sizes=None, mode='process',
+                        workers=None, progress=None):
+    """Extract members of a ZIP archive to content_paths, hashing them as they are written.
+
+    Returns one dict per member with its 'size', 'digest' and 'prefixDigest'
+    (the digest of its first prefix_sizes[i] bytes, or None if the member
+    is shorter), or None for a member that could not be extracted. In
+    'process' mode the members are decompressed by worker processes that
+    each open the archive themselves. progress, if given, is called with
+    the size of every member once it is extracted.
+    """
+    prefix_sizes = prefix_sizes or [0] * len(file_list)
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        sizes = {info.filename: info.file_size for info in zip_ref.infolist()}
+    tasks = [(extract_member, (zip_path, filename, path, prefix_size))
+             for filename, path, prefix_size in zip(file_list, content_paths, prefix_sizes)]
+    on_done = None
+    if progress is not None:
+        on_done = lambda idx, info: info is not None and progress(info['size'])
+    return _run_tasks(tasks, [sizes.get(filename, 0) for filename in file_list], mode, workers,
+                      on_done)
+
+
+def parse_log_files(members, mode='process', workers=None, chunk_size=None, progress=None):
+    """Parse extracted log files from the given offsets to their end.
+
+    members holds (path, start, filename) tuples; start must be 0 or the
+    offset of a record's header line. Returns the (offset, columns, tables)
+    parts of every member, in order. Ranges bigger than chunk_size are split
+    at log headers into chunks that are parsed concurrently; in 'process'
+    mode chunks are parsed by worker processes, so parsing is not
+    serialised by the GIL, while 'thread' mode parses on a thread pool
+    inside the server process. progress, if given, is called with the size
+    and record count of every chunk once it is parsed.
+    """
+    tasks = []
+    weights = []
+    owners = []
+    for member_idx, (path, start, filename) in enumerate(members):
+        if chunk_size:
+            bounds = split_at_headers(path, chunk_size, start)
+        else:
+            bounds = [(start, max(start, os.path.getsize(path)))]
+        for chunk_start, chunk_end in bounds:
+            tasks.append((parse_file_chunk, (path, chunk_start, chunk_end, filename)))
+            weights.append(chunk_end - chunk_start)
+            owners.append(member_idx)
+
+    on_done = None
+    if progress is not None:
+        on_done = lambda idx, part: progress(weights[idx], len(part[1]['start']) if part else 0)
+    results = [[] for _ in members]
+    for member_idx, part in zip(owners, _run_tasks(tasks, weights, mode, workers, on_done)):
+        if part is not None:
+            results[member_idx].append(part)
+    return results
+
+
+def extract_member(zip_path, filename, path, prefix_size=0):
+    """Extract one archive member to path in a worker; see extract_zip_members"""
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            return _extract_member(zip_ref, filename, path, prefix_size)
+    except Exception as e:
+        print(f"Error extracting {filename}: {str(e)}")
+        return None
+
+
+def parse_log_file(path):
+    """Parse an extracted log file into (columns, tables)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return scan_brm_log(b'')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return scan_brm_log(data)
+
+
+def parse_file_chunk(path, start, end, filename):
+    """Parse bytes [start, end) of an extracted log file in a worker.
+
+    Chunks start at a log header (or at offset 0) and end right before the
+    next chunk's header, so parsing them separately and stitching the
+    results gives the same records as parsing the whole file. Offsets in
+    the returned part are relative to start.
+    """
+    try:
+        size = os.path.getsize(path)
+        if start == 0 and end >= size:
+            return (0,) + parse_log_file(path)
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        if end < size:
+            # Drop the newline that ends the chunk; it belongs to the boundary
+            data = data[:-1]
+        return (start,) + scan_brm_log(data)
+    except Exception as e:
+        print(f"Error processing {filename} [{start}:{end}]: {str(e)}")
+        return None
+
+
+def split_at_headers(path, chunk_size, start=0):
+    """Split a log file from start on into (start, end) byte ranges of about chunk_size.
+
+    Every range after the first begins with a line matching the log header
+    pattern, so no record is cut in two.
+    """
+    size = os.path.getsize(path)
+    bounds = []
+    offset = start
+    with open(path, 'rb') as f:
+        while offset < size:
+            end = _next_header_offset(f, offset + chunk_size, size)
+            bounds.append((offset, end))
+            offset = end
+    return bounds or [(start, max(start, size))]
+
+
+def parse_brm_log_content(content, filename):
+    """Parse BRM CM log content (bytes, or already decoded text) into record dicts"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    file_records = FileRecords(filename, content, *scan_brm_log(content))
+    return [file_records.record(idx) for idx in range(file_records.count)]
+
+
+def scan_brm_log(data):
+    """Parse a log buffer into (columns, tables) for FileRecords.
+
+    data is bytes or an mmap. A single regex pass over the buffer finds the
+    header lines; the header fields that repeat across records are interned
+    into string tables, while thread info, messages and flists are recorded
+    only as offsets into the buffer and are not decoded here. As in the
+    line-based parser this replaces, the line after a header is always the
+    record's message when it is not blank, and everything up to the next
+    header is its flist.
+    """
+    columns = new_columns()
+    tables = new_tables()
+    codes = {column: {} for column in tables}
+    appends = [columns[column].append for column in (
+        'level', 'timestamp', 'hostname', 'process', 'source_file',
+        'start', 'header_len', 'thread_offset', 'message_len')]
+    (append_level, append_timestamp, append_hostname, append_process, append_source_file,
+     append_start, append_header_len, append_thread_offset, append_message_len) = appends
+
+    def intern(column, value):
+        value = str(value, 'utf-8', 'ignore')
+        code = codes[column].get(value)
+        if code is None:
+            code = codes[column][value] = len(tables[column])
+            tables[column].append(value)
+        return code
+
+    # Codes of (level, timestamp, hostname, process) and of the source file by
+    # raw bytes; these repeat across records, so each is decoded only once
+    header_codes = {}
+    source_codes = {}
+    size = len(data)
+    find = data.find
+    view = memoryview(data)
+    next_start = 0
+    try:
+        for start, match in _find_headers(data):
+            if start < next_start:
+                # This header line is the previous record's message
+                continue
+
+            header_end = match.end()
+            next_start = header_end + 1
+            message_len = 0
+            if header_end < size:
+                line_end = find(b'\n', next_start)
+                if line_end == -1:
+                    line_end = size
+                if str(view[next_start:line_end], 'utf-8', 'ignore').strip():
+                    message_len = line_end - next_start
+                    next_start = line_end + 1
+
+            prefix = match.group(1, 2, 3, 4)
+            header = header_codes.get(prefix)
+            if header is None:
+                header = header_codes[prefix] = (
+                    intern('level', prefix[0]), intern('timestamp', prefix[1]),
+                    intern('hostname', prefix[2]), intern('process', prefix[3]))
+            source_file = match.group(5)
+            source_code = source_codes.get(source_file)
+            if source_code is None:
+                source_code = source_codes[source_file] = intern('source_file', source_file)
+
+            append_level(header[0])
+            append_timestamp(header[1])
+            append_hostname(header[2])
+            append_process(header[3])
+            append_source_file(source_code)
+            append_start(start)
+            append_header_len(header_end - start)
+            append_thread_offset(match.start(6) - start)
+            append_message_len(message_len)
+    finally:
+        view.release()
+    return columns, tables
+
+
+def _find_headers(data):
+    """Yield (line start, match) for every header line in data"""
+    match = _log_header_regex.match(data)
+    if match is not None:
+        yield 0, match
+    for match in _header_scan_regex.finditer(data):
+        yield match.start() + 1, match
+
+
+def _run_tasks(tasks, weights, mode, workers, on_done=None):
+    """Run (function, args) tasks on the parser pool, returning results in task order.
+
+    Tasks are submitted heaviest first so one large task does not start last.
+    on_done, if given, is called with (task index, result) as tasks finish.
+    If the process pool breaks, only the tasks it had not finished are run
+    again on threads, so on_done is still called once per task.
+    """
+    workers = max(1, workers or 1)
+    order = sorted(range(len(tasks)), key=lambda idx: weights[idx], reverse=True)
+    results = {}
+    if mode == 'process':
+        futures = {}
+        try:
+            pool = _get_process_pool(workers)
+            _submit_tasks(pool, tasks, order, on_done, futures)
+            return [futures[idx].result() for idx in range(len(tasks))]
+        except BrokenProcessPool as e:
+            print(f"Parser process pool failed ({str(e)}), falling back to threads")
+            _reset_process_pool()
+        for idx, future in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                results[idx] = future.result()
+        order = [idx for idx in order if idx not in results]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = _submit_tasks(executor, tasks, order, on_done, {})
+        results.update((idx, future.result()) for idx, future in futures.items())
+    return [results[idx] for idx in range(len(tasks))]
+
+
+def _submit_tasks(pool, tasks, order, on_done, futures):
+    """Submit the tasks in order, adding their futures to futures as they go"""
+    for idx in order:
+        future = futures[idx] = pool.submit(tasks[idx][0], *tasks[idx][1])
+        if on_done is not None:
+            future.add_done_callback(
+                lambda future, idx=idx: future.exception() is None and on_done(idx, future.result()))
+    return futures
+
+
+def _extract_member(zip_ref, filename, path, prefix_size=0):
+    hasher = hashlib.blake2b(digest_size=MEMBER_DIGEST_SIZE)
+    prefix_digest = None
+    size = 0
+    try:
+        with open(path, 'wb') as out, zip_ref.open(filename) as member:
+            while True:
+                chunk = member.read(EXTRACT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size < prefix_size <= size + len(chunk):
+                    # Snapshot the digest where the prefix ends
+                    hasher.update(chunk[:prefix_size - size])
+                    prefix_digest = hasher.hexdigest()
+                    hasher.update(chunk[prefix_size - size:])
+                else:
+                    hasher.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return {'size': size, 'digest': hasher.hexdigest(), 'prefixDigest': prefix_digest}
+
+
+def _next_header_offset(f, offset, size):
+    """Offset of the first record-starting header at or after offset.
+
+    The line after a header is always taken as that record's message, even
+    if it looks like a header itself, so only a header whose previous line
+    is not a header is guaranteed to start a record.
+    """
+    if offset >= size:
+        return size
+    # Skip to the start of the next line; its predecessor was not fully seen
+    f.seek(offset - 1)
+    f.readline()
+    previous_is_header = True
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        if not line:
+            return size
+        is_header = bool(_log_header_regex.match(line.rstrip(b'\n')))
+        if is_header and not previous_is_header:
+            return pos
+        previous_is_header = is_header
+
+
+def _get_process_pool(workers):
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != workers:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            _process_pool = ProcessPoolExecutor(max_workers=workers)
+            _process_pool_workers = workers
+        return _process_pool
+
+
+def _reset_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False)
+        _process_pool = None
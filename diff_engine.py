@@ -0,0 +1,653 @@
+"""Line diff engines for the File Compare tool.
+
+Lines are interned to integer ids once, and the engines compare the id
+sequences:
+
+    myers      shortest edit script (linear-space O(ND) bisection), with
+               git's cut-off for ranges that differ too much
+    patience   anchors on lines unique to both sides, Myers in between
+    histogram  anchors on the least frequent common lines (as in git),
+               falling back to Myers where every common line is frequent
+    difflib    difflib.SequenceMatcher on the lines themselves
+
+Every engine yields SequenceMatcher-style opcodes, and the stats and the
+unified diff are derived from those opcodes, so a comparison is computed
+only once. The 'auto' choice keeps difflib for small inputs, where its
+output is what users already know, uses histogram for larger ones and
+patience for very large files, where histogram's rescans of every
+sub-range start to dominate.
+
+The side-by-side view is served in pages of hunks from a DiffSession, so
+unchanged regions are only sent when the user expands them.
+
+Uploaded files are compared without decoding them up front: map_lines()
+hashes the lines of a memory-mapped file to ids and MappedLines decodes
+only the lines that are displayed. compare_archives() compares two ZIPs
+member by member from their central directories.
+"""
+import difflib
+import os
+import uuid
+import zipfile
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, islice, repeat
+from operator import add
+
+ALGORITHMS = ('auto', 'histogram', 'patience', 'myers', 'difflib')
+
+# Inputs up to this many lines (both sides together) use difflib under 'auto'
+AUTO_DIFFLIB_MAX_LINES = 2000
+
+# ... and up to this many use histogram; larger ones use patience
+AUTO_HISTOGRAM_MAX_LINES = 400000
+
+# Lines occurring more often than this in a range are not used as histogram anchors
+HISTOGRAM_MAX_CHAIN = 64
+
+# Myers gives up on a minimal edit script after this many edits in a range
+# and splits it at the furthest point reached (git's max_cost heuristic)
+MYERS_MAX_COST = 64
+
+# Bytes of a mapped file split into lines at a time
+MAP_BLOCK_SIZE = 1024 * 1024
+
+
+def choose_algorithm(algorithm, len1, len2):
+    """The engine used for algorithm ('auto' picks one by input size)"""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f'Unknown diff algorithm: {algorithm}')
+    if algorithm == 'auto':
+        if len1 + len2 <= AUTO_DIFFLIB_MAX_LINES:
+            return 'difflib'
+        return 'histogram' if len1 + len2 <= AUTO_HISTOGRAM_MAX_LINES else 'patience'
+    return algorithm
+
+
+def diff_lines(lines1, lines2, algorithm='auto'):
+    """SequenceMatcher-style opcodes turning lines1 into lines2"""
+    ids1, ids2 = hash_lines(lines1, lines2)
+    return diff_ids(ids1, ids2, algorithm)
+
+
+def diff_ids(ids1, ids2, algorithm='auto'):
+    """SequenceMatcher-style opcodes turning line ids ids1 into ids2"""
+    algorithm = choose_algorithm(algorithm, len(ids1), len(ids2))
+    if algorithm == 'difflib':
+        return difflib.SequenceMatcher(None, ids1, ids2).get_opcodes()
+    return opcodes_from_blocks(matching_blocks(ids1, ids2, algorithm), len(ids1), len(ids2))
+
+
+def hash_lines(lines1, lines2):
+    """Map both line lists to lists of integer ids, equal lines getting equal ids"""
+    ids = {}
+    ids1 = [ids.setdefault(line, len(ids)) for line in lines1]
+    ids2 = [ids.setdefault(line, len(ids)) for line in lines2]
+    return ids1, ids2
+
+
+class MappedLines:
+    """Lines of a bytes-like buffer (normally an mmap), decoded on access.
+
+    Only the line start offsets are held; items are str lines with their
+    line endings (lines end at '\\n' only), so a MappedLines can stand in
+    for a list of lines anywhere in this module.
+    """
+
+    def __init__(self, buffer, starts):
+        self.buffer = buffer
+        self.starts = starts
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('line index out of range')
+        return str(self.buffer[self.starts[idx]:self.starts[idx + 1]], 'utf-8', 'ignore')
+
+
+def map_lines(buffer, ids):
+    """(MappedLines, array of line ids) for a bytes-like buffer.
+
+    ids maps line content to id and is shared by the files being compared,
+    so equal lines get equal ids. The buffer is split a block at a time and
+    no decoded copy of it is made.
+    """
+    starts = array('Q', [0])
+    line_ids = array('Q')
+    setdefault = ids.setdefault
+    pos = 0
+    size = len(buffer)
+    while pos < size:
+        end = buffer.find(b'\n', min(pos + MAP_BLOCK_SIZE, size))
+        end = size if end == -1 else end + 1
+        lines = buffer[pos:end].split(b'\n')
+        last = lines.pop()
+        line_ids.extend([setdefault(line, len(ids)) for line in lines])
+        starts.extend(islice(accumulate(map(add, map(len, lines), repeat(1)), initial=pos), 1, None))
+        if last:
+            # A last line without a newline differs from the same line with one
+            line_ids.append(setdefault((last,), len(ids)))
+            starts.append(size)
+        pos = end
+    return MappedLines(buffer, starts), line_ids
+
+
+def matching_blocks(a, b, algorithm='histogram'):
+    """Sorted (i, j, size) runs with a[i:i + size] == b[j:j + size], adjacent runs merged"""
+    split = _SPLITTERS[algorithm]
+    blocks = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        # Common prefix and suffix are matched directly
+        i, j = alo, blo
+        while i < ahi and j < bhi and a[i] == b[j]:
+            i += 1
+            j += 1
+        if i > alo:
+            blocks.append((alo, blo, i - alo))
+        alo, blo = i, j
+        i, j = ahi, bhi
+        while i > alo and j > blo and a[i - 1] == b[j - 1]:
+            i -= 1
+            j -= 1
+        if i < ahi:
+            blocks.append((i, j, ahi - i))
+        ahi, bhi = i, j
+        if alo < ahi and blo < bhi:
+            split(a, alo, ahi, b, blo, bhi, stack, blocks)
+
+    blocks.sort()
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    return merged
+
+
+def opcodes_from_blocks(blocks, len1, len2):
+    """SequenceMatcher.get_opcodes() for the given matching blocks"""
+    opcodes = []
+    i = j = 0
+    for ai, bj, size in blocks + [(len1, len2, 0)]:
+        if i < ai and j < bj:
+            opcodes.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(('delete', i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(('insert', i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            opcodes.append(('equal', ai, i, bj, j))
+    return opcodes
+
+
+def diff_stats(opcodes, len1, len2):
+    """Added/deleted/modified line counts and similarity, as SequenceMatcher.ratio() computes it"""
+    added = deleted = modified = matches = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'insert':
+            added += j2 - j1
+        elif tag == 'delete':
+            deleted += i2 - i1
+        elif tag == 'replace':
+            modified += max(i2 - i1, j2 - j1)
+        else:
+            matches += i2 - i1
+    total = len1 + len2
+    return {
+        'total_lines_left': len1,
+        'total_lines_right': len2,
+        'lines_added': added,
+        'lines_deleted': deleted,
+        'lines_modified': modified,
+        'similarity_percent': round(200.0 * matches / total if total else 100.0, 2)
+    }
+
+
+def grouped_opcodes(opcodes, n=3):
+    """Opcodes grouped into hunks with n lines of context, as SequenceMatcher.get_grouped_opcodes()"""
+    codes = list(opcodes) or [('equal', 0, 1, 0, 1)]
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        # An equal run with more than 2n lines ends one hunk and starts the next
+        if tag == 'equal' and i2 - i1 > n + n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        yield group
+
+
+def unified_diff(lines1, lines2, opcodes, fromfile='', tofile='', n=3, lineterm='\n'):
+    """Unified diff lines for the opcodes, formatted exactly like difflib.unified_diff()"""
+    started = False
+    for group in grouped_opcodes(opcodes, n):
+        if not started:
+            started = True
+            yield f'--- {fromfile}{lineterm}'
+            yield f'+++ {tofile}{lineterm}'
+        first, last = group[0], group[-1]
+        yield (f'@@ -{_format_range(first[1], last[2])} '
+               f'+{_format_range(first[3], last[4])} @@{lineterm}')
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in lines1[i1:i2]:
+                    yield ' ' + line
+                continue
+            if tag in ('replace', 'delete'):
+                for line in lines1[i1:i2]:
+                    yield '-' + line
+            if tag in ('replace', 'insert'):
+                for line in lines2[j1:j2]:
+                    yield '+' + line
+
+
+def side_by_side_rows(lines1, lines2, opcodes, skip=0, limit=None):
+    """Side-by-side rows for the opcodes, skipping the first skip rows and returning at most limit"""
+    rows = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        count = _row_count(tag, i1, i2, j1, j2)
+        if skip >= count:
+            skip -= count
+            continue
+        stop = count if limit is None else min(count, skip + limit - len(rows))
+        for k in range(skip, stop):
+            left = i1 + k if i1 + k < i2 else None
+            right = j1 + k if j1 + k < j2 else None
+            rows.append({
+                'type': tag,
+                'left_line': left + 1 if left is not None else None,
+                'right_line': right + 1 if right is not None else None,
+                'left_content': lines1[left].rstrip('\n\r') if left is not None else '',
+                'right_content': lines2[right].rstrip('\n\r') if right is not None else ''
+            })
+        skip = 0
+        if limit is not None and len(rows) >= limit:
+            break
+    return rows
+
+
+def _row_count(tag, i1, i2, j1, j2):
+    return max(i2 - i1, j2 - j1)
+
+
+class DiffSession:
+    """A computed comparison that the side-by-side view pages through.
+
+    Hunks are the opcode groups of grouped_opcodes() for a number of
+    context lines; each hunk records the unchanged lines hidden before it
+    as a gap. Pages hold whole hunks up to a row budget, and a hunk bigger
+    than the budget is split over several pages.
+    """
+
+    def __init__(self, lines1, lines2, opcodes, algorithm, paths=()):
+        self.id = uuid.uuid4().hex
+        self.lines1 = lines1
+        self.lines2 = lines2
+        self.opcodes = opcodes
+        self.algorithm = algorithm
+        self.paths = paths
+        self._hunks = {}
+
+    def hunks(self, context):
+        """[(opcodes, row count)] of the hunks with context lines around each change"""
+        hunks = self._hunks.get(context)
+        if hunks is None:
+            hunks = [(group, sum(_row_count(*opcode) for opcode in group))
+                     for group in grouped_opcodes(self.opcodes, context)]
+            self._hunks[context] = hunks
+        return hunks
+
+    def page(self, context, hunk=0, row=0, max_rows=2000):
+        """Hunks from row of hunk on, about max_rows rows of them, and the cursor of the next page"""
+        hunks = self.hunks(context)
+        page = []
+        budget = max_rows
+        while hunk < len(hunks) and budget > 0:
+            group, total = hunks[hunk]
+            rows = side_by_side_rows(self.lines1, self.lines2, group, row, budget)
+            first, last = group[0], group[-1]
+            page.append({
+                'index': hunk,
+                'header': f'@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@',
+                'gap_before': self._gap(hunks[hunk - 1][0][-1] if hunk else None, first) if not row else None,
+                'row_offset': row,
+                'total_rows': total,
+                'rows': rows
+            })
+            budget -= len(rows)
+            row += len(rows)
+            if row >= total:
+                hunk += 1
+                row = 0
+        done = hunk >= len(hunks)
+        return {
+            'diff_id': self.id,
+            'context': context,
+            'total_hunks': len(hunks),
+            'hunks': page,
+            'next': None if done else {'hunk': hunk, 'row': row},
+            'gap_after': self._gap(hunks[-1][0][-1] if hunks else None, None) if done else None
+        }
+
+    def _gap(self, previous, following):
+        """Unchanged lines between two opcodes (None for the start or the end of the files)"""
+        left, right = (previous[2], previous[4]) if previous else (0, 0)
+        end = following[1] if following else len(self.lines1)
+        if end <= left:
+            return None
+        return {'left_line': left + 1, 'right_line': right + 1, 'count': end - left}
+
+    def equal_rows(self, left_line, right_line, count):
+        """Rows for count unchanged lines from left_line / right_line (1-based)"""
+        i, j = left_line - 1, right_line - 1
+        if i < 0 or j < 0 or count < 0 or i + count > len(self.lines1) or j + count > len(self.lines2):
+            raise ValueError('Line range is outside the compared text')
+        return side_by_side_rows(self.lines1, self.lines2, [('equal', i, i + count, j, j + count)])
+
+    def close(self):
+        """Remove the files the compared lines are mapped from"""
+        remove_files(self.paths)
+
+
+class ArchiveComparison:
+    """Two uploaded ZIPs compared member by member, kept for drilling into members"""
+
+    def __init__(self, path1, path2):
+        self.id = uuid.uuid4().hex
+        self.paths = (path1, path2)
+        self.members1 = archive_members(path1)
+        self.members2 = archive_members(path2)
+        self.members = compare_archives(self.members1, self.members2)
+
+    def counts(self):
+        """Number of members per status"""
+        counts = dict.fromkeys(MEMBER_STATUSES, 0)
+        for member in self.members:
+            counts[member['status']] += 1
+        return counts
+
+    def close(self):
+        remove_files(self.paths)
+
+
+MEMBER_STATUSES = ('modified', 'added', 'removed', 'identical')
+
+
+def archive_members(zip_path):
+    """{name: ZipInfo} of the files in a ZIP.
+
+    A folder that holds every member (e.g. the environment name of a config
+    tree) is left out of the names, so trees zipped under different folder
+    names line up.
+    """
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        infos = [info for info in zip_ref.infolist()
+                 if not info.is_dir()
+                 and not info.filename.startswith('__MACOSX')
+                 and not os.path.basename(info.filename).startswith('.')]
+    roots = {info.filename.split('/', 1)[0] for info in infos}
+    strip = len(roots) == 1 and all('/' in info.filename for info in infos)
+    return {(info.filename.split('/', 1)[1] if strip else info.filename): info for info in infos}
+
+
+def compare_archives(members1, members2):
+    """Members of both archives with their status, changed ones first.
+
+    Members are compared by size and CRC-32 from the central directories,
+    so nothing is extracted.
+    """
+    members = []
+    for name in sorted(members1.keys() | members2.keys()):
+        info1 = members1.get(name)
+        info2 = members2.get(name)
+        if info1 is None:
+            status = 'added'
+        elif info2 is None:
+            status = 'removed'
+        elif info1.file_size == info2.file_size and info1.CRC == info2.CRC:
+            status = 'identical'
+        else:
+            status = 'modified'
+        members.append({
+            'name': name,
+            'status': status,
+            'left_size': info1.file_size if info1 else None,
+            'right_size': info2.file_size if info2 else None
+        })
+    members.sort(key=lambda member: MEMBER_STATUSES.index(member['status']))
+    return members
+
+
+def remove_files(paths):
+    """Remove the files at paths, ignoring those already gone"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _format_range(start, stop):
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f'{beginning}'
+    if not length:
+        beginning -= 1
+    return f'{beginning},{length}'
+
+
+def _split_myers(a, alo, ahi, b, blo, bhi, stack, blocks):
+    point = _myers_middle(a, alo, ahi, b, blo, bhi)
+    if point is not None:
+        x, y = point
+        stack.append((alo, alo + x, blo, blo + y))
+        stack.append((alo + x, ahi, blo + y, bhi))
+
+
+def _myers_middle(a, alo, ahi, b, blo, bhi):
+    """A point (x, y) on a shortest edit path, by searching from both ends (Myers' bisection).
+
+    As in git, the search is cut off after MYERS_MAX_COST edits and the
+    point is then the furthest either end got, so very different ranges
+    cost O((n + m) * MYERS_MAX_COST) instead of O((n + m)^2) at the price
+    of a possibly longer edit script. Returns None if the ranges have no
+    line in common.
+    """
+    n = ahi - alo
+    m = bhi - blo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    size = 2 * max_d + 2
+    forward = [-1] * size
+    forward[offset + 1] = 0
+    backward = [-1] * size
+    backward[offset + 1] = 0
+    delta = n - m
+    # With an odd delta the paths meet while extending forward, else backward
+    check_forward = delta % 2 != 0
+    k1_start = k1_end = k2_start = k2_end = 0
+    for d in range(max_d):
+        for k1 in range(-d + k1_start, d + 1 - k1_end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and forward[k1_offset - 1] < forward[k1_offset + 1]):
+                x1 = forward[k1_offset + 1]
+            else:
+                x1 = forward[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+                x1 += 1
+                y1 += 1
+            forward[k1_offset] = x1
+            if x1 > n:
+                k1_end += 2
+            elif y1 > m:
+                k1_start += 2
+            elif check_forward:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < size and backward[k2_offset] != -1:
+                    if x1 >= n - backward[k2_offset]:
+                        return x1, y1
+        for k2 in range(-d + k2_start, d + 1 - k2_end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and backward[k2_offset - 1] < backward[k2_offset + 1]):
+                x2 = backward[k2_offset + 1]
+            else:
+                x2 = backward[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[ahi - x2 - 1] == b[bhi - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            backward[k2_offset] = x2
+            if x2 > n:
+                k2_end += 2
+            elif y2 > m:
+                k2_start += 2
+            elif not check_forward:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < size and forward[k1_offset] != -1:
+                    x1 = forward[k1_offset]
+                    if x1 >= n - x2:
+                        return x1, x1 - (k1_offset - offset)
+        if d >= MYERS_MAX_COST:
+            return _furthest_point(forward, backward, offset, n, m,
+                                   range(-d + k1_start, d + 1 - k1_end, 2),
+                                   range(-d + k2_start, d + 1 - k2_end, 2))
+    return None
+
+
+def _furthest_point(forward, backward, offset, n, m, k1_range, k2_range):
+    """The point of the cut-off Myers search that got furthest from its end, or None"""
+    best = None
+    progress = 0
+    for k1 in k1_range:
+        x1 = forward[offset + k1]
+        y1 = x1 - k1
+        if 0 <= x1 <= n and 0 <= y1 <= m and x1 + y1 > progress and x1 + y1 < n + m:
+            best = (x1, y1)
+            progress = x1 + y1
+    for k2 in k2_range:
+        x2 = backward[offset + k2]
+        y2 = x2 - k2
+        if 0 <= x2 <= n and 0 <= y2 <= m and x2 + y2 > progress and x2 + y2 < n + m:
+            best = (n - x2, m - y2)
+            progress = x2 + y2
+    return best
+
+
+def _split_patience(a, alo, ahi, b, blo, bhi, stack, blocks):
+    unique_a = {}
+    for i in range(alo, ahi):
+        unique_a[a[i]] = i if a[i] not in unique_a else None
+    unique_b = {}
+    for j in range(blo, bhi):
+        if unique_a.get(b[j]) is not None:
+            unique_b[b[j]] = j if b[j] not in unique_b else None
+    pairs = [(unique_a[line], j) for line, j in unique_b.items() if j is not None]
+    if not pairs:
+        _split_myers(a, alo, ahi, b, blo, bhi, stack, blocks)
+        return
+    pairs.sort(key=lambda pair: pair[1])
+
+    # Longest run of pairs increasing in both files, by patience sorting
+    tops = []
+    top_pairs = []
+    previous = [None] * len(pairs)
+    for idx, (i, _) in enumerate(pairs):
+        pile = bisect_left(tops, i)
+        if pile == len(tops):
+            tops.append(i)
+            top_pairs.append(idx)
+        else:
+            tops[pile] = i
+            top_pairs[pile] = idx
+        previous[idx] = top_pairs[pile - 1] if pile else None
+    anchors = []
+    idx = top_pairs[-1]
+    while idx is not None:
+        anchors.append(pairs[idx])
+        idx = previous[idx]
+    anchors.reverse()
+
+    i_prev, j_prev = alo, blo
+    for i, j in anchors:
+        blocks.append((i, j, 1))
+        stack.append((i_prev, i, j_prev, j))
+        i_prev, j_prev = i + 1, j + 1
+    stack.append((i_prev, ahi, j_prev, bhi))
+
+
+def _split_histogram(a, alo, ahi, b, blo, bhi, stack, blocks):
+    positions = {}
+    for i in range(alo, ahi):
+        occurrences = positions.get(a[i])
+        if occurrences is None:
+            positions[a[i]] = [i]
+        else:
+            occurrences.append(i)
+
+    # Longest run around the least frequent common line; of equally good
+    # runs the one nearest the middle, so the ranges left either side stay
+    # balanced instead of being peeled off one run at a time
+    best = None
+    best_count = HISTOGRAM_MAX_CHAIN + 1
+    middle = blo + bhi
+    has_common = False
+    j = blo
+    while j < bhi:
+        occurrences = positions.get(b[j])
+        j_next = j + 1
+        if occurrences is not None:
+            has_common = True
+            count = len(occurrences)
+            if count <= min(best_count, HISTOGRAM_MAX_CHAIN):
+                for i in occurrences:
+                    si, sj, ei, ej = i, j, i + 1, j + 1
+                    while si > alo and sj > blo and a[si - 1] == b[sj - 1]:
+                        si -= 1
+                        sj -= 1
+                    while ei < ahi and ej < bhi and a[ei] == b[ej]:
+                        ei += 1
+                        ej += 1
+                    if (best is None or count < best_count or ei - si > best[2] - best[0]
+                            or (ei - si == best[2] - best[0]
+                                and abs(sj + ej - middle) < abs(best[1] + best[3] - middle))):
+                        best = (si, sj, ei, ej)
+                        best_count = count
+                    j_next = max(j_next, ej)
+        j = j_next
+
+    if best is None:
+        if has_common:
+            # Every common line is too frequent to anchor on
+            _split_myers(a, alo, ahi, b, blo, bhi, stack, blocks)
+        return
+    si, sj, ei, ej = best
+    blocks.append((si, sj, ei - si))
+    stack.append((alo, si, blo, sj))
+    stack.append((ei, ahi, ej, bhi))
+
+
+_SPLITTERS = {
+    'myers': _split_myers,
+    'patience': _split_patience,
+    'histogram': _split_histogram,
+}
@@ -0,0 +1,190 @@
+"""Bounded in-memory cache of parsed BRM log bundles"""
+import sys
+import threading
+import time
+
+
+class _Entry:
+    """A cached bundle with its estimated size and last access time"""
+    __slots__ = ('bundle', 'size', 'last_access')
+
+    def __init__(self, bundle, size, last_access):
+        self.bundle = bundle
+        self.size = size
+        self.last_access = last_access
+
+
+class LogCache:
+    """LRU cache of LogBundle objects with a byte budget and an idle TTL.
+
+    Bundles that are not in memory are opened through loader (normally from
+    the on-disk store), so evicting a bundle only frees memory; it is
+    reloaded transparently on its next use. Bundles report lazily loaded
+    parts through their on_load hook so the budget tracks what is actually
+    resident.
+
+    Lookups do not lock: the entries are an immutable snapshot (a dict that
+    is copied and swapped on every insert and removal, under the lock), so
+    a cache hit only reads the current snapshot and stamps the entry's
+    access time. Loading a bundle's parts is serialised per bundle by the
+    bundle itself, so requests for different bundles never wait on each
+    other. The hit counter is updated without the lock and may undercount
+    slightly under contention.
+    """
+
+    def __init__(self, loader, max_bytes, ttl):
+        self._loader = loader
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, cache_key):
+        """Return the bundle for cache_key, or None if it is unknown"""
+        now = time.monotonic()
+        entry = self._entries.get(cache_key)
+        if entry is not None and not self._expired(entry, now):
+            entry.last_access = now
+            self.hits += 1
+            return entry.bundle
+
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                # Inserted by another request since the snapshot was read
+                entry.last_access = now
+                self.hits += 1
+                return entry.bundle
+            self.misses += 1
+
+        bundle = self._loader(cache_key)
+        if bundle is None:
+            return None
+        with self._lock:
+            self.loads += 1
+        return self.put(cache_key, bundle)
+
+    def put(self, cache_key, bundle):
+        """Insert a bundle, evicting older ones to stay within the budget"""
+        with self._lock:
+            existing = self._entries.get(cache_key)
+            if existing is not None:
+                # Lost a race with another request; keep the resident copy
+                return existing.bundle
+            entry = _Entry(bundle, estimate_bundle_size(bundle), time.monotonic())
+            entries = dict(self._entries)
+            entries[cache_key] = entry
+            self._entries = entries
+            self.total_bytes += entry.size
+            self._expire()
+            bundle.on_load = lambda: self._resize(cache_key, bundle)
+            self._evict(keep=cache_key)
+        return bundle
+
+    def keys(self):
+        """Cache keys of the bundles in memory"""
+        return list(self._entries)
+
+    def stats(self):
+        """Cache counters and current memory use"""
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: item[1].last_access,
+                             reverse=True)
+            return {
+                'entries': len(entries),
+                'totalBytes': self.total_bytes,
+                'maxBytes': self.max_bytes,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'bundles': [
+                    {'cacheKey': key, 'bytes': entry.size}
+                    for key, entry in entries
+                ]
+            }
+
+    def _resize(self, cache_key, bundle):
+        size = estimate_bundle_size(bundle)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None or entry.bundle is not bundle:
+                return
+            self.total_bytes += size - entry.size
+            entry.size = size
+            self._evict(keep=cache_key)
+
+    def _expired(self, entry, now):
+        return bool(self.ttl) and entry.last_access <= now - self.ttl
+
+    def _expire(self):
+        if not self.ttl:
+            return
+        now = time.monotonic()
+        expired = [cache_key for cache_key, entry in self._entries.items()
+                   if self._expired(entry, now)]
+        if expired:
+            self._remove(expired)
+            self.expirations += len(expired)
+
+    def _evict(self, keep=None):
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Least recently used first; never evict the bundle being used right now
+        candidates = sorted((entry.last_access, cache_key)
+                            for cache_key, entry in self._entries.items() if cache_key != keep)
+        evicted = []
+        total_bytes = self.total_bytes
+        for _, cache_key in candidates:
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= self._entries[cache_key].size
+            evicted.append(cache_key)
+        if evicted:
+            self._remove(evicted)
+            self.evictions += len(evicted)
+
+    def _remove(self, cache_keys):
+        entries = dict(self._entries)
+        for cache_key in cache_keys:
+            entry = entries.pop(cache_key)
+            entry.bundle.on_load = None
+            self.total_bytes -= entry.size
+        self._entries = entries
+
+
+def estimate_bundle_size(bundle):
+    """Estimate the resident size in bytes of a bundle's loaded parts"""
+    size = sys.getsizeof(bundle.summary)
+    logs = bundle.loaded_logs
+    if logs is not None:
+        # Record columns only; member content is mmapped, not resident
+        size += logs.nbytes()
+    process_index = bundle.loaded_process_index
+    if process_index is not None:
+        size += process_index.nbytes()
+    search_index = bundle.loaded_search_index
+    if search_index is not None:
+        size += search_index.nbytes()
+    error_index = bundle.loaded_error_index
+    if error_index is not None:
+        size += error_index.nbytes()
+    correlation_index = bundle.loaded_correlation_index
+    if correlation_index is not None:
+        size += correlation_index.nbytes()
+    time_index = bundle.loaded_time_index
+    if time_index is not None:
+        size += time_index.nbytes()
+    raw_files = bundle.loaded_raw_files
+    if raw_files:
+        size += sum(raw_file.nbytes() for raw_file in raw_files.values())
+    return size
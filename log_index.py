@@ -0,0 +1,500 @@
+"""Secondary indexes over parsed BRM log records"""
+import calendar
+import re
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+_EMPTY = array('I')
+
+# Records are indexed for search in blocks of this many consecutive offsets
+SEARCH_BLOCK_SIZE = 32
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Query tokens shorter than this that may be part of a longer token are not
+# looked up: too many tokens contain them for the lookup to narrow anything
+_MIN_PARTIAL_TOKEN = 3
+
+_MONTHS = {name: number for number, name in enumerate(calendar.month_abbr) if name}
+
+# Kinds of CorrelationIndex values, with the CRC seed that keeps their keys apart
+CORRELATION_KINDS = {'poid': 1, 'opcode': 2, 'thread': 3}
+_POID_KEY_RE = re.compile(rb'/[\w/]+[^\S\n]+-?\d+')
+_OPCODE_KEY_RE = re.compile(rb'PCM_OP_\w+')
+_POID_RE = re.compile(r'(?:(\d+\.\d+\.\d+\.\d+)[^\S\n]+)?(/[\w/]+)[^\S\n]+(-?\d+)')
+_POID_QUERY_RE = re.compile(r'(?:(\d+\.\d+\.\d+\.\d+)\s+)?(/[\w/]+)\s+(-?\d+)(?:\s+-?\d+)?')
+_OPCODE_RE = re.compile(r'PCM_OP_\w+')
+_OFFSET_MASK = 0xFFFFFFFF
+
+# Variable parts of error messages, replaced in order by message_template
+_TEMPLATE_PATTERNS = (
+    (re.compile(r'\b\d+\.\d+\.\d+\.\d+\s+/[\w/]+\s+-?\d+(?:\s+\d+)?'), '<poid>'),
+    (re.compile(r'\b0x[0-9a-fA-F]+\b'), '<hex>'),
+    (re.compile(r'\d+'), '<n>'),
+)
+
+
+class ProcessIndex:
+    """Record offsets per process and per (process, level), in bundle order.
+
+    Built from the (process, level) pair of every record, see
+    LogRecords.iter_process_levels.
+    """
+
+    def __init__(self, process_levels):
+        self.by_process = {}
+        self.by_level = {}
+        self._add(process_levels, 0)
+
+    def extended(self, keep, logs):
+        """A copy holding the first keep records of this index plus logs[keep:]"""
+        index = ProcessIndex(())
+        for source, target in ((self.by_process, index.by_process), (self.by_level, index.by_level)):
+            for key, offsets in source.items():
+                count = bisect_left(offsets, keep)
+                if count:
+                    target[key] = offsets[:count]
+        index._add(logs.iter_process_levels(keep), keep)
+        return index
+
+    def _add(self, process_levels, start):
+        for idx, (process, level) in enumerate(process_levels, start):
+            offsets = self.by_process.get(process)
+            if offsets is None:
+                offsets = self.by_process[process] = array('I')
+            offsets.append(idx)
+
+            key = (process, level)
+            offsets = self.by_level.get(key)
+            if offsets is None:
+                offsets = self.by_level[key] = array('I')
+            offsets.append(idx)
+
+    def offsets(self, process, level=''):
+        """Sorted record offsets for a process, optionally for one level only"""
+        if level:
+            return self.by_level.get((process, level), _EMPTY)
+        return self.by_process.get(process, _EMPTY)
+
+    def processes(self):
+        """Process keys in order of first appearance"""
+        return list(self.by_process)
+
+    def nbytes(self):
+        """Approximate memory held by the offset arrays"""
+        return sum(offsets.itemsize * len(offsets)
+                   for index in (self.by_process, self.by_level)
+                   for offsets in index.values())
+
+
+class ErrorIndex:
+    """Unique error signatures per process, built once from the level E records.
+
+    Every signature (message, sourceFile) keeps the sorted line numbers it
+    occurs on, so a line-range query is answered by bisection per signature
+    without touching any record. Signatures are also grouped by message
+    template (see message_template) for the grouped view.
+    """
+
+    def __init__(self, logs, process_index, base=None, keep=0):
+        self.signatures = {}
+        self.templates = {}
+        for process in process_index.processes():
+            lines_by_signature = {}
+            if base is not None:
+                # Reuse the lines of the base index up to record keep
+                for message, source_file, lines in base.signatures.get(process, ()):
+                    count = bisect_right(lines, keep)
+                    if count:
+                        lines_by_signature[(message, source_file)] = lines[:count]
+            offsets = process_index.offsets(process, 'E')
+            for idx in offsets[bisect_left(offsets, keep):]:
+                log = logs[idx]
+                key = (log['message'], log['sourceFile'])
+                lines = lines_by_signature.get(key)
+                if lines is None:
+                    lines = lines_by_signature[key] = array('I')
+                lines.append(idx + 1)
+            if not lines_by_signature:
+                continue
+
+            signatures = [(message, source_file, lines)
+                          for (message, source_file), lines in lines_by_signature.items()]
+            templates = {}
+            for signature in signatures:
+                key = (message_template(signature[0]), signature[1])
+                templates.setdefault(key, []).append(signature)
+            self.signatures[process] = signatures
+            self.templates[process] = [(template, source_file, variants)
+                                       for (template, source_file), variants in templates.items()]
+
+    def extended(self, keep, logs, process_index):
+        """A copy holding the errors of the first keep records plus those of logs[keep:]"""
+        return ErrorIndex(logs, process_index, base=self, keep=keep)
+
+    def errors(self, process, from_line, to_line, group=''):
+        """Unique errors of a process within [from_line, to_line], by first line.
+
+        With group 'template', signatures that differ only in ids, POIDs and
+        numbers are counted together and the template is returned as the
+        message, along with the first matching message as example.
+        """
+        errors = []
+        if group == 'template':
+            for template, source_file, variants in self.templates.get(process, ()):
+                count = 0
+                first = None
+                for message, _, lines in variants:
+                    lo = bisect_left(lines, from_line)
+                    hi = bisect_right(lines, to_line, lo)
+                    if hi > lo:
+                        count += hi - lo
+                        if first is None or lines[lo] < first[0]:
+                            first = (lines[lo], message)
+                if count:
+                    errors.append({
+                        'message': template,
+                        'example': first[1],
+                        'sourceFile': source_file,
+                        'count': count,
+                        'firstLine': first[0]
+                    })
+        else:
+            for message, source_file, lines in self.signatures.get(process, ()):
+                lo = bisect_left(lines, from_line)
+                hi = bisect_right(lines, to_line, lo)
+                if hi > lo:
+                    errors.append({
+                        'message': message,
+                        'sourceFile': source_file,
+                        'count': hi - lo,
+                        'firstLine': lines[lo]
+                    })
+        errors.sort(key=lambda error: error['firstLine'])
+        return errors
+
+    def nbytes(self):
+        """Approximate memory held by the signatures and their line arrays"""
+        return sum(len(message) + len(source_file) + 98 + lines.itemsize * len(lines)
+                   for signatures in self.signatures.values()
+                   for message, source_file, lines in signatures)
+
+
+class TimeIndex:
+    """Sorted epoch seconds of the records per (process, level).
+
+    Built from (process, level, timestamp) of every record. Timestamps
+    repeat across records, so each distinct string is parsed only once.
+    Log timestamps carry no time zone and are read as UTC.
+    """
+
+    def __init__(self, process_level_timestamps):
+        epochs = {}
+        series = {}
+        for process, level, timestamp in process_level_timestamps:
+            if timestamp in epochs:
+                epoch = epochs[timestamp]
+            else:
+                epoch = epochs[timestamp] = parse_log_timestamp(timestamp)
+            if epoch is None:
+                continue
+            values = series.get((process, level))
+            if values is None:
+                values = series[(process, level)] = []
+            values.append(epoch)
+        self.series = {key: array('q', sorted(values)) for key, values in series.items()}
+
+    def bounds(self, keys):
+        """(first, last) epoch over the series of keys, or None if they are empty"""
+        series = [self.series[key] for key in keys if key in self.series]
+        if not series:
+            return None
+        return min(values[0] for values in series), max(values[-1] for values in series)
+
+    def counts(self, key, start, end, bucket_seconds):
+        """Record counts of a series per bucket of [start, end), by bisection"""
+        values = self.series.get(key, _EMPTY)
+        positions = [bisect_left(values, min(boundary, end))
+                     for boundary in range(start, end + bucket_seconds, bucket_seconds)]
+        return [hi - lo for lo, hi in zip(positions, positions[1:])]
+
+    def nbytes(self):
+        """Approximate memory held by the epoch arrays"""
+        return sum(values.itemsize * len(values) for values in self.series.values())
+
+
+class CorrelationIndex:
+    """Record offsets per POID, opcode name and threadInfo.
+
+    Records are keyed by the POIDs (type and id) and PCM_OP_* opcode names
+    in their message and flist and by their threadInfo, so one object or
+    transaction can be followed across processes and files. Keys are kept
+    as CRC-32s in one sorted array of crc << 32 | offset entries, 8 bytes
+    per key and record; a lookup bisects the array and checks the
+    candidate records, so CRC collisions never reach the results. It is
+    built from the raw spans of every record, see LogRecords.raw_spans.
+    """
+
+    def __init__(self, spans=(), start=0):
+        self.entries = array('Q')
+        self._add(spans, start)
+
+    def extended(self, keep, logs):
+        """A copy holding the entries of the first keep records plus those of logs[keep:]"""
+        index = CorrelationIndex()
+        index.entries = array('Q', (entry for entry in self.entries if entry & _OFFSET_MASK < keep))
+        index._add(logs.raw_spans(keep), keep)
+        return index
+
+    def _add(self, spans, start):
+        crc32 = zlib.crc32
+        poid_seed = CORRELATION_KINDS['poid']
+        opcode_seed = CORRELATION_KINDS['opcode']
+        thread_seed = CORRELATION_KINDS['thread']
+        entries = []
+        for idx, (buffer, thread_start, header_end, end) in enumerate(spans, start):
+            keys = {crc32(b' '.join(poid.split()), poid_seed)
+                    for poid in set(_POID_KEY_RE.findall(buffer, header_end + 1, end))}
+            keys.update(crc32(opcode, opcode_seed)
+                        for opcode in set(_OPCODE_KEY_RE.findall(buffer, header_end + 1, end)))
+            keys.add(crc32(buffer[thread_start:header_end].strip(), thread_seed))
+            entries.extend([key << 32 | idx for key in keys])
+        if entries:
+            entries.extend(self.entries)
+            entries.sort()
+            self.entries = array('Q', entries)
+
+    def find(self, logs, kind, value):
+        """Sorted offsets of the records holding value, of kind 'poid', 'opcode' or 'thread'.
+
+        A POID is given as 'db /type id [revision]' or just '/type id'.
+        Raises ValueError for an unknown kind or a malformed value.
+        """
+        key, matches = _correlation_key(kind, value)
+        lo = bisect_left(self.entries, key << 32)
+        hi = bisect_left(self.entries, (key + 1) << 32, lo)
+        return [idx for idx in (entry & _OFFSET_MASK for entry in self.entries[lo:hi])
+                if matches(logs[idx])]
+
+    def nbytes(self):
+        """Approximate memory held by the entries"""
+        return self.entries.itemsize * len(self.entries)
+
+
+class SearchIndex:
+    """Inverted token index over message, flistContent and sourceFile.
+
+    Tokens map to the blocks of SEARCH_BLOCK_SIZE records they occur in,
+    which keeps the index small and cheap to build. A substring query is
+    narrowed to candidate blocks through the tokens it must touch, and only
+    the records in those blocks are checked against the query. It is built
+    from the searchable text of every record, see LogRecords.search_texts.
+
+    The tokens are also kept sorted, for prefix lookups, and their
+    trigrams map to them, so the tokens containing a query token come
+    from a short list instead of a walk over the whole vocabulary.
+    """
+
+    def __init__(self, texts, block_size=SEARCH_BLOCK_SIZE):
+        self.block_size = block_size
+        self.postings = {}
+        self._add(texts, 0)
+        self._index_tokens()
+
+    def extended(self, keep, logs):
+        """A copy indexing the first keep records as this index does, plus logs[keep:].
+
+        Blocks are cut at multiples of block_size, so the block holding
+        record keep is indexed again from its first record.
+        """
+        index = SearchIndex((), self.block_size)
+        keep_blocks = keep // self.block_size
+        for token, blocks in self.postings.items():
+            count = bisect_left(blocks, keep_blocks)
+            if count:
+                index.postings[token] = blocks[:count]
+        index._add(logs.search_texts(keep_blocks * self.block_size), keep_blocks)
+        index._index_tokens()
+        return index
+
+    def _add(self, texts, block):
+        texts = iter(texts)
+        block_size = self.block_size
+        while True:
+            block_texts = list(islice(texts, block_size))
+            if not block_texts:
+                break
+            text = '\n'.join(block_texts)
+            for token in set(_TOKEN_RE.findall(text.lower())):
+                blocks = self.postings.get(token)
+                if blocks is None:
+                    blocks = self.postings[token] = array('I')
+                blocks.append(block)
+            block += 1
+
+    def _index_tokens(self):
+        self.tokens = sorted(self.postings)
+        trigrams = {}
+        for token_id, token in enumerate(self.tokens):
+            for trigram in {token[pos:pos + 3] for pos in range(len(token) - 2)}:
+                token_ids = trigrams.get(trigram)
+                if token_ids is None:
+                    token_ids = trigrams[trigram] = array('I')
+                token_ids.append(token_id)
+        self.trigrams = trigrams
+
+    def search(self, logs, offsets, terms):
+        """The sorted subset of offsets whose records match all terms"""
+        blocks = None
+        for term in terms:
+            candidates = self._candidate_blocks(term)
+            if candidates is not None:
+                blocks = candidates if blocks is None else blocks & candidates
+        # Terms without whitespace are decided on the searchable text alone
+        exact = all(term.split() == [term] for term in terms)
+        if blocks is None:
+            # Nothing in the query can be looked up; check every record
+            return [idx for idx in offsets if _matches_search_text(logs, idx, terms, exact)]
+
+        matches = array('I')
+        for block in sorted(blocks):
+            lo = bisect_left(offsets, block * self.block_size)
+            hi = bisect_left(offsets, (block + 1) * self.block_size, lo)
+            matches.extend(idx for idx in offsets[lo:hi]
+                           if _matches_search_text(logs, idx, terms, exact))
+        return matches
+
+    def nbytes(self):
+        """Approximate memory held by the postings and the token lookups"""
+        size = sum(len(token) + 49 + blocks.itemsize * len(blocks)
+                   for token, blocks in self.postings.items())
+        size += 8 * len(self.tokens)
+        size += sum(52 + 64 + token_ids.itemsize * len(token_ids)
+                    for token_ids in self.trigrams.values())
+        return size
+
+    def _candidate_blocks(self, term):
+        """Blocks that may contain term, or None if term has no tokens.
+
+        A token in the middle of term must occur as a whole token in the
+        record, while the first and last ones may be the tail or the head
+        of a longer token.
+        """
+        blocks = None
+        for match in _TOKEN_RE.finditer(term):
+            token = match.group()
+            open_start = match.start() == 0
+            open_end = match.end() == len(term)
+            tokens = self._matching_tokens(token, open_start, open_end)
+            if tokens is None:
+                continue
+
+            found = set()
+            for t in tokens:
+                found.update(self.postings[t])
+            blocks = found if blocks is None else blocks & found
+            if not blocks:
+                break
+        return blocks
+
+    def _matching_tokens(self, token, open_start, open_end):
+        """Indexed tokens that token may be part of, or None if it is too short to look up"""
+        if not open_start and not open_end:
+            return [token] if token in self.postings else []
+        if len(token) < _MIN_PARTIAL_TOKEN:
+            return None
+        if not open_start:
+            # A prefix: the tokens sorted right after it
+            tokens = []
+            for t in islice(self.tokens, bisect_left(self.tokens, token), None):
+                if not t.startswith(token):
+                    break
+                tokens.append(t)
+            return tokens
+
+        # Only tokens holding every trigram of token can contain it; the
+        # rarest trigram gives the shortest list to check
+        token_ids = min((self.trigrams.get(token[pos:pos + 3], _EMPTY)
+                         for pos in range(len(token) - 2)), key=len)
+        candidates = map(self.tokens.__getitem__, token_ids)
+        if open_end:
+            return [t for t in candidates if token in t]
+        return [t for t in candidates if t.endswith(token)]
+
+
+def parse_log_timestamp(timestamp):
+    """Epoch seconds of a log timestamp like 'Mon Jan  6 10:12:33 2025', or None"""
+    parts = timestamp.split()
+    try:
+        hour, minute, second = map(int, parts[3].split(':'))
+        return calendar.timegm((int(parts[4]), _MONTHS[parts[1]], int(parts[2]), hour, minute, second))
+    except (IndexError, KeyError, ValueError):
+        return None
+
+
+def _correlation_key(kind, value):
+    """(CRC key, record predicate) for a CorrelationIndex lookup"""
+    if kind not in CORRELATION_KINDS:
+        raise ValueError(f'Unknown correlation kind: {kind}')
+    value = value.strip()
+    if kind == 'poid':
+        match = _POID_QUERY_RE.fullmatch(value)
+        if match is None:
+            raise ValueError(f'Invalid POID: {value}')
+        db, poid_type, poid_id = match.groups()
+        value = f'{poid_type} {poid_id}'
+
+        def matches(log):
+            text = f"{log['message']}\n{log['flistContent']}"
+            return any(found_type == poid_type and found_id == poid_id and db in (None, found_db)
+                       for found_db, found_type, found_id in _POID_RE.findall(text))
+    elif kind == 'opcode':
+        if not _OPCODE_RE.fullmatch(value):
+            raise ValueError(f'Invalid opcode: {value}')
+
+        def matches(log):
+            text = f"{log['message']}\n{log['flistContent']}"
+            return value in _OPCODE_RE.findall(text)
+    else:
+        def matches(log):
+            return log['threadInfo'].strip() == value
+    return zlib.crc32(value.encode('utf-8'), CORRELATION_KINDS[kind]), matches
+
+
+def message_template(message):
+    """Replace the variable parts of a message (POIDs, hex ids, numbers) with placeholders"""
+    for pattern, placeholder in _TEMPLATE_PATTERNS:
+        message = pattern.sub(placeholder, message)
+    return message
+
+
+def parse_search_terms(query, mode=''):
+    """Lowercased search terms: the whole query, or its words for mode 'all'"""
+    query = query.lower()
+    if mode == 'all':
+        return query.split()
+    return [query]
+
+
+def _matches_search_text(logs, idx, terms, exact):
+    """matches_search() for record idx, checked on its searchable text first.
+
+    That text is the raw message, flist and source file one after another,
+    so a term without whitespace is in it exactly when it is in one of the
+    fields. Unless exact, a record passing is checked again as a record.
+    """
+    text = logs.search_text(idx).lower()
+    if not all(term in text for term in terms):
+        return False
+    return exact or matches_search(logs[idx], terms)
+
+
+def matches_search(log, terms):
+    """True if every term is a substring of the message, flist or source file"""
+    message = log.get('message', '').lower()
+    flist = log.get('flistContent', '').lower()
+    source_file = log.get('sourceFile', '').lower()
+    return all(term in message or term in flist or term in source_file
+               for term in terms)
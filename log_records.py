@@ -0,0 +1,278 @@
+"""Columnar storage for parsed BRM log records.
+
+Records are kept per member file as parallel arrays instead of one dict per
+record. Low-cardinality header fields (level, timestamp, hostname, process,
+source file) are stored as integer codes into per-file string tables, and
+the header line, thread info, message and flist are stored as byte offsets
+into the member file's raw content. The record dicts returned by the API are
+rebuilt from these columns only for the rows that are actually requested.
+"""
+import mmap
+import os
+from array import array
+from bisect import bisect_right
+from itertools import repeat
+from operator import add
+
+# Columns holding codes into the string table of the same name
+CODED_COLUMNS = ('level', 'timestamp', 'hostname', 'process', 'source_file')
+
+# (column, array typecode) for every column of a FileRecords
+COLUMN_TYPES = (
+    ('level', 'B'),
+    ('timestamp', 'I'),
+    ('hostname', 'I'),
+    ('process', 'I'),
+    ('source_file', 'I'),
+    ('start', 'Q'),          # offset of the header line
+    ('header_len', 'I'),     # length of the header line, without the newline
+    ('thread_offset', 'I'),  # offset of the thread info within the header line
+    ('message_len', 'I'),    # length of the message line, 0 if it is blank
+)
+
+
+def new_columns():
+    """Empty column arrays keyed by column name"""
+    return {name: array(typecode) for name, typecode in COLUMN_TYPES}
+
+
+def new_tables():
+    """Empty string tables keyed by coded column name"""
+    return {name: [] for name in CODED_COLUMNS}
+
+
+class FileRecords:
+    """Records parsed from one member file, stored column-wise.
+
+    buffer is the raw content of the file (bytes or an mmap) and digest, if
+    known, the content digest computed when the file was extracted. A
+    record's flist runs from the end of its message to the line before the
+    next record's header, so it needs no columns of its own.
+    """
+
+    def __init__(self, name, buffer, columns, tables, digest=None):
+        self.name = name
+        self.digest = digest
+        self.buffer = buffer
+        self.size = len(buffer)
+        self.columns = columns
+        self.tables = tables
+        self.count = len(columns['start'])
+        self._process_parts = [_split_process(process) for process in tables['process']]
+
+    @classmethod
+    def from_parts(cls, name, buffer, parts, digest=None):
+        """Stitch (offset, columns, tables) parts parsed from chunks of one file"""
+        if len(parts) == 1 and parts[0][0] == 0:
+            _, columns, tables = parts[0]
+            return cls(name, buffer, columns, tables, digest)
+
+        columns = new_columns()
+        tables = new_tables()
+        codes = {column: {} for column in CODED_COLUMNS}
+        for offset, part_columns, part_tables in parts:
+            for column in CODED_COLUMNS:
+                remap = []
+                for value in part_tables[column]:
+                    code = codes[column].get(value)
+                    if code is None:
+                        code = codes[column][value] = len(tables[column])
+                        tables[column].append(value)
+                    remap.append(code)
+                columns[column].extend(map(remap.__getitem__, part_columns[column]))
+            columns['start'].extend(map(add, part_columns['start'], repeat(offset)))
+            for column in ('header_len', 'thread_offset', 'message_len'):
+                columns[column].extend(part_columns[column])
+        return cls(name, buffer, columns, tables, digest)
+
+    def record(self, idx):
+        """Rebuild the record dict for row idx (without lineNumber)"""
+        columns = self.columns
+        buffer = self.buffer
+        start = columns['start'][idx]
+        header_end = start + columns['header_len'][idx]
+        message_len = columns['message_len'][idx]
+        if message_len:
+            message = _decode(buffer[header_end + 1:header_end + 1 + message_len]).strip()
+            flist_start = header_end + 2 + message_len
+        else:
+            message = ''
+            flist_start = header_end + 1
+        flist_end = columns['start'][idx + 1] - 1 if idx + 1 < self.count else self.size
+        process_code = columns['process'][idx]
+        process_name, process_pid = self._process_parts[process_code]
+        return {
+            'level': self.tables['level'][columns['level'][idx]],
+            'timestamp': self.tables['timestamp'][columns['timestamp'][idx]],
+            'hostname': self.tables['hostname'][columns['hostname'][idx]],
+            'process': self.tables['process'][process_code],
+            'processName': process_name,
+            'processPid': process_pid,
+            'sourceFile': self.tables['source_file'][columns['source_file'][idx]],
+            'threadInfo': _decode(buffer[start + columns['thread_offset'][idx]:header_end]),
+            'message': message,
+            'flistContent': _decode(buffer[flist_start:flist_end]) if flist_start < flist_end else '',
+            'fileName': self.name,
+            'rawContent': _decode(buffer[start:header_end])
+        }
+
+    def search_text(self, idx):
+        """Searchable text of row idx, as LogRecords.search_texts yields it"""
+        columns = self.columns
+        end = columns['start'][idx + 1] if idx + 1 < self.count else self.size + 1
+        text = _decode(self.buffer[columns['start'][idx] + columns['header_len'][idx] + 1:end - 1])
+        return f"{text}\n{self.tables['source_file'][columns['source_file'][idx]]}"
+
+    def renamed(self, name):
+        """These records under another file name, sharing the columns and content"""
+        if name == self.name:
+            return self
+        file_records = FileRecords(name, self.buffer, self.columns, self.tables, self.digest)
+        # Keep the shared copy alive (and registered) while this one is in use
+        file_records._shared = self
+        return file_records
+
+    def head(self, count):
+        """(columns, tables) of the first count records, to be stitched with a reparsed tail"""
+        if count == self.count:
+            return self.columns, self.tables
+        return {name: values[:count] for name, values in self.columns.items()}, self.tables
+
+    def nbytes(self):
+        """Approximate memory held by the columns and string tables"""
+        size = sum(values.itemsize * len(values) for values in self.columns.values())
+        size += sum(len(value) + 49 for table in self.tables.values() for value in table)
+        return size
+
+    def write(self, f):
+        """Write the columns to a binary file"""
+        for name, _ in COLUMN_TYPES:
+            self.columns[name].tofile(f)
+
+    @staticmethod
+    def read_columns(f, count):
+        """Read columns written by write() for count records"""
+        columns = new_columns()
+        for name, _ in COLUMN_TYPES:
+            columns[name].fromfile(f, count)
+        return columns
+
+
+class LogRecords:
+    """Read-only sequence of record dicts over the FileRecords of a bundle"""
+
+    def __init__(self, files):
+        self.files = files
+        self._starts = []
+        total = 0
+        for file_records in files:
+            self._starts.append(total)
+            total += file_records.count
+        self._total = total
+
+    def __len__(self):
+        return self._total
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._total))]
+        if idx < 0:
+            idx += self._total
+        if not 0 <= idx < self._total:
+            raise IndexError('log record index out of range')
+        file_idx = bisect_right(self._starts, idx) - 1
+        log = self.files[file_idx].record(idx - self._starts[file_idx])
+        log['lineNumber'] = idx + 1
+        return log
+
+    def __iter__(self):
+        for idx in range(self._total):
+            yield self[idx]
+
+    def coded_value(self, idx, column):
+        """Value of a coded column of record idx, without rebuilding the record"""
+        file_idx = bisect_right(self._starts, idx) - 1
+        file_records = self.files[file_idx]
+        return file_records.tables[column][file_records.columns[column][idx - self._starts[file_idx]]]
+
+    def iter_process_levels(self, start=0):
+        """Yield (process, level) for every record from start on, without building dicts"""
+        return self.iter_coded(('process', 'level'), start)
+
+    def iter_coded(self, columns, start=0):
+        """Yield tuples of the given coded columns' values for every record from start on"""
+        for file_records, offset in self._files_from(start):
+            yield from zip(*(map(file_records.tables[column].__getitem__,
+                                 file_records.columns[column][offset:])
+                             for column in columns))
+
+    def search_texts(self, start=0):
+        """Yield the searchable text (message, flist, source file) of every record from start on.
+
+        The message line and the flist are adjacent in the file, so they are
+        decoded as one span instead of rebuilding the record.
+        """
+        for file_records, offset in self._files_from(start):
+            buffer = file_records.buffer
+            sources = file_records.tables['source_file']
+            columns = file_records.columns
+            ends = columns['start'][offset + 1:]
+            ends.append(file_records.size + 1)
+            for header_start, header_len, end, source_code in zip(
+                    columns['start'][offset:], columns['header_len'][offset:], ends,
+                    columns['source_file'][offset:]):
+                text = _decode(buffer[header_start + header_len + 1:end - 1])
+                yield f"{text}\n{sources[source_code]}"
+
+    def search_text(self, idx):
+        """Searchable text of record idx, without rebuilding the record"""
+        file_idx = bisect_right(self._starts, idx) - 1
+        return self.files[file_idx].search_text(idx - self._starts[file_idx])
+
+    def raw_spans(self, start=0):
+        """Yield (buffer, thread_start, header_end, end) for every record from start on.
+
+        buffer is the member's raw content; the thread info is
+        buffer[thread_start:header_end] and the message and flist are
+        buffer[header_end + 1:end]. Nothing is decoded.
+        """
+        for file_records, offset in self._files_from(start):
+            columns = file_records.columns
+            ends = columns['start'][offset + 1:]
+            ends.append(file_records.size + 1)
+            buffer = file_records.buffer
+            for header_start, header_len, thread_offset, end in zip(
+                    columns['start'][offset:], columns['header_len'][offset:],
+                    columns['thread_offset'][offset:], ends):
+                yield (buffer, header_start + thread_offset, header_start + header_len, end - 1)
+
+    def nbytes(self):
+        """Approximate memory held by the columns of all files"""
+        return sum(file_records.nbytes() for file_records in self.files)
+
+    def _files_from(self, start):
+        """(FileRecords, first row) pairs covering the records from start on"""
+        for file_records, file_start in zip(self.files, self._starts):
+            if file_start + file_records.count > start:
+                yield file_records, max(0, start - file_start)
+
+
+def open_buffer(path):
+    """Memory-map a file read-only; empty or missing files give b''"""
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return b''
+
+
+def _split_process(process):
+    process_parts = process.split(':')
+    return (process_parts[0] if process_parts else '',
+            process_parts[1] if len(process_parts) > 1 else '')
+
+
+def _decode(data):
+    return str(data, 'utf-8', 'ignore')
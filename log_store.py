@@ -0,0 +1,631 @@
+"""On-disk storage for parsed BRM log bundles.
+
+Member files are stored once per distinct content, under their content
+digest, no matter how many bundles they appear in:
+
+    <cache_dir>/members/<digest>/
+        meta.json              store version, size, line and record counts
+        content                member file content, as extracted from the archive
+        lines.idx              sampled line-start offsets for the member file
+        columns.bin            record columns of the member (see log_records)
+        tables.json            string tables for the coded record columns
+
+Each bundle lives in its own directory and refers to its members by digest:
+
+    <cache_dir>/<cache_key>/
+        meta.json              store version, summary and the member file table
+        process_index.pickle   ProcessIndex over the records
+        errors.pickle          ErrorIndex over the level E records
+        search.pickle          optional SearchIndex over the records
+        correlation.pickle     optional CorrelationIndex of POIDs, opcodes and thread ids
+        times.pickle           TimeIndex over the record timestamps, built on first use
+
+Members and bundles are built in staging directories (members are
+extracted straight into them) and renamed into place, so a reader never
+sees a half-written one. The summary is read eagerly when a bundle is
+opened; records and raw files are read on first use and reference the
+member content through mmap, so the content itself is never held decoded
+in memory. A member's records are loaded only once per process while any
+bundle is using them. prune_store removes old bundles and the members
+only they referred to.
+"""
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, islice, repeat
+from operator import add
+
+from log_index import CorrelationIndex, ErrorIndex, ProcessIndex, SearchIndex, TimeIndex
+from log_records import FileRecords, LogRecords, new_columns, new_tables, open_buffer
+
+STORE_VERSION = 6
+
+MEMBERS_DIR = 'members'
+
+# Every LINE_INDEX_STRIDE-th line start is stored in a file's line index
+LINE_INDEX_STRIDE = 64
+LINE_INDEX_BLOCK_SIZE = 8 * 1024 * 1024
+
+_CACHE_KEY_RE = re.compile(r'^[0-9a-f]{16,128}$')
+
+# Loaded member records by digest, shared by every bundle that uses them
+_members = weakref.WeakValueDictionary()
+_members_lock = threading.Lock()
+
+
+class LogBundle:
+    """Parsed log bundle whose records and indexes are loaded from disk on demand"""
+
+    def __init__(self, path, summary, files, logs=None, process_index=None, search_index=None,
+                 error_index=None, correlation_index=None):
+        self.path = path
+        self.summary = summary
+        self.files = files
+        self._logs = logs
+        self._raw_files = None
+        self._combined_raw_file = None
+        self._process_index = process_index
+        self._search_index = search_index
+        self._error_index = error_index
+        self._correlation_index = correlation_index
+        self._time_index = None
+        self._load_lock = threading.Lock()
+        # Called after a lazily loaded part becomes resident (see LogCache)
+        self.on_load = None
+
+    @property
+    def logs(self):
+        """Parsed log records (a LogRecords sequence of dicts), in bundle order"""
+        if self._logs is None:
+            with self._load_lock:
+                if self._logs is None:
+                    self._logs = _load_records(self.path, self.files)
+            self._notify_load()
+        return self._logs
+
+    @property
+    def process_index(self):
+        """ProcessIndex over logs, read from disk or built on first use"""
+        if self._process_index is None:
+            logs = self.logs
+            with self._load_lock:
+                if self._process_index is None:
+                    self._process_index = _load_index(
+                        self.path, 'process_index.pickle',
+                        lambda: ProcessIndex(logs.iter_process_levels()))
+            self._notify_load()
+        return self._process_index
+
+    @property
+    def search_index(self):
+        """SearchIndex over logs, read from disk or built (and saved) on first use"""
+        if self._search_index is None:
+            logs = self.logs
+            with self._load_lock:
+                if self._search_index is None:
+                    self._search_index = _load_index(
+                        self.path, 'search.pickle', lambda: SearchIndex(logs.search_texts()))
+            self._notify_load()
+        return self._search_index
+
+    @property
+    def error_index(self):
+        """ErrorIndex over logs, read from disk or built (and saved) on first use"""
+        if self._error_index is None:
+            logs = self.logs
+            process_index = self.process_index
+            with self._load_lock:
+                if self._error_index is None:
+                    self._error_index = _load_index(
+                        self.path, 'errors.pickle', lambda: ErrorIndex(logs, process_index))
+            self._notify_load()
+        return self._error_index
+
+    @property
+    def correlation_index(self):
+        """CorrelationIndex over logs, read from disk or built (and saved) on first use"""
+        if self._correlation_index is None:
+            logs = self.logs
+            with self._load_lock:
+                if self._correlation_index is None:
+                    self._correlation_index = _load_index(
+                        self.path, 'correlation.pickle', lambda: CorrelationIndex(logs.raw_spans()))
+            self._notify_load()
+        return self._correlation_index
+
+    @property
+    def time_index(self):
+        """TimeIndex over logs, read from disk or built (and saved) on first use"""
+        if self._time_index is None:
+            logs = self.logs
+            with self._load_lock:
+                if self._time_index is None:
+                    self._time_index = _load_index(
+                        self.path, 'times.pickle',
+                        lambda: TimeIndex(logs.iter_coded(('process', 'level', 'timestamp'))))
+            self._notify_load()
+        return self._time_index
+
+    @property
+    def raw_files(self):
+        """RawFile views of the member files keyed by file name, in archive order"""
+        if self._raw_files is None:
+            with self._load_lock:
+                if self._raw_files is None:
+                    self._raw_files = _load_raw_files(self.path, self.files)
+            self._notify_load()
+        return self._raw_files
+
+    @property
+    def combined_raw_file(self):
+        """CombinedRawFile over raw_files, the view shown when no file is selected"""
+        if self._combined_raw_file is None:
+            raw_files = self.raw_files
+            with self._load_lock:
+                if self._combined_raw_file is None:
+                    self._combined_raw_file = CombinedRawFile(raw_files)
+        return self._combined_raw_file
+
+    @property
+    def loaded_logs(self):
+        """Records if they are resident, without loading them"""
+        return self._logs
+
+    @property
+    def loaded_process_index(self):
+        """ProcessIndex if it is resident, without building it"""
+        return self._process_index
+
+    @property
+    def loaded_search_index(self):
+        """SearchIndex if it is resident, without loading it"""
+        return self._search_index
+
+    @property
+    def loaded_error_index(self):
+        """ErrorIndex if it is resident, without loading it"""
+        return self._error_index
+
+    @property
+    def loaded_correlation_index(self):
+        """CorrelationIndex if it is resident, without loading it"""
+        return self._correlation_index
+
+    @property
+    def loaded_time_index(self):
+        """TimeIndex if it is resident, without loading it"""
+        return self._time_index
+
+    @property
+    def loaded_raw_files(self):
+        """Raw files if they are resident, without loading them"""
+        return self._raw_files
+
+    def _notify_load(self):
+        on_load = self.on_load
+        if on_load is not None:
+            on_load()
+
+
+class RawFile:
+    """Line-addressed, read-only view of an extracted member file"""
+
+    def __init__(self, name, buffer, line_count, line_index, stride=LINE_INDEX_STRIDE):
+        self.name = name
+        self.buffer = buffer
+        self.line_count = line_count
+        self.line_index = line_index
+        self.stride = stride
+
+    def lines(self, start, stop):
+        """Decoded lines [start, stop) of the file, 0-based"""
+        start = max(0, start)
+        stop = min(stop, self.line_count)
+        if start >= stop:
+            return []
+        begin = self.line_offset(start)
+        end = self.line_offset(stop) - 1 if stop < self.line_count else len(self.buffer)
+        return str(self.buffer[begin:end], 'utf-8', 'ignore').split('\n')
+
+    def line_offset(self, line):
+        """Byte offset of the start of a line, 0-based"""
+        sample = line // self.stride
+        offset = self.line_index[sample]
+        find = self.buffer.find
+        # Skip forward from the nearest sampled line start
+        for _ in range(line - sample * self.stride):
+            offset = find(b'\n', offset) + 1
+        return offset
+
+    def nbytes(self):
+        """Memory held by the line index; the content itself is mmapped"""
+        return self.line_index.itemsize * len(self.line_index)
+
+
+class CombinedRawFile:
+    """All member files of a bundle as one view, each preceded by a banner line.
+
+    Offers the same lines() interface as RawFile. The combined line number
+    of every file's banner is kept in a cumulative array, so a range is
+    mapped to its files by bisection rather than by walking every file.
+    """
+
+    def __init__(self, raw_files):
+        self.raw_files = list(raw_files.values())
+        self.section_starts = array('Q')
+        line_count = 0
+        for raw_file in self.raw_files:
+            self.section_starts.append(line_count)
+            line_count += 1 + raw_file.line_count
+        self.line_count = line_count
+
+    def lines(self, start, stop):
+        """Decoded lines [start, stop) of the combined view, 0-based"""
+        start = max(0, start)
+        stop = min(stop, self.line_count)
+        lines = []
+        section = bisect_right(self.section_starts, start) - 1
+        while start < stop:
+            raw_file = self.raw_files[section]
+            section_start = self.section_starts[section]
+            if start == section_start:
+                lines.append(f'=== File: {raw_file.name} ===')
+                start += 1
+            lines.extend(raw_file.lines(start - section_start - 1, stop - section_start - 1))
+            start = section_start + 1 + raw_file.line_count
+            section += 1
+        return lines
+
+
+def bundle_path(cache_dir, cache_key):
+    """Directory holding the bundle for cache_key, or None for an invalid key"""
+    if not _CACHE_KEY_RE.match(cache_key):
+        return None
+    return os.path.join(cache_dir, cache_key)
+
+
+def create_staging(cache_dir, file_count):
+    """Create a staging directory for a new bundle.
+
+    Returns (path, content paths); the member files are extracted to the
+    content paths, in order, and parsed members are moved from there into
+    the member store with save_member.
+    """
+    tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+    content_paths = []
+    for idx in range(file_count):
+        member_path = os.path.join(tmp_path, 'files', f'{idx:04d}')
+        os.makedirs(member_path)
+        content_paths.append(os.path.join(member_path, 'content'))
+    return tmp_path, content_paths
+
+
+def discard_staging(tmp_path):
+    """Remove a staging directory that was not saved"""
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def remove_stale_staging(cache_dir):
+    """Remove the staging directories of ingests interrupted by a restart or crash.
+
+    Only safe while no ingest is running, i.e. at startup.
+    """
+    for name in os.listdir(cache_dir):
+        if name.startswith('.tmp-'):
+            discard_staging(os.path.join(cache_dir, name))
+
+
+def prune_store(cache_dir, max_age=0, max_bytes=0, keep=()):
+    """Remove stored bundles to keep the store within max_age and max_bytes.
+
+    Bundles unused for max_age seconds are removed, then the least recently
+    used ones until the bundles and their members take at most max_bytes on
+    disk (0 disables either limit). Bundles of an older store version are
+    always removed, and bundles in keep (those in memory) never are.
+    Members that no remaining bundle refers to are removed too, unless an
+    ingest is staging members that its bundle will refer to. Returns the
+    removed cache keys.
+    """
+    cutoff = time.time() - max_age
+    staging = False
+    bundles = []
+    references = {}
+    removed = []
+    for name in os.listdir(cache_dir):
+        if name.startswith('.tmp-'):
+            staging = True
+            continue
+        path = bundle_path(cache_dir, name)
+        if path is None or not os.path.isdir(path):
+            continue
+        meta = _read_meta(path)
+        if meta is None and name not in keep:
+            # Written by an older store version; never opened again
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+            continue
+        digests = {entry['digest'] for entry in meta['files']} - {None} if meta else set()
+        for digest in digests:
+            references[digest] = references.get(digest, 0) + 1
+        if name not in keep:
+            last_used = os.path.getmtime(os.path.join(path, 'meta.json'))
+            bundles.append((last_used, name, path, digests))
+
+    members_dir = os.path.join(cache_dir, MEMBERS_DIR)
+    member_sizes = {}
+    if os.path.isdir(members_dir):
+        member_sizes = {digest: _tree_size(member_path(cache_dir, digest))
+                        for digest in os.listdir(members_dir)}
+    total = sum(member_sizes.get(digest, 0) for digest in references)
+    total += sum(_tree_size(os.path.join(cache_dir, name)) for name in keep
+                 if bundle_path(cache_dir, name) is not None)
+    sizes = {name: _tree_size(path) for _, name, path, _ in bundles}
+    total += sum(sizes.values())
+
+    # Least recently used first
+    for last_used, name, path, digests in sorted(bundles):
+        if not (max_age and last_used < cutoff) and not (max_bytes and total > max_bytes):
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+        total -= sizes[name]
+        for digest in digests:
+            references[digest] -= 1
+            if not references[digest]:
+                del references[digest]
+                total -= member_sizes.get(digest, 0)
+
+    if not staging:
+        for digest in member_sizes:
+            if digest not in references:
+                shutil.rmtree(member_path(cache_dir, digest), ignore_errors=True)
+    return removed
+
+
+def member_path(cache_dir, digest):
+    """Directory of the stored member with the given content digest"""
+    return os.path.join(cache_dir, MEMBERS_DIR, digest)
+
+
+def open_member(cache_dir, digest, name):
+    """FileRecords of a stored member under the given file name, or None if it is not stored"""
+    with _members_lock:
+        shared = _members.get(digest)
+    if shared is None:
+        path = member_path(cache_dir, digest)
+        meta = _read_meta(path)
+        if meta is None:
+            return None
+        with open(os.path.join(path, 'tables.json')) as f:
+            tables = json.load(f)
+        with open(os.path.join(path, 'columns.bin'), 'rb') as f:
+            columns = FileRecords.read_columns(f, meta['records'])
+        loaded = FileRecords(name, open_buffer(os.path.join(path, 'content')), columns, tables, digest)
+        with _members_lock:
+            shared = _members.setdefault(digest, loaded)
+    return shared.renamed(name)
+
+
+def save_member(cache_dir, staging_path, file_records):
+    """Move a parsed member from its staging directory into the member store"""
+    line_index, line_count = build_line_index(file_records.buffer)
+    with open(os.path.join(staging_path, 'lines.idx'), 'wb') as f:
+        line_index.tofile(f)
+    with open(os.path.join(staging_path, 'columns.bin'), 'wb') as f:
+        file_records.write(f)
+    with open(os.path.join(staging_path, 'tables.json'), 'w') as f:
+        json.dump(file_records.tables, f)
+    # meta.json is written last; a member without it is never opened
+    with open(os.path.join(staging_path, 'meta.json'), 'w') as f:
+        json.dump({
+            'version': STORE_VERSION,
+            'size': file_records.size,
+            'lines': line_count,
+            'records': file_records.count
+        }, f)
+
+    final_path = member_path(cache_dir, file_records.digest)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    if os.path.isdir(final_path) and _read_meta(final_path) is None:
+        # Left behind by an older store version or an interrupted write
+        shutil.rmtree(final_path, ignore_errors=True)
+    try:
+        os.rename(staging_path, final_path)
+    except OSError:
+        # Stored by another request first; the mmapped content stays
+        # readable until the records are released
+        shutil.rmtree(staging_path, ignore_errors=True)
+    with _members_lock:
+        _members.setdefault(file_records.digest, file_records)
+
+
+def save_bundle(cache_dir, cache_key, tmp_path, logs, summary, process_index, search_index=None,
+                error_index=None, correlation_index=None):
+    """Persist a bundle and return it as a LogBundle.
+
+    logs is the LogRecords of the bundle, whose members must already be in
+    the member store; tmp_path is the bundle's staging directory.
+    """
+    final_path = bundle_path(cache_dir, cache_key)
+    if final_path is None:
+        raise ValueError(f'Invalid cache key: {cache_key}')
+
+    try:
+        # Extracted members were moved to the member store or are duplicates
+        shutil.rmtree(os.path.join(tmp_path, 'files'), ignore_errors=True)
+
+        files = []
+        for file_records in logs.files:
+            meta = None
+            if file_records.digest is not None:
+                meta = _read_meta(member_path(cache_dir, file_records.digest))
+            files.append({
+                'name': file_records.name,
+                'digest': file_records.digest if meta else None,
+                'size': meta['size'] if meta else 0,
+                'lines': meta['lines'] if meta else 0,
+                'records': meta['records'] if meta else 0
+            })
+
+        _write_index(tmp_path, 'process_index.pickle', process_index)
+        if search_index is not None:
+            _write_index(tmp_path, 'search.pickle', search_index)
+        if error_index is not None:
+            _write_index(tmp_path, 'errors.pickle', error_index)
+        if correlation_index is not None:
+            _write_index(tmp_path, 'correlation.pickle', correlation_index)
+
+        # meta.json is written last; a bundle without it is never opened
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': STORE_VERSION,
+                'summary': summary,
+                'files': files
+            }, f)
+
+        if os.path.isdir(final_path) and open_bundle(cache_dir, cache_key) is None:
+            # Left behind by an older store version or an interrupted write
+            shutil.rmtree(final_path, ignore_errors=True)
+        try:
+            os.rename(tmp_path, final_path)
+        except OSError:
+            # Another request persisted the same bundle first
+            discard_staging(tmp_path)
+    except Exception:
+        discard_staging(tmp_path)
+        raise
+
+    return LogBundle(final_path, summary, files, logs=logs, process_index=process_index,
+                     search_index=search_index, error_index=error_index,
+                     correlation_index=correlation_index)
+
+
+def open_bundle(cache_dir, cache_key):
+    """Open a persisted bundle, or return None if it is missing or outdated"""
+    path = bundle_path(cache_dir, cache_key)
+    if path is None:
+        return None
+    meta = _read_meta(path)
+    if meta is None:
+        return None
+    try:
+        # The modification time of meta.json is the bundle's last use (see prune_store)
+        os.utime(os.path.join(path, 'meta.json'))
+    except OSError:
+        pass
+    return LogBundle(path, meta['summary'], meta['files'])
+
+
+def build_line_index(data, stride=LINE_INDEX_STRIDE):
+    """Return (offsets, line_count) for bytes-like data split on newlines.
+
+    offsets holds the start of every stride-th line, so any line can be
+    reached by seeking to the nearest sample and skipping < stride lines.
+    Lines are counted like str.split('\\n'): a trailing newline starts an
+    extra, empty line.
+    """
+    offsets = array('Q')
+    line_count = 0
+    pos = 0
+    size = len(data)
+    while True:
+        end = data.find(b'\n', min(pos + LINE_INDEX_BLOCK_SIZE, size))
+        if end == -1:
+            end = size
+        lines = data[pos:end].split(b'\n')
+        starts = accumulate(map(add, map(len, lines), repeat(1)), initial=pos)
+        offsets.extend(islice(starts, (-line_count) % stride, len(lines), stride))
+        line_count += len(lines)
+        if end == size:
+            break
+        pos = end + 1
+    return offsets, line_count
+
+
+def _read_meta(path):
+    """meta.json of a stored member or bundle, or None if it is missing or outdated"""
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != STORE_VERSION:
+        return None
+    return meta
+
+
+def _tree_size(path):
+    """Bytes in the files under path"""
+    size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+def _load_records(path, files):
+    cache_dir = os.path.dirname(path)
+    file_records = []
+    for entry in files:
+        loaded = None
+        if entry['digest'] is not None:
+            loaded = open_member(cache_dir, entry['digest'], entry['name'])
+        if loaded is None:
+            # The member could not be extracted from the archive
+            loaded = FileRecords(entry['name'], b'', new_columns(), new_tables())
+        file_records.append(loaded)
+    return LogRecords(file_records)
+
+
+def _load_index(path, filename, build):
+    """Unpickle an index from the bundle, or build it and save it for next time"""
+    try:
+        with open(os.path.join(path, filename), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    index = build()
+    try:
+        _write_index(path, filename, index)
+    except OSError as e:
+        print(f"Error saving {filename} to {path}: {str(e)}")
+    return index
+
+
+def _write_index(path, filename, index):
+    fd, tmp_file = tempfile.mkstemp(prefix='.tmp-', dir=path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, os.path.join(path, filename))
+    except Exception:
+        os.remove(tmp_file)
+        raise
+
+
+def _load_raw_files(path, files):
+    cache_dir = os.path.dirname(path)
+    raw_files = {}
+    for entry in files:
+        if entry['digest'] is None:
+            # The member could not be extracted from the archive
+            continue
+        stored_path = member_path(cache_dir, entry['digest'])
+        content_path = os.path.join(stored_path, 'content')
+        line_index = array('Q')
+        with open(os.path.join(stored_path, 'lines.idx'), 'rb') as f:
+            line_index.frombytes(f.read())
+        raw_files[entry['name']] = RawFile(entry['name'], open_buffer(content_path),
+                                           entry['lines'], line_index)
+    return raw_files
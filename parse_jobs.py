@@ -0,0 +1,135 @@
+"""Background parse jobs with progress reporting"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ParseJob:
+    """One parse of an uploaded bundle, run on the ParseJobs pool.
+
+    Progress counters are advanced by the parser as members are extracted
+    and chunks are parsed, and can be read at any time through to_dict().
+    """
+
+    def __init__(self, key, name):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.name = name
+        self.state = 'queued'
+        self.phase = ''
+        self.progress = {
+            'filesTotal': 0,
+            'filesExtracted': 0,
+            'bytesTotal': 0,
+            'bytesExtracted': 0,
+            'bytesToParse': 0,
+            'bytesParsed': 0,
+            'records': 0
+        }
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def advance(self, **counts):
+        """Add counts to the progress counters"""
+        with self._lock:
+            for name, count in counts.items():
+                self.progress[name] += count
+
+    def set_totals(self, files, size):
+        """Set the number of members and their uncompressed size"""
+        with self._lock:
+            self.progress['filesTotal'] = files
+            self.progress['bytesTotal'] = size
+
+    def wait(self, timeout=None):
+        """Wait until the job has finished; True if it has"""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        """Job state for the API; the result is included once the job is done"""
+        with self._lock:
+            job = {
+                'jobId': self.id,
+                'cacheKey': self.key,
+                'fileName': self.name,
+                'state': self.state,
+                'phase': self.phase,
+                'progress': dict(self.progress),
+                'elapsed': round((self.finished or time.time()) - self.created, 3)
+            }
+        if self.state == 'done':
+            job['summary'] = self.result
+        elif self.state == 'failed':
+            job['error'] = self.error
+        return job
+
+    def _run(self, work):
+        self.state = 'running'
+        try:
+            self.result = work(self)
+            self.state = 'done'
+        except Exception as e:
+            print(f"Parse job {self.id} failed: {str(e)}")
+            self.error = str(e)
+            self.state = 'failed'
+        finally:
+            self.finished = time.time()
+            self._done.set()
+
+
+class ParseJobs:
+    """Bounded pool of background parse jobs, keyed by job id.
+
+    Only one job runs per cache key: submitting a bundle that is already
+    being parsed returns the job in flight. Finished jobs stay queryable
+    for ttl seconds.
+    """
+
+    def __init__(self, workers, ttl):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix='parse-job')
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, name, work):
+        """Run work(job) in the background, returning (job, True if it is new).
+
+        work returns the job result; an exception marks the job as failed.
+        """
+        with self._lock:
+            self._expire()
+            job = self._in_flight.get(key)
+            if job is not None:
+                return job, False
+            job = ParseJob(key, name)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+        self._executor.submit(self._run, job, work)
+        return job, True
+
+    def get(self, job_id):
+        """The job with job_id, or None if it is unknown or expired"""
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def _run(self, job, work):
+        try:
+            job._run(work)
+        finally:
+            with self._lock:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < cutoff]:
+            del self._jobs[job_id]
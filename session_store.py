@@ -0,0 +1,60 @@
+"""Bounded in-memory store of per-user sessions (comparisons, XML trees)"""
+import threading
+import time
+
+
+class _Entry:
+    """A stored session with its last access time"""
+    __slots__ = ('session', 'last_access')
+
+    def __init__(self, session, last_access):
+        self.session = session
+        self.last_access = last_access
+
+
+class SessionStore:
+    """The most recently used sessions, keyed by their id attribute.
+
+    Sessions idle for ttl seconds are dropped, as are the least recently
+    used ones beyond max_sessions. on_drop, if given, is called with every
+    dropped session, e.g. to remove the files it holds.
+    """
+
+    def __init__(self, max_sessions, ttl, on_drop=None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._on_drop = on_drop
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def add(self, session):
+        """Store session, dropping the least recently used beyond max_sessions"""
+        with self._lock:
+            dropped = self._expire()
+            self._entries[session.id] = _Entry(session, time.monotonic())
+            if len(self._entries) > self.max_sessions:
+                oldest = sorted(self._entries, key=lambda key: self._entries[key].last_access)
+                for key in oldest[:len(self._entries) - self.max_sessions]:
+                    dropped.append(self._entries.pop(key).session)
+        self._drop(dropped)
+        return session
+
+    def get(self, session_id):
+        """The session with session_id, or None if it is unknown or expired"""
+        with self._lock:
+            dropped = self._expire()
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry.last_access = time.monotonic()
+        self._drop(dropped)
+        return entry.session if entry is not None else None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        return [self._entries.pop(key).session
+                for key in [key for key, entry in self._entries.items() if entry.last_access < cutoff]]
+
+    def _drop(self, sessions):
+        if self._on_drop is not None:
+            for session in sessions:
+                self._on_drop(session)
@@ -10,6 +10,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const clearFileBtn = document.getElementById('clearFileBtn');
     const parseBtn = document.getElementById('parseBtn');
     const parseSpinner = document.getElementById('parseSpinner');
+    const parseProgress = document.getElementById('parseProgress');
     const processSection = document.getElementById('processSection');
     const processList = document.getElementById('processList');
     const statsBar = document.getElementById('statsBar');
@@ -119,10 +120,15 @@ document.addEventListener('DOMContentLoaded', function() {
         if (!currentFile) return;
 
         parseSpinner.classList.add('show');
+        parseProgress.textContent = 'Uploading log files...';
         
         try {
             const formData = new FormData();
             formData.append('file', currentFile);
+            if (cacheKey) {
+                // A newer snapshot of the same logs only needs its appended data parsed
+                formData.append('base_key', cacheKey);
+            }
             
             console.log(`Uploading ${currentFile.name} to server for parsing...`);
             
@@ -131,12 +137,17 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: formData
             });
             
-            const result = await response.json();
+            let result = await response.json();
             
             if (!result.success) {
                 throw new Error(result.error || 'Failed to parse logs');
             }
             
+            if (!result.summary) {
+                // Big bundles are parsed in the background; poll the job until it is done
+                result = await waitForParseJob(result);
+            }
+            
             cacheKey = result.cacheKey;
             summary = result.summary;
             
@@ -163,6 +174,43 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Poll a background parse job, showing its progress, until it has finished
+    async function waitForParseJob(job) {
+        while (job.state !== 'done') {
+            if (job.state === 'failed') {
+                throw new Error(job.error || 'Failed to parse logs');
+            }
+            showParseProgress(job);
+            await new Promise(resolve => setTimeout(resolve, 500));
+
+            const response = await fetch(`/api/parse-jobs/${encodeURIComponent(job.jobId)}`);
+            job = await response.json();
+            if (!job.success) {
+                throw new Error(job.error || 'Failed to get parse progress');
+            }
+        }
+        return job;
+    }
+
+    function showParseProgress(job) {
+        const progress = job.progress;
+        let text;
+        if (job.phase === 'extracting') {
+            text = `Extracting files: ${progress.filesExtracted} of ${progress.filesTotal} ` +
+                `(${formatFileSize(progress.bytesExtracted)} of ${formatFileSize(progress.bytesTotal)})`;
+        } else if (job.phase === 'parsing') {
+            const percent = progress.bytesToParse ? Math.floor(progress.bytesParsed * 100 / progress.bytesToParse) : 100;
+            text = `Parsing log files: ${percent}% (${progress.records.toLocaleString()} entries)`;
+        } else if (job.phase === 'indexing') {
+            text = `Indexing ${progress.records.toLocaleString()} entries...`;
+        } else if (job.phase === 'saving') {
+            text = 'Saving parsed logs...';
+        } else {
+            text = 'Waiting for a free parser...';
+        }
+        parseProgress.textContent = text;
+    }
+
     // Display CM Processes
     function displayProcesses() {
         // Display stats
@@ -567,15 +615,22 @@ document.addEventListener('DOMContentLoaded', function() {
             completeLogStats.style.display = 'block';
             paginationControls.style.display = 'none';
 
-            const response = await fetch(`/api/get-full-cm-logs/${encodeURIComponent(cacheKey)}/${encodeURIComponent(selectedCM)}`);
-            const result = await response.json();
-
-            if (!result.success) {
-                throw new Error(result.error);
+            const response = await fetchCMLog(selectedCM);
+            const totalLogs = response.headers.get('X-Total-Logs');
+            const processName = response.headers.get('X-Process-Name');
+
+            // Append the log text as it streams in
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            completeLogDisplay.textContent = '';
+            statsText.textContent = `Loading ${totalLogs} log entries for CM process: ${processName}...`;
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                completeLogDisplay.appendChild(document.createTextNode(decoder.decode(value, { stream: true })));
             }
-
-            completeLogDisplay.textContent = result.rawText;
-            statsText.textContent = `Displaying all ${result.totalLogs} log entries for CM process: ${result.processName}`;
+            completeLogDisplay.appendChild(document.createTextNode(decoder.decode()));
+            statsText.textContent = `Displaying all ${totalLogs} log entries for CM process: ${processName}`;
             
             // Scroll to the complete log section
             completeLogSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
@@ -679,6 +734,18 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // Fetch the streamed raw log of a CM process; errors come back as JSON
+    async function fetchCMLog(processKey) {
+        const response = await fetch(`/api/get-full-cm-logs/${encodeURIComponent(cacheKey)}/${encodeURIComponent(processKey)}`);
+        const contentType = response.headers.get('Content-Type') || '';
+
+        if (!response.ok || contentType.includes('application/json')) {
+            const result = await response.json();
+            throw new Error(result.error);
+        }
+        return response;
+    }
+
     // Download individual CM log
     async function downloadCMLog(processKey, processName, processPid) {
         if (!cacheKey) {
@@ -687,15 +754,10 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         try {
-            const response = await fetch(`/api/get-full-cm-logs/${encodeURIComponent(cacheKey)}/${encodeURIComponent(processKey)}`);
-            const result = await response.json();
-
-            if (!result.success) {
-                throw new Error(result.error);
-            }
+            const response = await fetchCMLog(processKey);
 
             // Create a blob and download
-            const blob = new Blob([result.rawText], { type: 'text/plain' });
+            const blob = await response.blob();
             const url = window.URL.createObjectURL(blob);
             const a = document.createElement('a');
             a.href = url;
@@ -18,6 +18,20 @@ document.addEventListener('DOMContentLoaded', function() {
     const statsSection = document.getElementById('statsSection');
     const diffSection = document.getElementById('diffSection');
     const diffResults = document.getElementById('diffResults');
+    const contextLines = document.getElementById('contextLines');
+    const file1 = document.getElementById('file1');
+    const file2 = document.getElementById('file2');
+    const archiveSection = document.getElementById('archiveSection');
+    const archiveMembers = document.getElementById('archiveMembers');
+    const archiveCounts = document.getElementById('archiveCounts');
+    
+    // Side-by-side results are paged from a diff session on the server
+    let diffId = null;
+    let nextHunks = null;
+    
+    // Two compared ZIPs and the member shown from them
+    let archiveId = null;
+    let archiveMember = null;
     
     const toast = new bootstrap.Toast(document.getElementById('notificationToast'));
     
@@ -40,46 +54,58 @@ document.addEventListener('DOMContentLoaded', function() {
         const text1Value = text1.value;
         const text2Value = text2.value;
         
-        if (!text1Value && !text2Value) {
+        if (file1.files.length || file2.files.length) {
+            if (!file1.files.length || !file2.files.length) {
+                showNotification('Please select a file on both sides', 'warning');
+                return;
+            }
+        } else if (!text1Value && !text2Value) {
             showNotification('Please enter text in at least one field', 'warning');
             return;
         }
         
-        const viewMode = document.querySelector('input[name="viewMode"]:checked').value;
-        
         compareBtn.disabled = true;
         compareBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Comparing...';
         
         try {
-            const response = await fetch('/api/compare-text', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    text1: text1Value,
-                    text2: text2Value,
-                    type: viewMode
-                })
-            });
+            let response;
+            if (file1.files.length) {
+                // Uploaded files are compared on the server without going through the textareas
+                const formData = new FormData();
+                formData.append('file1', file1.files[0]);
+                formData.append('file2', file2.files[0]);
+                Object.entries(diffOptions()).forEach(([name, value]) => formData.append(name, value));
+                response = await fetch('/api/compare-files', {
+                    method: 'POST',
+                    body: formData
+                });
+            } else {
+                response = await fetch('/api/compare-text', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify(Object.assign({
+                        text1: text1Value,
+                        text2: text2Value
+                    }, diffOptions()))
+                });
+            }
             
             const data = await response.json();
             
             if (data.success) {
-                displayStats(data.stats);
-                
-                if (data.type === 'side-by-side') {
-                    displaySideBySideDiff(data.diff);
+                archiveMember = null;
+                if (data.type === 'archive') {
+                    displayArchive(data);
                 } else {
-                    displayUnifiedDiff(data.diff);
+                    archiveSection.style.display = 'none';
+                    displayDiff(data);
                 }
                 
-                statsSection.style.display = 'block';
-                diffSection.style.display = 'block';
-                
                 showNotification('Comparison completed successfully!', 'success');
             } else {
-                showNotification(data.message, 'danger');
+                showNotification(data.message || data.error, 'danger');
             }
         } catch (error) {
             console.error('Error:', error);
@@ -90,6 +116,83 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    // View mode, algorithm and context of the diff
+    function diffOptions() {
+        return {
+            type: document.querySelector('input[name="viewMode"]:checked').value,
+            algorithm: document.getElementById('diffAlgorithm').value,
+            context: contextLines.value
+        };
+    }
+    
+    // Show a computed diff and its statistics
+    function displayDiff(data) {
+        displayStats(data.stats);
+        
+        if (data.type === 'side-by-side') {
+            displaySideBySideDiff(data);
+        } else {
+            displayUnifiedDiff(data.diff);
+        }
+        
+        statsSection.style.display = 'block';
+        diffSection.style.display = 'block';
+    }
+    
+    // List the members of two compared ZIPs; clicking one diffs it
+    function displayArchive(data) {
+        archiveId = data.compare_id;
+        const badges = {
+            modified: 'bg-warning text-dark',
+            added: 'bg-success',
+            removed: 'bg-danger',
+            identical: 'bg-light text-dark'
+        };
+        let html = '';
+        
+        data.members.forEach(member => {
+            html += '<tr data-name="' + escapeHtml(member.name) + '">';
+            html += '<td class="font-monospace">' + escapeHtml(member.name) + '</td>';
+            html += '<td><span class="badge ' + badges[member.status] + '">' + member.status + '</span></td>';
+            html += '<td class="text-end">' + (member.left_size === null ? '' : member.left_size) + '</td>';
+            html += '<td class="text-end">' + (member.right_size === null ? '' : member.right_size) + '</td>';
+            html += '</tr>';
+        });
+        
+        archiveMembers.innerHTML = html;
+        archiveCounts.textContent = Object.entries(data.counts).map(([status, count]) => count + ' ' + status).join(', ');
+        archiveSection.style.display = 'block';
+        statsSection.style.display = 'none';
+        diffSection.style.display = 'none';
+        diffResults.innerHTML = '';
+    }
+    
+    // Diff one member of the compared ZIPs
+    async function loadArchiveMember(name) {
+        const params = new URLSearchParams(Object.assign({name: name}, diffOptions()));
+        const data = await fetchDiffJson('/api/compare-files/' + archiveId + '/member?' + params);
+        if (data) {
+            archiveMember = name;
+            displayDiff(data);
+        }
+    }
+    
+    archiveMembers.addEventListener('click', function(e) {
+        const row = e.target.closest('tr');
+        if (row) {
+            loadArchiveMember(row.dataset.name);
+        }
+    });
+    
+    // Re-run the current comparison with the current options
+    function recompare() {
+        if (archiveMember !== null) {
+            loadArchiveMember(archiveMember);
+        } else {
+            compareBtn.click();
+        }
+    }
+    
     // Display statistics
     function displayStats(stats) {
         document.getElementById('similarityPercent').textContent = stats.similarity_percent + '%';
@@ -100,11 +203,119 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('totalLinesRight').textContent = stats.total_lines_right;
     }
     
-    // Display side-by-side diff
-    function displaySideBySideDiff(diff) {
+    // Display the first page of side-by-side hunks
+    function displaySideBySideDiff(page) {
+        diffId = page.diff_id;
+        diffResults.innerHTML = '';
+        appendHunks(page);
+    }
+    
+    // Append a page of hunks, with collapsed unchanged regions and a load-more row
+    function appendHunks(page) {
         let html = '';
         
-        diff.forEach(line => {
+        page.hunks.forEach(hunk => {
+            if (hunk.gap_before) {
+                html += gapHtml(hunk.gap_before);
+            }
+            if (hunk.row_offset === 0) {
+                html += '<div class="diff-hunk-header">' + escapeHtml(hunk.header) + '</div>';
+            }
+            html += rowsHtml(hunk.rows);
+        });
+        
+        if (page.next) {
+            html += '<div class="diff-load-more"><i class="bi bi-chevron-double-down"></i> Load more changes (' +
+                (page.total_hunks - page.next.hunk) + ' hunks left)</div>';
+        } else if (page.gap_after) {
+            html += gapHtml(page.gap_after);
+        }
+        if (!page.hunks.length && !page.gap_after) {
+            html += '<div class="diff-hunk-header">No differences</div>';
+        }
+        
+        nextHunks = page.next;
+        diffResults.insertAdjacentHTML('beforeend', html);
+    }
+    
+    function gapHtml(gap) {
+        return '<div class="diff-gap" data-left-line="' + gap.left_line + '" data-right-line="' + gap.right_line +
+            '" data-count="' + gap.count + '"><i class="bi bi-arrows-expand"></i> ' + gap.count +
+            ' unchanged line' + (gap.count === 1 ? '' : 's') + '</div>';
+    }
+    
+    // Load the next page of hunks
+    async function loadMoreHunks(button) {
+        button.remove();
+        const params = new URLSearchParams({
+            context: contextLines.value,
+            hunk: nextHunks.hunk,
+            row: nextHunks.row
+        });
+        const data = await fetchDiffJson('/api/compare-text/' + diffId + '/hunks?' + params);
+        if (data) {
+            appendHunks(data);
+        }
+    }
+    
+    // Replace a collapsed region with its lines (what is not returned stays collapsed)
+    async function expandGap(gapElement) {
+        const gap = {
+            left_line: parseInt(gapElement.dataset.leftLine),
+            right_line: parseInt(gapElement.dataset.rightLine),
+            count: parseInt(gapElement.dataset.count)
+        };
+        const params = new URLSearchParams(gap);
+        const data = await fetchDiffJson('/api/compare-text/' + diffId + '/lines?' + params);
+        if (!data) {
+            return;
+        }
+        let html = rowsHtml(data.rows);
+        const shown = data.rows.length;
+        if (shown < gap.count) {
+            html += gapHtml({
+                left_line: gap.left_line + shown,
+                right_line: gap.right_line + shown,
+                count: gap.count - shown
+            });
+        }
+        gapElement.insertAdjacentHTML('afterend', html);
+        gapElement.remove();
+    }
+    
+    async function fetchDiffJson(url) {
+        try {
+            const response = await fetch(url);
+            const data = await response.json();
+            if (!data.success) {
+                showNotification(data.error, 'danger');
+                return null;
+            }
+            return data;
+        } catch (error) {
+            console.error('Error:', error);
+            showNotification('Error: ' + error.message, 'danger');
+            return null;
+        }
+    }
+    
+    diffResults.addEventListener('click', function(e) {
+        const gapElement = e.target.closest('.diff-gap');
+        if (gapElement) {
+            expandGap(gapElement);
+            return;
+        }
+        const loadMore = e.target.closest('.diff-load-more');
+        if (loadMore) {
+            loadMoreHunks(loadMore);
+        }
+    });
+    
+    // Side-by-side rows
+    function rowsHtml(rows) {
+        let html = '';
+        
+        rows.forEach(line => {
             let leftClass = '';
             let rightClass = '';
             
@@ -139,7 +350,7 @@ document.addEventListener('DOMContentLoaded', function() {
             html += '</div>';
         });
         
-        diffResults.innerHTML = html;
+        return html;
     }
     
     // Display unified diff
@@ -174,6 +385,14 @@ document.addEventListener('DOMContentLoaded', function() {
         statsSection.style.display = 'none';
         diffSection.style.display = 'none';
         diffResults.innerHTML = '';
+        diffId = null;
+        nextHunks = null;
+        file1.value = '';
+        file2.value = '';
+        archiveSection.style.display = 'none';
+        archiveMembers.innerHTML = '';
+        archiveId = null;
+        archiveMember = null;
     });
     
     // Swap texts
@@ -181,6 +400,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const temp = text1.value;
         text1.value = text2.value;
         text2.value = temp;
+        const files = file1.files;
+        file1.files = file2.files;
+        file2.files = files;
         updateLineCounts();
         
         // If results are shown, re-compare
@@ -199,11 +421,27 @@ document.addEventListener('DOMContentLoaded', function() {
     document.querySelectorAll('input[name="viewMode"]').forEach(radio => {
         radio.addEventListener('change', function() {
             if (diffSection.style.display === 'block') {
-                compareBtn.click();
+                recompare();
             }
         });
     });
     
+    // Context change - re-page the current comparison, or re-compare the unified diff
+    contextLines.addEventListener('change', async function() {
+        if (diffSection.style.display !== 'block') {
+            return;
+        }
+        if (diffId && sideBySideMode.checked) {
+            const data = await fetchDiffJson('/api/compare-text/' + diffId + '/hunks?' +
+                new URLSearchParams({context: contextLines.value}));
+            if (data) {
+                displaySideBySideDiff(data);
+                return;
+            }
+        }
+        recompare();
+    });
+    
     // Helper function to escape HTML
     function escapeHtml(text) {
         const map = {
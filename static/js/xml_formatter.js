@@ -37,6 +37,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const toast = new bootstrap.Toast(document.getElementById('notificationToast'));
     
     let currentTreeData = null;
+    let currentTreeId = null;
     let searchMatches = [];
     let currentMatchIndex = -1;
     let selectedText = '';
@@ -83,6 +84,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Store tree data
                 if (data.tree) {
                     currentTreeData = data.tree;
+                    currentTreeId = data.tree_id;
                     renderTree(data.tree);
                 }
                 
@@ -94,6 +96,7 @@ document.addEventListener('DOMContentLoaded', function() {
             } else {
                 xmlOutput.value = '';
                 currentTreeData = null;
+                currentTreeId = null;
                 outputFooter.style.display = 'block';
                 outputMessage.innerHTML = '<span class="text-danger"><i class="bi bi-x-circle"></i> ' + data.message + ': ' + data.error + '</span>';
                 copyBtn.disabled = true;
@@ -154,6 +157,7 @@ document.addEventListener('DOMContentLoaded', function() {
             </div>
         `;
         currentTreeData = null;
+        currentTreeId = null;
         outputFooter.style.display = 'none';
         statsSection.style.display = 'none';
         copyBtn.disabled = true;
@@ -174,12 +178,11 @@ document.addEventListener('DOMContentLoaded', function() {
             xmlTreeView.style.display = 'block';
             if (currentTreeData) {
                 treeControls.style.display = 'flex';
-                renderTree(currentTreeData);
             }
         }
     });
     
-    // Expand All button
+    // Expand All button (nodes whose children are not fetched yet stay collapsed)
     expandAllBtn.addEventListener('click', function() {
         const allToggles = xmlTreeContent.querySelectorAll('.tree-toggle.collapsed');
         allToggles.forEach(toggle => {
@@ -187,13 +190,13 @@ document.addEventListener('DOMContentLoaded', function() {
             const parentDiv = node.parentElement;
             const children = parentDiv.querySelector('.tree-children');
             
-            if (children) {
+            if (children && !children.dataset.pending) {
                 children.classList.remove('collapsed');
                 toggle.classList.remove('collapsed');
                 toggle.classList.add('expanded');
             }
         });
-        showNotification('All nodes expanded', 'success');
+        showNotification('All loaded nodes expanded', 'success');
     });
     
     // Collapse All button
@@ -285,14 +288,15 @@ document.addEventListener('DOMContentLoaded', function() {
         xmlTreeContent.innerHTML = '';
         const treeHtml = buildTreeNode(node, 0);
         xmlTreeContent.innerHTML = treeHtml;
-        
-        // Add event listeners for toggle buttons
-        attachTreeEventListeners();
     }
     
     // Build tree node HTML - Simple style
+    // Only the first levels come with the formatted XML; a node with fewer
+    // children than its childCount fetches the rest when expanded
     function buildTreeNode(node, level) {
-        const hasChildren = node.children && node.children.length > 0;
+        const childCount = node.childCount !== undefined ? node.childCount : node.children.length;
+        const hasChildren = childCount > 0;
+        const isPending = hasChildren && node.children.length === 0;
         const hasText = node.text && node.text.trim() !== '';
         const hasAttributes = Object.keys(node.attributes).length > 0;
         
@@ -316,7 +320,9 @@ document.addEventListener('DOMContentLoaded', function() {
             html += '<div class="tree-node">';
             
             // Toggle arrow
-            if (hasChildren || hasAttributes) {
+            if (isPending) {
+                html += '<span class="tree-toggle collapsed"></span>';
+            } else if (hasChildren || hasAttributes) {
                 html += '<span class="tree-toggle expanded"></span>';
             } else {
                 html += '<span class="tree-toggle leaf"></span>';
@@ -328,7 +334,7 @@ document.addEventListener('DOMContentLoaded', function() {
             html += '<span class="tree-tag-bracket">&gt;</span>';
             
             // Count of children/attributes
-            const itemCount = (hasChildren ? node.children.length : 0) + (hasAttributes ? Object.keys(node.attributes).length : 0);
+            const itemCount = childCount + (hasAttributes ? Object.keys(node.attributes).length : 0);
             if (itemCount > 0) {
                 html += ' <span class="tree-count">{' + itemCount + '}</span>';
             }
@@ -337,7 +343,11 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Children container
             if (hasAttributes || hasChildren) {
-                html += '<div class="tree-children">';
+                if (isPending) {
+                    html += '<div class="tree-children collapsed" data-node-id="' + node.id + '" data-pending="true">';
+                } else {
+                    html += '<div class="tree-children" data-node-id="' + node.id + '">';
+                }
                 
                 // Attributes on separate lines
                 if (hasAttributes) {
@@ -355,6 +365,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     for (const child of node.children) {
                         html += buildTreeNode(child, level + 1);
                     }
+                    if (!isPending && node.children.length < childCount) {
+                        html += buildLoadMore(node, childCount - node.children.length);
+                    }
                 }
                 
                 html += '</div>';
@@ -366,39 +379,107 @@ document.addEventListener('DOMContentLoaded', function() {
         return html;
     }
     
-    // Attach event listeners to tree toggle buttons
-    function attachTreeEventListeners() {
-        // Only attach click handlers to toggle arrows, not the entire node
-        const toggles = xmlTreeContent.querySelectorAll('.tree-toggle:not(.leaf)');
+    // "N more" row of a node whose children are only partly loaded
+    function buildLoadMore(node, remaining) {
+        const lastChild = node.children[node.children.length - 1];
+        return '<div class="tree-node tree-load-more" data-node-id="' + node.id + '" data-after="' + lastChild.id + '">' +
+            '<span class="tree-toggle leaf"></span>' + remaining + ' more&hellip;</div>';
+    }
+    
+    // Fetch children of a node from the server, after the last one loaded
+    async function fetchTreeChildren(nodeId, after) {
+        const params = new URLSearchParams({ id: nodeId });
+        if (after !== undefined) {
+            params.set('after', after);
+        }
+        const response = await fetch('/api/xml-tree/' + currentTreeId + '/nodes?' + params);
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.error);
+        }
+        return data.node;
+    }
+    
+    // Add fetched children to a node's children container
+    function appendTreeChildren(container, node) {
+        container.querySelector(':scope > .tree-load-more')?.remove();
+        let html = '';
+        for (const child of node.children) {
+            html += buildTreeNode(child, child.level);
+        }
+        // Child elements are the wrapper divs; attribute rows are .tree-node
+        const shown = container.querySelectorAll(':scope > div:not(.tree-node)').length + node.children.length;
+        if (node.children.length > 0 && shown < node.childCount) {
+            html += buildLoadMore(node, node.childCount - shown);
+        }
+        container.insertAdjacentHTML('beforeend', html);
+    }
+    
+    // Expand or collapse a node, fetching its children the first time
+    async function toggleTreeNode(toggle) {
+        const parentDiv = toggle.closest('.tree-node').parentElement;
+        const children = parentDiv.querySelector('.tree-children');
         
-        toggles.forEach(toggle => {
-            toggle.addEventListener('click', function(e) {
-                e.preventDefault();
-                e.stopPropagation();
-                
-                const parentDiv = this.closest('.tree-node').parentElement;
-                const children = parentDiv.querySelector('.tree-children');
-                
-                if (children) {
-                    if (children.classList.contains('collapsed')) {
-                        children.classList.remove('collapsed');
-                        toggle.classList.remove('collapsed');
-                        toggle.classList.add('expanded');
-                    } else {
-                        children.classList.add('collapsed');
-                        toggle.classList.remove('expanded');
-                        toggle.classList.add('collapsed');
-                    }
+        if (!children) {
+            return;
+        }
+        if (children.classList.contains('collapsed')) {
+            if (children.dataset.pending) {
+                if (children.dataset.loading) {
+                    return;
                 }
-            });
-            
-            // Prevent text selection on the toggle itself
-            toggle.addEventListener('mousedown', function(e) {
-                e.preventDefault();
-            });
-        });
+                children.dataset.loading = 'true';
+                try {
+                    appendTreeChildren(children, await fetchTreeChildren(children.dataset.nodeId));
+                    delete children.dataset.pending;
+                } catch (error) {
+                    showNotification('Error loading tree: ' + error.message, 'danger');
+                    return;
+                } finally {
+                    delete children.dataset.loading;
+                }
+            }
+            children.classList.remove('collapsed');
+            toggle.classList.remove('collapsed');
+            toggle.classList.add('expanded');
+        } else {
+            children.classList.add('collapsed');
+            toggle.classList.remove('expanded');
+            toggle.classList.add('collapsed');
+        }
     }
     
+    // Tree clicks are handled here, so nodes added later need no listeners of their own
+    xmlTreeContent.addEventListener('click', async function(e) {
+        // Only the toggle arrows toggle, not the entire node
+        const toggle = e.target.closest('.tree-toggle:not(.leaf)');
+        if (toggle) {
+            e.preventDefault();
+            e.stopPropagation();
+            toggleTreeNode(toggle);
+            return;
+        }
+        
+        const loadMore = e.target.closest('.tree-load-more');
+        if (loadMore && !loadMore.dataset.loading) {
+            loadMore.dataset.loading = 'true';
+            try {
+                const node = await fetchTreeChildren(loadMore.dataset.nodeId, loadMore.dataset.after);
+                appendTreeChildren(loadMore.parentElement, node);
+            } catch (error) {
+                delete loadMore.dataset.loading;
+                showNotification('Error loading tree: ' + error.message, 'danger');
+            }
+        }
+    });
+    
+    // Prevent text selection on the toggles themselves
+    xmlTreeContent.addEventListener('mousedown', function(e) {
+        if (e.target.closest('.tree-toggle:not(.leaf)')) {
+            e.preventDefault();
+        }
+    });
+    
     // Escape HTML
     function escapeHtml(text) {
         const map = {
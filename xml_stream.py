@@ -0,0 +1,480 @@
+"""Streaming XML pretty-printer for the XML Formatter tool.
+
+PrettyPrinter writes exactly what the tool's minidom path produced:
+
+    dom = xml.dom.minidom.parseString(text)
+    lines = dom.toprettyxml(indent=indent).split('\\n')
+    '\\n'.join(line for line in lines if line.strip())
+
+but from expat events in one pass, without building a DOM. It follows
+the DOM that minidom's expat builder would build (namespace declarations
+first among the attributes, adjacent text merged into one node, CDATA
+sections as separate nodes) and writes each node as minidom's writexml()
+would. Only the open elements and the first child of the innermost
+element are held, so memory is bounded by the nesting depth and the
+largest text node rather than by the document.
+
+The element tree for the tree view can be collected in the same pass
+into an XmlTree, a table of parent/first-child/next-sibling arrays that
+the view fetches from a few levels at a time.
+"""
+import uuid
+from array import array
+from xml.dom.expatbuilder import InternalSubsetExtractor
+from xml.parsers import expat
+
+# Characters of input parsed at a time
+FEED_SIZE = 1024 * 1024
+
+# Character data expat collects before reporting it
+PARSER_BUFFER_SIZE = 64 * 1024
+
+# How an open element's children are written: not yet known (no children),
+# held back (a lone text/CDATA child is written inline), or one per line
+_EMPTY, _SINGLE, _BLOCK = range(3)
+
+
+def pretty_xml(text, indent='\t', tree=False):
+    """text pretty-printed like minidom's toprettyxml() without blank lines.
+
+    Returns (formatted text, tree); tree is an XmlTree if requested,
+    else None. Raises expat.ExpatError for malformed XML.
+    """
+    chunks = []
+    printer = PrettyPrinter(chunks.append, indent, tree)
+    for start in range(0, len(text), FEED_SIZE):
+        printer.feed(text[start:start + FEED_SIZE])
+    printer.close()
+    return ''.join(chunks), printer.tree
+
+
+class _Frame:
+    """An open element (or the document) being written"""
+    __slots__ = ('tag', 'indent', 'state', 'child', 'first', 'blank', 'node', 'text')
+
+    def __init__(self, tag, indent, state=_EMPTY, node=None):
+        self.tag = tag
+        self.indent = indent
+        self.state = state
+        self.child = None  # kind of the last child; 'text'/'cdata' may still grow
+        self.first = None  # pieces of a lone text/CDATA child held back in _SINGLE
+        self.blank = None  # whitespace pieces of a text child not written yet
+        self.node = node  # XmlTree node id, if the tree is collected
+        self.text = None  # pieces of the current text child, for the tree
+
+
+class PrettyPrinter:
+    """Incremental pretty-printer; feed() the document, then close().
+
+    Formatted output is passed to write() in pieces as it is produced.
+    With tree=True the element tree is in .tree (an XmlTree).
+    """
+
+    def __init__(self, write, indent='\t', tree=False):
+        self._out = _BlankLineFilter(write)
+        self._pending = []
+        self._write = self._pending.append
+        self.indent = indent
+        # Whitespace-only text between children only makes blank lines,
+        # which are filtered out anyway, so it need not be written
+        self._skip_blank = not indent.strip()
+        self.tree = XmlTree() if tree else None
+        self._stack = [_Frame(None, None, _BLOCK)]
+        self._namespaces = []
+        self._cdata = False
+        self._cdata_continue = False
+        self._in_subset = False
+        self._doctype = None
+        self._prolog = []
+        self._empty = ''
+
+        parser = expat.ParserCreate(namespace_separator=' ')
+        parser.namespace_prefixes = True
+        parser.buffer_text = True
+        parser.buffer_size = PARSER_BUFFER_SIZE
+        parser.ordered_attributes = True
+        parser.specified_attributes = True
+        parser.StartElementHandler = self._start_element
+        parser.EndElementHandler = self._end_element
+        parser.CharacterDataHandler = self._character_data
+        parser.StartCdataSectionHandler = self._start_cdata
+        parser.EndCdataSectionHandler = self._end_cdata
+        parser.CommentHandler = self._comment
+        parser.ProcessingInstructionHandler = self._processing_instruction
+        parser.StartNamespaceDeclHandler = self._namespace_decl
+        parser.StartDoctypeDeclHandler = self._start_doctype
+        parser.EndDoctypeDeclHandler = self._end_doctype
+        parser.ExternalEntityRefHandler = lambda context, base, system_id, public_id: 1
+        self._parser = parser
+        self._write('<?xml version="1.0" ?>\n')
+
+    def feed(self, data):
+        """Parse the next piece of the document (str or bytes)"""
+        self._empty = data[:0]
+        if self._prolog is not None:
+            # Kept until the root element in case a DOCTYPE has an internal subset
+            self._prolog.append(data)
+        self._parser.Parse(data, False)
+        self._flush()
+
+    def close(self):
+        """Finish the document and flush the output"""
+        self._parser.Parse(self._empty, True)
+        self._flush()
+        self._out.close()
+        if self.tree is not None:
+            self.tree.finish()
+
+    def _flush(self):
+        if self._pending:
+            self._out.write(''.join(self._pending))
+            self._pending.clear()
+
+    def _child(self, frame, kind):
+        """Start a new child of frame; False if it is held back as a possible lone child"""
+        self._end_text(frame)
+        if frame.state == _EMPTY:
+            if kind in ('text', 'cdata'):
+                frame.state = _SINGLE
+                frame.child = kind
+                frame.first = []
+                return False
+            self._write('>\n')
+            frame.state = _BLOCK
+        elif frame.state == _SINGLE:
+            # A second child: the held-back one goes on its own line after all
+            self._write('>\n')
+            frame.state = _BLOCK
+            data = ''.join(frame.first)
+            frame.first = None
+            if frame.child == 'text':
+                self._write(_escape(frame.indent + self.indent + data + '\n'))
+            else:
+                self._write(f'<![CDATA[{data}]]>')
+        else:
+            self._end_child(frame)
+        frame.child = kind
+        return True
+
+    def _end_child(self, frame):
+        """Finish a text or CDATA child written one per line"""
+        if frame.child == 'text':
+            if frame.blank is None:
+                self._write('\n')
+            frame.blank = None
+        elif frame.child == 'cdata':
+            self._write(']]>')
+
+    def _end_text(self, frame):
+        """Add a finished text child to the element's tree text"""
+        if frame.text is not None:
+            self.tree.add_text(frame.node, ''.join(frame.text).strip())
+            frame.text = None
+
+    def _child_indent(self, frame):
+        return '' if frame.indent is None else frame.indent + self.indent
+
+    def _start_element(self, name, attributes):
+        self._prolog = None
+        parent = self._stack[-1]
+        self._child(parent, 'element')
+        tag = _qname(name) if ' ' in name else name
+        indent = self._child_indent(parent)
+
+        attrs = {}
+        if self._namespaces:
+            for prefix, uri in self._namespaces:
+                attrs['xmlns:' + prefix if prefix else 'xmlns'] = uri
+            self._namespaces.clear()
+        if attributes:
+            for idx in range(0, len(attributes), 2):
+                attrs[_qname(attributes[idx])] = attributes[idx + 1]
+        if attrs:
+            self._write(indent + '<' + tag + ''.join(
+                f' {attr}="{_escape(value)}"' for attr, value in attrs.items()))
+        else:
+            self._write(indent + '<' + tag)
+
+        node = None
+        if self.tree is not None:
+            node = self.tree.add(-1 if parent.node is None else parent.node, tag, attrs)
+        self._stack.append(_Frame(tag, indent, node=node))
+
+    def _end_element(self, name):
+        frame = self._stack.pop()
+        self._end_text(frame)
+        if frame.state == _EMPTY:
+            self._write('/>\n')
+        elif frame.state == _SINGLE:
+            data = ''.join(frame.first)
+            if frame.child == 'text':
+                self._write(f'>{_escape(data)}</{frame.tag}>\n')
+            else:
+                self._write(f'><![CDATA[{data}]]></{frame.tag}>\n')
+        else:
+            self._end_child(frame)
+            self._write(f'{frame.indent}</{frame.tag}>\n')
+
+    def _character_data(self, data):
+        frame = self._stack[-1]
+        if self._cdata:
+            if not (self._cdata_continue and frame.child == 'cdata'):
+                if self._child(frame, 'cdata'):
+                    self._write('<![CDATA[')
+                self._cdata_continue = True
+            if frame.state == _SINGLE:
+                frame.first.append(data)
+            else:
+                self._write(data)
+            return
+
+        if frame.child != 'text':
+            # After a CDATA section the text continues its line, so it may not be blank
+            after_cdata = frame.child == 'cdata'
+            if self._child(frame, 'text'):
+                if self._skip_blank and not after_cdata:
+                    frame.blank = []
+                else:
+                    self._write(_escape(frame.indent + self.indent))
+            if frame.node is not None:
+                frame.text = []
+        if frame.state == _SINGLE:
+            frame.first.append(data)
+        elif frame.blank is not None:
+            if data.isspace():
+                frame.blank.append(data)
+            else:
+                self._write(_escape(frame.indent + self.indent + ''.join(frame.blank) + data))
+                frame.blank = None
+        else:
+            self._write(_escape(data))
+        if frame.text is not None:
+            frame.text.append(data)
+
+    def _start_cdata(self):
+        self._cdata = True
+        self._cdata_continue = False
+
+    def _end_cdata(self):
+        self._cdata = False
+        self._cdata_continue = False
+
+    def _comment(self, data):
+        if self._in_subset:
+            return
+        frame = self._stack[-1]
+        self._child(frame, 'comment')
+        self._write(f'{self._child_indent(frame)}<!--{data}-->\n')
+
+    def _processing_instruction(self, target, data):
+        if self._in_subset:
+            return
+        frame = self._stack[-1]
+        self._child(frame, 'pi')
+        self._write(f'{self._child_indent(frame)}<?{target} {data}?>\n')
+
+    def _namespace_decl(self, prefix, uri):
+        self._namespaces.append((prefix, uri))
+
+    def _start_doctype(self, name, system_id, public_id, has_internal_subset):
+        self._doctype = (name, system_id, public_id)
+        if has_internal_subset:
+            # Comments and PIs in the subset are not document children; the
+            # DOCTYPE is written once the subset can be read back from the source
+            self._in_subset = True
+        else:
+            self._write_doctype(None)
+
+    def _end_doctype(self):
+        if not self._in_subset:
+            return
+        self._in_subset = False
+        extractor = InternalSubsetExtractor()
+        extractor.parseString(self._empty.join(self._prolog))
+        self._write_doctype(extractor.getSubset())
+
+    def _write_doctype(self, subset):
+        name, system_id, public_id = self._doctype
+        parts = ['<!DOCTYPE ', name]
+        if public_id:
+            parts.append(f"\n  PUBLIC '{public_id}'\n  '{system_id}'")
+        elif system_id:
+            parts.append(f"\n  SYSTEM '{system_id}'")
+        if subset is not None:
+            parts.append(f' [{subset}]')
+        parts.append('>\n')
+        self._write(''.join(parts))
+
+
+class XmlTree:
+    """The elements of a document as a node table, in document order.
+
+    Node 0 is the root element. Each node has parallel array entries for
+    its parent, first child, next sibling (-1 for none), child count and
+    level; names are interned, and only nodes with attributes or text
+    have an entry for them. id keys the tree in the app's session store.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.names = []
+        self.name_ids = array('I')
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.child_count = array('I')
+        self.level = array('I')
+        self.attributes = {}
+        self.text = {}
+        self._name_index = {}
+        self._last_child = array('i')
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self, parent, name, attributes):
+        """Append an element as the last child of parent (-1 for the root); its id"""
+        node = len(self.parent)
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            name_id = self._name_index[name] = len(self.names)
+            self.names.append(name)
+        self.name_ids.append(name_id)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.child_count.append(0)
+        self._last_child.append(-1)
+        if attributes:
+            self.attributes[node] = attributes
+        if parent < 0:
+            self.level.append(0)
+        else:
+            self.level.append(self.level[parent] + 1)
+            last = self._last_child[parent]
+            if last < 0:
+                self.first_child[parent] = node
+            else:
+                self.next_sibling[last] = node
+            self._last_child[parent] = node
+            self.child_count[parent] += 1
+        return node
+
+    def add_text(self, node, text):
+        """Append stripped text found directly inside node"""
+        if text:
+            self.text[node] = self.text.get(node, '') + text
+
+    def finish(self):
+        """Drop what was only needed while adding nodes"""
+        self._name_index = None
+        self._last_child = None
+
+    def find(self, path):
+        """Id of the element at path, or None.
+
+        path is element names from the root separated by '/', each
+        optionally followed by a 1-based position among the siblings of
+        that name, e.g. /flists/flist[3]/PIN_FLD_POID.
+        """
+        node = -1
+        for step in path.strip('/').split('/'):
+            name, position = step, 1
+            if step.endswith(']') and '[' in step:
+                name, _, index = step[:-1].partition('[')
+                position = int(index)
+                if position < 1:
+                    raise ValueError(f'Invalid path position: {step}')
+            candidate = 0 if node < 0 else self.first_child[node]
+            while candidate >= 0:
+                if self.names[self.name_ids[candidate]] == name:
+                    position -= 1
+                    if not position:
+                        break
+                candidate = self.next_sibling[candidate] if node >= 0 else -1
+            if candidate < 0:
+                return None
+            node = candidate
+        return node
+
+    def subtree(self, node, depth, max_nodes, after=-1):
+        """node as a tree view dict with its descendants depth levels down.
+
+        At most max_nodes descendants are included, nearest levels first;
+        a node whose childCount is more than its children has more to
+        fetch. The children of node start after the child id after.
+        """
+        if not 0 <= node < len(self.parent):
+            raise ValueError(f'Unknown node: {node}')
+        if after >= 0 and (after >= len(self.parent) or self.parent[after] != node):
+            raise ValueError(f'Node {after} is not a child of {node}')
+        top = self._node_dict(node)
+        queue = [(top, node, self.next_sibling[after] if after >= 0 else self.first_child[node])]
+        budget = max_nodes
+        # Breadth first, so the nodes closest to the expanded one come first
+        for item, parent, child in queue:
+            if budget <= 0:
+                break
+            if item['level'] - top['level'] >= depth:
+                continue
+            while child >= 0 and budget > 0:
+                child_item = self._node_dict(child)
+                item['children'].append(child_item)
+                queue.append((child_item, child, self.first_child[child]))
+                budget -= 1
+                child = self.next_sibling[child]
+        return top
+
+    def _node_dict(self, node):
+        return {
+            'id': node,
+            'name': self.names[self.name_ids[node]],
+            'type': 'element',
+            'level': self.level[node],
+            'attributes': self.attributes.get(node, {}),
+            'text': self.text.get(node, ''),
+            'childCount': self.child_count[node],
+            'children': []
+        }
+
+
+class _BlankLineFilter:
+    """Passes text on without its whitespace-only lines and without a final newline"""
+
+    def __init__(self, write):
+        self._write = write
+        self._partial = ''
+        self._started = False
+
+    def write(self, text):
+        lines = text.split('\n')
+        if len(lines) == 1:
+            self._partial += text
+            return
+        lines[0] = self._partial + lines[0]
+        self._partial = lines.pop()
+        kept = '\n'.join([line for line in lines if line.strip()])
+        if kept:
+            self._write('\n' + kept if self._started else kept)
+            self._started = True
+
+    def close(self):
+        if self._partial.strip():
+            self._write('\n' + self._partial if self._started else self._partial)
+        self._partial = ''
+
+
+def _qname(name):
+    """Qualified name of an expat namespace triple 'uri local [prefix]'"""
+    parts = name.split(' ')
+    if len(parts) == 3:
+        return f'{parts[2]}:{parts[1]}'
+    if len(parts) == 2:
+        return parts[1]
+    if len(parts) == 1:
+        return name
+    raise ValueError(f'Unsupported syntax: spaces in URIs not supported: {name!r}')
+
+
+def _escape(data):
+    return data.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')